@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_gis',
     'rest_framework.authtoken',
@@ -88,9 +89,45 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', '12345'),
         'HOST': os.environ.get('DB_HOST', 'db'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Постоянные соединения вместо нового подключения на каждый запрос
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# ==============================================================================
+# КЭШ
+# ==============================================================================
+# Общий кэш нужен, чтобы роли и токены не запрашивались из БД в каждом процессе.
+# Без REDIS_URL используется локальный кэш процесса.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+GEOCLIENT_ROLE_CACHE_TTL = int(os.environ.get('ROLE_CACHE_TTL', '300'))
+GEOCLIENT_ROLE_LOCAL_TTL = int(os.environ.get('ROLE_LOCAL_TTL', '30'))
+GEOCLIENT_TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', '60'))
+GEOCLIENT_TOKEN_LOCAL_TTL = int(os.environ.get('TOKEN_LOCAL_TTL', '10'))
+# Ряд координат пункта пересчитывается сам при новом наблюдении; TTL лишь чистит старые ключи
+GEOCLIENT_TIMESERIES_CACHE_TTL = int(os.environ.get('TIMESERIES_CACHE_TTL', '86400'))
+# Расхождение (м) APPROX POSITION XYZ с кодовым решением, после которого координаты заголовка заменяются
+GEOCLIENT_APPROX_POSITION_TOLERANCE = float(os.environ.get('APPROX_POSITION_TOLERANCE', '30'))
+# Выполняющийся импорт KML без отметок хода дольше этого (с) помечается ошибкой при запросе статуса
+GEOCLIENT_KML_IMPORT_STALE_AFTER = int(os.environ.get('KML_IMPORT_STALE_AFTER', '3600'))
+# Поиск пунктов на портале ФППД (обогащение новых пунктов классом сети и индексом)
+GEOCLIENT_FPPD_SEARCH_URL = os.environ.get('FPPD_SEARCH_URL', 'https://mdss.fppd.cgkipd.ru/api/v1/GGSStation/Search')
+
 # ==============================================================================
 # ВАЛИДАЦИЯ ПАРОЛЕЙ
 # ==============================================================================
@@ -140,7 +177,7 @@ if DEBUG:
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'geoclient.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -206,4 +243,12 @@ if not TEMP_UPLOAD_DIR.exists():
 FILE_UPLOAD_TEMP_DIR = str(TEMP_UPLOAD_DIR)
 
 # Если файл больше 2.5MB, он будет стримиться на диск (в нашу папку), а не в память.
-FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5 MB
\ No newline at end of file
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5 MB
+
+# Схема хранения RINEX файлов: 'legacy' (папки станций) или 'cas' (блобы по SHA-256
+# с дедупликацией, см. geoclient/storage.py и команду dedupe_media)
+RINEX_STORAGE_LAYOUT = os.environ.get('RINEX_STORAGE_LAYOUT', 'legacy')
+
+# Сжатие новых файлов при хранении: '' (нет), 'gzip' или 'zstd' (нужен пакет zstandard).
+# Существующие файлы пережимает команда compress_media.
+RINEX_STORAGE_COMPRESSION = os.environ.get('RINEX_STORAGE_COMPRESSION', '')
\ No newline at end of file
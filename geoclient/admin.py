@@ -6,7 +6,12 @@ from django.urls import reverse
 from django.utils.html import format_html
 
 # Импортируем ВСЕ ваши модели
-from .models import GeodeticPoint, Observation, UploadedRinexFile, StationDirectoryName
+from .models import (
+    GeodeticPoint, Observation, UploadedRinexFile, StationDirectoryName, PendingFileCleanup, PointAlias,
+    StorageScrubRun, StorageScrubResult, NavigationDay, KmlImportJob,
+)
+from .search import search_point_ids, MAX_SEARCH_LIMIT
+from .statistics import refresh_point_statistics
 
 # --- 1. Класс для отображения наблюдений ВНУТРИ карточки точки ---
 # Этот класс будет использоваться как "встраиваемый" в админку GeodeticPoint
@@ -29,7 +34,7 @@ class ObservationInline(admin.TabularInline):
         if obj.source_file:
             link = reverse("admin:geoclient_uploadedrinexfile_change", args=[obj.source_file.pk])
             # Отображаем только имя файла, а не полный путь
-            filename = obj.source_file.file.name.split('/')[-1]
+            filename = obj.source_file.download_name
             return format_html('<a href="{}">{}</a>', link, filename)
         return "–"
     source_file_link.short_description = 'Исходный файл'
@@ -44,6 +49,13 @@ class ObservationInline(admin.TabularInline):
         # Можно разрешить удаление, если это необходимо
         return True
 
+class PointAliasInline(admin.TabularInline):
+    """Алиасы пункта (имена из файлов и влитых пунктов)."""
+    model = PointAlias
+    extra = 0
+    fields = ('alias', 'source', 'created_at')
+    readonly_fields = ('created_at',)
+
 # --- 2. Настройки админки для основной модели GeodeticPoint ---
 @admin.register(GeodeticPoint)
 class GeodeticPointAdmin(admin.GISModelAdmin):
@@ -51,50 +63,66 @@ class GeodeticPointAdmin(admin.GISModelAdmin):
     Настройки админ-панели для модели геодезических пунктов.
     """
     # Отображаем только те поля, которые реально существуют в модели GeodeticPoint
-    list_display = ('id', 'station_name', 'point_type', 'observation_count', 'updated_at')
+    list_display = ('id', 'station_name', 'point_type', 'observation_count', 'last_observation', 'updated_at')
     
-    # Поля для поиска
-    search_fields = ('id', 'station_name', 'description')
+    # Поля для поиска (сам поиск — триграммный, см. get_search_results)
+    search_fields = ('id', 'station_name', 'index_name', 'mark_number', 'aliases__alias')
     
     # Поля для фильтрации
     list_filter = ('point_type', 'updated_at')
     
     # Подключаем наш инлайн, чтобы видеть наблюдения на странице точки
-    inlines = [ObservationInline]
+    inlines = [PointAliasInline, ObservationInline]
 
     # Делаем системные поля только для чтения
     readonly_fields = ('id', 'created_at', 'updated_at')
 
-    # Метод для подсчета и сортировки по количеству наблюдений
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.annotate(_observation_count=Count('observations'))
+    # Счетчики берутся из PointStatistics (одна строка на пункт), без COUNT по наблюдениям
+    list_select_related = ('statistics',)
 
-    @admin.display(description='Кол-во наблюдений', ordering='_observation_count')
+    @admin.display(description='Кол-во наблюдений', ordering='statistics__observation_count')
     def observation_count(self, obj):
-        return obj._observation_count
+        stats = getattr(obj, 'statistics', None)
+        return stats.observation_count if stats else 0
+
+    @admin.display(description='Последнее наблюдение', ordering='statistics__last_observation')
+    def last_observation(self, obj):
+        stats = getattr(obj, 'statistics', None)
+        return stats.last_observation if stats else None
+
+    # Индексный триграммный поиск вместо ILIKE '%...%' по каждому полю
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=search_point_ids(search_term, limit=MAX_SEARCH_LIMIT)), False
+
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        # Наблюдения, удаленные через ObservationInline, должны уйти и из сводки пункта
+        if formset.model is Observation and formset.deleted_objects:
+            refresh_point_statistics([form.instance.pk])
 
 # --- 3. Настройки админки для модели UploadedRinexFile ---
 @admin.register(UploadedRinexFile)
 class UploadedRinexFileAdmin(admin.ModelAdmin):
     # В list_display используем поля из самой модели или кастомные методы
-    list_display = ('file_name_display', 'uploaded_at', 'file_type', 'observations_count_display')
-    list_filter = ('uploaded_at', 'file_type')
-    readonly_fields = ('uploaded_at', 'file_hash')
+    list_display = ('file_name_display', 'uploaded_at', 'file_type', 'observations_count_display', 'scrub_status_display')
+    list_filter = ('uploaded_at', 'file_type', 'scrub_result__status')
+    readonly_fields = ('uploaded_at', 'file_hash', 'spliced_into')
     date_hierarchy = 'uploaded_at'
     search_fields = ('file', 'file_hash')
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
         # Считаем связанные наблюдения для каждого файла
-        queryset = queryset.annotate(_observations_count=Count('observations', distinct=True))
+        queryset = queryset.annotate(_observations_count=Count('observations', distinct=True)).select_related('scrub_result')
         return queryset
 
     # Метод для красивого отображения имени файла
     @admin.display(description='Имя файла', ordering='file')
     def file_name_display(self, obj):
         if obj.file and hasattr(obj.file, 'name'):
-            return obj.file.name.split('/')[-1]
+            return obj.download_name
         return "Файл отсутствует"
 
     # Метод для отображения количества связанных наблюдений
@@ -102,6 +130,15 @@ class UploadedRinexFileAdmin(admin.ModelAdmin):
     def observations_count_display(self, obj):
         return obj._observations_count
 
+    @admin.display(description='Целостность', ordering='scrub_result__status')
+    def scrub_status_display(self, obj):
+        result = getattr(obj, 'scrub_result', None)
+        if result is None:
+            return "Не проверялся"
+        if result.status == StorageScrubResult.STATUS_OK:
+            return result.get_status_display()
+        return format_html('<b style="color: #c00;">{}</b>', result.get_status_display())
+
 # --- 4. Настройки админки для справочника имен ---
 @admin.register(StationDirectoryName)
 class StationDirectoryNameAdmin(admin.ModelAdmin):
@@ -109,4 +146,63 @@ class StationDirectoryNameAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     list_filter = ('created_at', 'updated_at')
     readonly_fields = ('created_at', 'updated_at')
-    date_hierarchy = 'created_at'
\ No newline at end of file
+    date_hierarchy = 'created_at'
+
+# --- 5. Очередь удаления файлов (только просмотр) ---
+@admin.register(PendingFileCleanup)
+class PendingFileCleanupAdmin(admin.ModelAdmin):
+    list_display = ('path', 'created_at', 'attempts', 'last_error')
+    search_fields = ('path',)
+    readonly_fields = ('path', 'created_at', 'attempts', 'last_error')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StorageScrubResult)
+class StorageScrubResultAdmin(admin.ModelAdmin):
+    list_display = ('file_link', 'status', 'checked_at', 'size', 'detail')
+    list_filter = ('status', 'checked_at')
+    search_fields = ('file__file', 'file__original_name', 'file__file_hash')
+    readonly_fields = ('file', 'run', 'status', 'actual_hash', 'size', 'detail', 'checked_at')
+    list_select_related = ('file',)
+
+    @admin.display(description='Файл', ordering='file')
+    def file_link(self, obj):
+        url = reverse('admin:geoclient_uploadedrinexfile_change', args=[obj.file_id])
+        return format_html('<a href="{}">{}</a>', url, obj.file.download_name or obj.file_id)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StorageScrubRun)
+class StorageScrubRunAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'finished_at', 'checked_count', 'corrupt_count', 'missing_count', 'last_file_id')
+    readonly_fields = ('started_at', 'finished_at', 'last_file_id', 'checked_count', 'corrupt_count', 'missing_count', 'bytes_read')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(NavigationDay)
+class NavigationDayAdmin(admin.ModelAdmin):
+    list_display = ('date', 'system', 'record_count', 'satellite_count', 'updated_at')
+    list_filter = ('system',)
+    date_hierarchy = 'date'
+    exclude = ('data',)
+    readonly_fields = ('date', 'system', 'record_count', 'satellite_count', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(KmlImportJob)
+class KmlImportJobAdmin(admin.ModelAdmin):
+    list_display = ('original_name', 'status', 'radius', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('original_name',)
+    readonly_fields = ('original_name', 'file', 'radius', 'status', 'counts', 'report', 'error', 'created_by', 'created_at', 'finished_at')
+
+    def has_add_permission(self, request):
+        return False
@@ -6,14 +6,38 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
+from django.shortcuts import get_object_or_404
 from django.urls import reverse
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+import csv
+import io
+from datetime import timedelta
 import os
+import re
 import traceback
 
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Lower
+from django.utils import timezone
+
 from .models import GeodeticPoint, StationDirectoryName, Observation, UploadedRinexFile
-from .serializers import GeodeticPointSerializer, StationDirectoryNameSerializer, ObservationSerializer
+from .serializers import GeodeticPointSerializer, StationDirectoryNameSerializer, ObservationSerializer, ObservationDetailSerializer, ObservationListSerializer, NearbyPointSerializer, PointSearchResultSerializer, PointBulkUpdateItemSerializer
 from .permissions import IsUploader, CanDownloadOrView
+from .cleanup import delete_points_deferred
+from .export import CONTENT_TYPES, export_filename, gzip_chunks, iter_export
+from .filters import as_list, filter_observations, filter_points, parse_time_bound
+from .roles import get_user_roles
+from .authentication import invalidate_token
+from .storage import compression_of, iter_rinex_chunks, CONTENT_ENCODINGS
+from .rinex_filter import filtered_name, iter_filtered_rinex
+from .spatial import nearest_points, points_within, MAX_NEAREST_K, MAX_WITHIN_RESULTS
+from .search import search_points, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from .timeseries import point_timeseries
+from .orbits import DEFAULT_ELEVATION_MASK, DEFAULT_INTERVAL, geodetic_to_ecef, sky_view
+from .splice import splice_candidates, splice_observations
+from .qc import qc_uploaded_file
 
 # --- API для Аутентификации (без изменений) ---
 
@@ -24,13 +48,14 @@ class LoginView(ObtainAuthToken):
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         token, created = Token.objects.get_or_create(user=user)
-        groups = list(user.groups.values_list('name', flat=True))
+        groups = sorted(get_user_roles(user))
         return Response({ 'token': token.key, 'user_id': user.pk, 'username': user.username, 'groups': groups })
 
 class LogoutView(views.APIView):
     permission_classes = [IsAuthenticated]
     def post(self, request, *args, **kwargs):
         try:
+            invalidate_token(request.user.auth_token.key)
             request.user.auth_token.delete()
         except (AttributeError, Token.DoesNotExist):
             pass
@@ -40,7 +65,7 @@ class UserStatusView(views.APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request, *args, **kwargs):
         user = request.user
-        groups = list(user.groups.values_list('name', flat=True))
+        groups = sorted(get_user_roles(user))
         return Response({ 'is_authenticated': True, 'user_id': user.pk, 'username': user.username, 'groups': groups })
 
 # --- API для Файлов (без изменений) ---
@@ -50,26 +75,74 @@ class UploadedRinexFileViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSe
     permission_classes = [CanDownloadOrView]
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
+        """
+        GET /api/rinex-files/<id>/download/ — файл целиком.
+        ?interval=30&start=&end= — потоковая выборка из O-файла: эпохи, кратные интервалу,
+        в окне [start, end]; заголовок (INTERVAL, TIME OF FIRST/LAST OBS) переписывается.
+        """
         try:
             rinex_file = self.get_object()
             if not rinex_file.file: raise Http404("Запись о файле есть, но сам файл отсутствует.")
             if not os.path.exists(rinex_file.file.path): raise Http404("Файл не найден на диске.")
-            return FileResponse(open(rinex_file.file.path, 'rb'), as_attachment=True)
+            params = request.query_params
+            if any(params.get(key) for key in ('interval', 'start', 'end')):
+                return self._filtered_response(rinex_file, params)
+            return self._file_response(request, rinex_file)
         except Http404 as e:
             return Response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception:
             return Response({"detail": "Ошибка сервера при скачивании файла."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _filtered_response(self, rinex_file, params):
+        if rinex_file.file_type != 'o':
+            raise ValueError("Выборка по интервалу и времени возможна только для файлов наблюдений.")
+        interval = float(params['interval']) if params.get('interval') else None
+        if interval is not None and not 0 < interval <= 86400:
+            raise ValueError("interval должен быть от 0 до 86400 секунд.")
+        start = parse_time_bound(params.get('start'))
+        end = parse_time_bound(params.get('end'), end_of_day=True)
+        if start and end and start > end:
+            raise ValueError("start позже end.")
+        response = StreamingHttpResponse(
+            iter_filtered_rinex(rinex_file, interval, start, end), content_type='application/octet-stream'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filtered_name(rinex_file.download_name)}"'
+        return response
+
+    def _file_response(self, request, rinex_file):
+        """
+        Файл, сжатый при хранении, отдается как есть (Content-Encoding), если клиент
+        это принимает; иначе распаковывается потоково.
+        """
+        method = compression_of(rinex_file.file.name)
+        if not method:
+            return FileResponse(open(rinex_file.file.path, 'rb'), as_attachment=True, filename=rinex_file.download_name)
+
+        encoding = CONTENT_ENCODINGS[method]
+        accepted = [e.split(';')[0].strip() for e in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')]
+        if encoding in accepted:
+            response = FileResponse(open(rinex_file.file.path, 'rb'), as_attachment=True, filename=rinex_file.download_name)
+            # FileResponse угадывает кодировку по .gz — задаем явно и сохраняем тип исходного файла
+            response['Content-Type'] = 'application/octet-stream'
+            response['Content-Encoding'] = encoding
+        else:
+            response = StreamingHttpResponse(iter_rinex_chunks(rinex_file), content_type='application/octet-stream')
+            response['Content-Disposition'] = f'attachment; filename="{rinex_file.download_name}"'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
 # --- API для данных (ИЗМЕНЕНИЯ ЗДЕСЬ) ---
 
 class PointViewSet(viewsets.ModelViewSet):
-    queryset = GeodeticPoint.objects.all().prefetch_related('observations__source_file').order_by('id')
+    queryset = GeodeticPoint.objects.all().select_related('statistics').prefetch_related('observations__source_file').order_by('id')
     serializer_class = GeodeticPointSerializer
     lookup_field = 'id'
 
     def get_permissions(self):
         # Применяем строгие права для всех действий, изменяющих данные
-        if self.action in ['update', 'partial_update', 'destroy', 'delete_points']:
+        if self.action in ['update', 'partial_update', 'destroy', 'delete_points', 'bulk_update_points', 'splice']:
             return [IsUploader()]
         return [CanDownloadOrView()]
 
@@ -89,39 +162,230 @@ class PointViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 1. Находим все группы файлов, которые нужно удалить.
-        upload_groups_to_delete = set()
-        observations = Observation.objects.filter(point_id__in=point_ids).select_related('source_file')
-        for obs in observations:
-            if obs.source_file and obs.source_file.upload_group:
-                upload_groups_to_delete.add(obs.source_file.upload_group)
-
-        # 2. Находим все объекты UploadedRinexFile, принадлежащие этим группам.
-        files_to_delete = UploadedRinexFile.objects.filter(upload_group__in=upload_groups_to_delete)
-        deleted_file_count = files_to_delete.count()
-
-        # 3. Удаляем каждый файл по отдельности, чтобы сработал метод .delete() модели
-        # и удалил физический файл с диска.
-        for rinex_file in files_to_delete:
-            rinex_file.delete() # Эта команда удаляет физический файл
-
-        # 4. Наконец, удаляем сами геодезические пункты.
-        # Связанные с ними наблюдения удалятся автоматически из-за CASCADE.
-        points_to_delete = GeodeticPoint.objects.filter(id__in=point_ids)
-        deleted_points_count = points_to_delete.count()
-        deleted_point_ids = list(points_to_delete.values_list('id', flat=True))
-        points_to_delete.delete()
+        # Одна транзакция из набора SQL-запросов; файлы с диска удаляет фоновый обработчик
+        deleted_point_ids, deleted_file_count = delete_points_deferred(point_ids)
+        deleted_points_count = len(deleted_point_ids)
 
         return Response({
             'message': f'Успешно удалено {deleted_points_count} пунктов и {deleted_file_count} связанных файлов.',
             'deleted_point_ids': deleted_point_ids
         }, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'])
+    def timeseries(self, request, id=None):
+        """
+        GET /api/points/<id>/timeseries/ — смещения ENU всех сессий пункта относительно
+        среднего положения, СКО, выбросы и линейная скорость. Кэшируется до нового наблюдения.
+        """
+        point = get_object_or_404(GeodeticPoint.objects.only('id'), id=id)
+        self.check_object_permissions(request, point)
+        result = point_timeseries(point.id)
+        if result is None:
+            return Response({'detail': 'Для пункта нет наблюдений с координатами ECEF.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(result)
+
+    @action(detail=True, methods=['get'])
+    def sky(self, request, id=None):
+        """
+        GET /api/points/<id>/sky/?start=&end=&interval=30&mask=10&systems=G,R — азимут и угол места
+        спутников и ряды DOP для пункта. По умолчанию — интервал последней сессии пункта
+        (или текущие сутки UTC); координаты — ECEF последней сессии либо положение пункта.
+        """
+        point = get_object_or_404(GeodeticPoint.objects.only('id', 'location'), id=id)
+        self.check_object_permissions(request, point)
+        params = request.query_params
+        latest = point.observations.order_by('-timestamp').only('timestamp', 'duration', 'raw_x', 'raw_y', 'raw_z', 'ellipsoidal_height').first()
+        try:
+            start = parse_time_bound(params.get('start'))
+            end = parse_time_bound(params.get('end'), end_of_day=True)
+            if start is None:
+                if latest:
+                    start = latest.timestamp
+                else:
+                    now = timezone.now()
+                    start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            if end is None:
+                end = start + (latest.duration if latest and latest.duration and start == latest.timestamp else timedelta(days=1))
+            interval = float(params.get('interval', DEFAULT_INTERVAL))
+            mask = float(params.get('mask', DEFAULT_ELEVATION_MASK))
+
+            if latest and latest.raw_x is not None:
+                receiver = (latest.raw_x, latest.raw_y, latest.raw_z)
+            else:
+                height = latest.ellipsoidal_height if latest and latest.ellipsoidal_height is not None else 0.0
+                receiver = geodetic_to_ecef(point.location.y, point.location.x, height)
+            result = sky_view(receiver, start, end, interval, mask, as_list(params.get('systems')) or None)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except LookupError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        result['point_id'] = point.id
+        return Response(result)
+
+    def _query_coordinates(self, request):
+        lon = float(request.query_params['lon'])
+        lat = float(request.query_params['lat'])
+        if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+            raise ValueError
+        return lon, lat
+
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """GET /api/points/nearest/?lon=&lat=&k= — k ближайших пунктов."""
+        try:
+            lon, lat = self._query_coordinates(request)
+            k = min(max(int(request.query_params.get('k', 10)), 1), MAX_NEAREST_K)
+        except (KeyError, ValueError):
+            return Response({'error': 'Укажите корректные lon, lat и k.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(NearbyPointSerializer(nearest_points(lon, lat, k), many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def within(self, request):
+        """GET /api/points/within/?lon=&lat=&radius_m= — пункты в радиусе, от ближних к дальним."""
+        try:
+            lon, lat = self._query_coordinates(request)
+            radius_m = float(request.query_params['radius_m'])
+            limit = min(max(int(request.query_params.get('limit', MAX_WITHIN_RESULTS)), 1), MAX_WITHIN_RESULTS)
+            if radius_m <= 0:
+                raise ValueError
+        except (KeyError, ValueError):
+            return Response({'error': 'Укажите корректные lon, lat и radius_m.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(NearbyPointSerializer(points_within(lon, lat, radius_m, limit), many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """GET /api/points/search/?q=&limit= — нечеткий поиск по ID, имени, индексу, марке и алиасам."""
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', DEFAULT_SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+        except ValueError:
+            return Response({'error': 'Некорректный limit.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(PointSearchResultSerializer(search_points(query, limit), many=True).data)
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<export_format>kml|kmz|csv)')
+    def export(self, request, export_format=None):
+        """
+        GET /api/points/export/<kml|kmz|csv>/?bbox=&type=&updated_since=&observed_since=&point_ids=
+        — потоковая выгрузка каталога для контроллеров и Google Earth. KML и CSV сжимаются
+        gzip на лету, если клиент это принимает; KMZ — ZIP с doc.kml.
+        """
+        try:
+            points = filter_points(GeodeticPoint.objects.all(), request.query_params)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        chunks = iter_export(points, export_format)
+        accepted = [e.split(';')[0].strip() for e in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')]
+        compress = export_format != 'kmz' and 'gzip' in accepted
+        response = StreamingHttpResponse(gzip_chunks(chunks) if compress else chunks, content_type=CONTENT_TYPES[export_format])
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(export_format)}"'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    @action(detail=False, methods=['patch'], url_path='bulk')
+    def bulk_update_points(self, request):
+        """
+        PATCH /api/points/bulk/ — массовое присвоение имени, типа и класса сети.
+        Тело: список объектов {id, station_name?, point_type?, network_class?}
+        (или {"updates": [...]}). Все изменения — одна транзакция и один bulk_update.
+        """
+        items = request.data.get('updates') if isinstance(request.data, dict) else request.data
+        serializer = PointBulkUpdateItemSerializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        updates = {item['id']: item for item in serializer.validated_data}
+
+        with transaction.atomic():
+            points = GeodeticPoint.objects.select_for_update().in_bulk(list(updates))
+            changed_fields = set()
+            now = timezone.now()
+            for point_id, point in points.items():
+                for field, value in updates[point_id].items():
+                    if field != 'id':
+                        setattr(point, field, value)
+                        changed_fields.add(field)
+                point.updated_at = now
+            if changed_fields:
+                GeodeticPoint.objects.bulk_update(points.values(), [*sorted(changed_fields), 'updated_at'], batch_size=500)
+
+        return Response({
+            'updated_count': len(points) if changed_fields else 0,
+            'not_found_ids': [pid for pid in updates if pid not in points],
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'])
+    def splice(self, request, id=None):
+        """
+        POST /api/points/<id>/splice/ — склейка O-файлов пункта в один файл (новый комплект).
+        Тело: {observation_ids?: [...], start?, end?}; без параметров склеиваются все сессии пункта.
+        Исходные наблюдения заменяются одним, исходные файлы сохраняются.
+        """
+        point = get_object_or_404(GeodeticPoint, id=id)
+        self.check_object_permissions(request, point)
+        data = request.data if isinstance(request.data, dict) else {}
+        try:
+            observations = splice_candidates(
+                point, as_list(data.get('observation_ids')),
+                parse_time_bound(data.get('start')), parse_time_bound(data.get('end'), end_of_day=True),
+            )
+            observation, summary = splice_observations(point, observations)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        qc_uploaded_file(observation.source_file)
+        return Response({
+            'observation_id': observation.pk,
+            'file_id': observation.source_file_id,
+            'upload_group': observation.source_file.upload_group,
+            'timestamp': observation.timestamp,
+            'duration': observation.duration,
+            'sources': len(observations),
+            'epochs': summary['epochs'],
+            'overlaps': summary['overlaps'],
+        }, status=status.HTTP_201_CREATED)
+
     def perform_destroy(self, instance):
-        # Перенаправляем стандартное удаление одного объекта на наш новый метод
-        # Это не самый элегантный способ, но гарантирует, что DELETE /api/points/ID/
-        # тоже будет работать правильно.
-        self.delete_points(self.request._request)
+        # DELETE /api/points/ID/ удаляет пункт вместе с комплектами файлов, как и delete-points
+        delete_points_deferred([instance.id])
+
+
+_BULK_NAMES_SPLIT_RE = re.compile(r'[,\r\n]')
+
+
+def _read_bulk_names(request):
+    """
+    Имена из CSV (поле file, первая колонка), JSON (список строк/объектов либо
+    {"names": [...]}) или строки names, где имена разделены запятыми или переводами строк.
+    """
+    upload = request.FILES.get('file')
+    if upload:
+        reader = csv.reader(io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace'))
+        for i, row in enumerate(reader):
+            if not row:
+                continue
+            if i == 0 and row[0].strip().lower() in ('name', 'имя'):
+                continue  # строка заголовка
+            yield row[0]
+        return
+    if hasattr(request.data, 'getlist'):
+        # Форма: одно или несколько полей names, каждое — имена через запятую или с новой строки
+        data = request.data.getlist('names')
+        for value in data:
+            yield from _BULK_NAMES_SPLIT_RE.split(value)
+        return
+    data = request.data.get('names') if isinstance(request.data, dict) else request.data
+    if isinstance(data, str):
+        yield from _BULK_NAMES_SPLIT_RE.split(data)
+        return
+    if data is not None and not isinstance(data, list):
+        raise ValueError("names: ожидается список имен или строка через запятую.")
+    for item in data or []:
+        yield item.get('name', '') if isinstance(item, dict) else str(item)
+
+
+def _names_in_directory(names):
+    # IN по lower(name) использует функциональный уникальный индекс
+    return StationDirectoryName.objects.alias(name_lower=Lower('name')).filter(name_lower__in=[n.lower() for n in names])
 
 
 class StationDirectoryNameViewSet(viewsets.ModelViewSet):
@@ -129,12 +393,92 @@ class StationDirectoryNameViewSet(viewsets.ModelViewSet):
     serializer_class = StationDirectoryNameSerializer
     permission_classes = [IsUploader]
 
+    BULK_BATCH_SIZE = 1000
 
-class ObservationViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk-import')
+    def bulk_import(self, request):
+        """
+        Массовый импорт справочника (тысячи строк за запрос).
+        Дубликаты без учета регистра — в файле и в БД — пропускаются.
+        """
+        names, seen, errors = [], set(), []
+        duplicates_in_file = 0
+        try:
+            for raw in _read_bulk_names(request):
+                name = (raw or '').strip()
+                if not name:
+                    continue
+                if len(name) > 255:
+                    errors.append(f"Слишком длинное имя (макс. 255 символов): '{name[:40]}...'")
+                    continue
+                key = name.lower()
+                if key in seen:
+                    duplicates_in_file += 1
+                    continue
+                seen.add(key)
+                names.append(name)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        existing = set()
+        for start in range(0, len(names), self.BULK_BATCH_SIZE):
+            chunk = names[start:start + self.BULK_BATCH_SIZE]
+            existing.update(n.lower() for n in _names_in_directory(chunk).values_list('name', flat=True))
+        new_names = [n for n in names if n.lower() not in existing]
+
+        # ignore_conflicts страхует от параллельной вставки тех же имен; bulk_create
+        # в этом режиме не сообщает, что вставлено, поэтому считаем записи повторным запросом
+        created_count = 0
+        with transaction.atomic():
+            for start in range(0, len(new_names), self.BULK_BATCH_SIZE):
+                chunk = new_names[start:start + self.BULK_BATCH_SIZE]
+                StationDirectoryName.objects.bulk_create(
+                    [StationDirectoryName(name=n) for n in chunk], ignore_conflicts=True,
+                )
+                created_count += _names_in_directory(chunk).count()
+
+        return Response({
+            'created_count': created_count,
+            'skipped_existing': len(names) - len(new_names),
+            'skipped_duplicates_in_file': duplicates_in_file,
+            'errors': errors,
+        }, status=status.HTTP_201_CREATED if created_count else status.HTTP_200_OK)
+
+
+class ObservationViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Список наблюдений с фильтрами: bbox, start/end, receiver, point_ids
+    (списки — через запятую). Интервал времени отсекает лишние секции таблицы.
+    """
     queryset = Observation.objects.select_related('source_file').all()
     serializer_class = ObservationSerializer
     permission_classes = [CanDownloadOrView]
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ObservationListSerializer
+        if self.action == 'retrieve':
+            return ObservationDetailSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            group_size = (
+                UploadedRinexFile.objects.filter(upload_group=OuterRef('source_file__upload_group'))
+                .order_by().values('upload_group').annotate(c=Count('pk')).values('c')
+            )
+            queryset = filter_observations(queryset, self.request.query_params).annotate(
+                _file_count_in_group=Subquery(group_size)
+            )
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        try:
+            return super().list(request, *args, **kwargs)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     def get_file_group(self, observation):
         if not observation.source_file:
             raise Http404("Для этого наблюдения нет исходного файла.")
@@ -173,7 +517,7 @@ class ObservationViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
             files_in_group = self.get_file_group(observation)
             
             urls = [{
-                'filename': os.path.basename(file_obj.file.name),
+                'filename': file_obj.download_name,
                 'url': request.build_absolute_uri(
                     reverse('rinex-file-download', kwargs={'pk': file_obj.pk})
                 )
@@ -13,7 +13,10 @@ from .api import (
     UploadedRinexFileViewSet
 )
 # <-- 1. Импортируем новый view для скачивания
-from .views import RinexUploadApiView, KMLUploadApiView, RinexDownloadApiView
+from .views import (
+    RinexUploadApiView, KMLUploadApiView, KMLImportJobApiView, KMLImportReportApiView,
+    RinexDownloadApiView, BulkRinexDownloadApiView,
+)
 
 router = DefaultRouter()
 router.register(r'points', PointViewSet, basename='point')
@@ -29,8 +32,11 @@ urlpatterns += [
     # API для файлов
     path('upload-rinex/', RinexUploadApiView.as_view(), name='api_upload_rinex'),
     path('upload-kml/', KMLUploadApiView.as_view(), name='api_upload_kml'),
+    path('upload-kml/<uuid:job_id>/', KMLImportJobApiView.as_view(), name='api_kml_import_job'),
+    path('upload-kml/<uuid:job_id>/report/', KMLImportReportApiView.as_view(), name='api_kml_import_report'),
     
 
+    path('download/rinex/bulk/', BulkRinexDownloadApiView.as_view(), name='api_download_rinex_bulk'),
     path('download/rinex/<uuid:group_id>/', RinexDownloadApiView.as_view(), name='api_download_rinex_group'),
 
     # API для аутентификации
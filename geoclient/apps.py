@@ -1,6 +1,6 @@
 # geoclient/apps.py
 from django.apps import AppConfig
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, m2m_changed, post_save, pre_delete, post_delete
 
 def setup_groups_and_permissions(sender, **kwargs):
     """
@@ -71,4 +71,18 @@ class GeoclientConfig(AppConfig):
 
     def ready(self):
         # Подключаем наш сигнал к `post_migrate`
-        post_migrate.connect(setup_groups_and_permissions, sender=self)
\ No newline at end of file
+        post_migrate.connect(setup_groups_and_permissions, sender=self)
+
+        # Сброс кэша ролей при изменении групп пользователей
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.models import Group
+        from rest_framework.authtoken.models import Token
+        from . import roles, authentication
+        User = get_user_model()
+        m2m_changed.connect(roles.on_user_groups_changed, sender=User.groups.through)
+        post_save.connect(roles.on_group_changed, sender=Group)
+        pre_delete.connect(roles.on_group_changed, sender=Group)
+
+        # Сброс кэша токенов при выходе и изменении пользователя
+        post_delete.connect(authentication.on_token_deleted, sender=Token)
+        post_save.connect(authentication.on_user_saved, sender=User)
\ No newline at end of file
@@ -0,0 +1,173 @@
+# geoclient/archives.py
+
+import hashlib
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+
+from .storage import open_stored
+
+# Размер блока чтения/отдачи. Память на один поток скачивания ограничена
+# несколькими такими блоками независимо от размера архива.
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """
+    Несикабельный (non-seekable) приемник для zipfile.
+    zipfile сам переключается в режим data descriptor, а мы забираем
+    накопленные байты после каждого записанного блока.
+    """
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """
+    Потоковая сборка ZIP-архива без записи на диск и без буфера в памяти.
+    Все методы — генераторы байтов, их удобно объединять через `yield from`:
+
+        zs = ZipStream()
+        digest = yield from zs.write_file('A/a.20o', path)
+        yield from zs.write_bytes('manifest.json', data)
+        yield from zs.close()
+    """
+    def __init__(self, compression=zipfile.ZIP_DEFLATED, chunk_size=STREAM_CHUNK_SIZE):
+        self._buffer = _ZipStreamBuffer()
+        self._zip = zipfile.ZipFile(self._buffer, 'w', compression=compression, allowZip64=True)
+        self.chunk_size = chunk_size
+
+    def _zipinfo(self, arcname, date_time=None):
+        info = zipfile.ZipInfo(arcname, date_time=(date_time or datetime.now()).timetuple()[:6])
+        info.compress_type = self._zip.compression
+        info.external_attr = 0o644 << 16
+        return info
+
+    def write_stream(self, arcname, source, date_time=None):
+        """Копирует бинарный поток в архив. Возвращает (sha256, размер)."""
+        sha256 = hashlib.sha256()
+        size = 0
+        # force_zip64: размер заранее неизвестен, а файлы могут быть > 4 ГБ
+        with self._zip.open(self._zipinfo(arcname, date_time), 'w', force_zip64=True) as dest:
+            while True:
+                chunk = source.read(self.chunk_size)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                size += len(chunk)
+                dest.write(chunk)
+                data = self._buffer.drain()
+                if data:
+                    yield data
+        yield self._buffer.drain()
+        return sha256.hexdigest(), size
+
+    def write_chunks(self, arcname, chunks, date_time=None):
+        """Содержимое, создаваемое на лету: байты из итератора chunks."""
+        with self._zip.open(self._zipinfo(arcname, date_time), 'w', force_zip64=True) as dest:
+            for chunk in chunks:
+                dest.write(chunk)
+                data = self._buffer.drain()
+                if data:
+                    yield data
+        yield self._buffer.drain()
+
+    def write_file(self, arcname, path, opener=open_stored):
+        """Файл хранилища; сжатые при хранении файлы распаковываются на лету."""
+        mtime = datetime.fromtimestamp(os.path.getmtime(path))
+        with opener(path) as source:
+            result = yield from self.write_stream(arcname, source, date_time=mtime)
+        return result
+
+    def write_bytes(self, arcname, data):
+        result = yield from self.write_stream(arcname, io.BytesIO(data))
+        return result
+
+    def close(self):
+        self._zip.close()
+        yield self._buffer.drain()
+
+
+def iter_group_archive(rinex_files):
+    """Архив одного комплекта (O/N/G) — имена файлов без подпапок."""
+    zs = ZipStream()
+    for rf in rinex_files:
+        if rf.file and os.path.exists(rf.file.path):
+            yield from zs.write_file(rf.download_name, rf.file.path)
+    yield from zs.close()
+
+
+def iter_bulk_archive(file_rows):
+    """
+    Единый архив для набора пунктов.
+
+    file_rows — итерируемый набор (point_id, UploadedRinexFile), упорядоченный
+    по пункту. Файлы раскладываются по папкам станций, одинаковые по
+    `file_hash` файлы пишутся один раз, в конце добавляются manifest.json
+    и SHA256SUMS (формат `sha256sum -c`).
+    Память растет только с числом записей манифеста, но не с объемом данных.
+    """
+    zs = ZipStream()
+    manifest = []
+    written_by_hash = {}
+    used_names = set()
+
+    for point_id, rf in file_rows:
+        base_name = rf.download_name if rf.file else None
+        entry = {
+            'point_id': point_id,
+            'file_id': rf.pk,
+            'upload_group': str(rf.upload_group) if rf.upload_group else None,
+            'filename': base_name,
+        }
+
+        if rf.file_hash and rf.file_hash in written_by_hash:
+            entry['duplicate_of'] = written_by_hash[rf.file_hash]
+            entry['sha256'] = rf.file_hash
+            manifest.append(entry)
+            continue
+
+        if not base_name or not os.path.exists(rf.file.path):
+            entry['missing'] = True
+            manifest.append(entry)
+            continue
+
+        arcname = f"{point_id}/{base_name}"
+        suffix = 1
+        while arcname in used_names:
+            stem, ext = os.path.splitext(base_name)
+            arcname = f"{point_id}/{stem}_{suffix}{ext}"
+            suffix += 1
+        used_names.add(arcname)
+
+        digest, size = yield from zs.write_file(arcname, rf.file.path)
+        entry.update({'path': arcname, 'sha256': digest, 'size': size})
+        if rf.file_hash and rf.file_hash != digest:
+            # Содержимое на диске не совпадает с хэшем при загрузке
+            entry['stored_sha256'] = rf.file_hash
+        written_by_hash[rf.file_hash or digest] = arcname
+        manifest.append(entry)
+
+    checksums = ''.join(f"{e['sha256']}  {e['path']}\n" for e in manifest if e.get('path'))
+    manifest_doc = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'files': manifest,
+    }
+    yield from zs.write_bytes('manifest.json', json.dumps(manifest_doc, ensure_ascii=False, indent=2).encode('utf-8'))
+    yield from zs.write_bytes('SHA256SUMS', checksums.encode('utf-8'))
+    yield from zs.close()
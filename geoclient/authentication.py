@@ -0,0 +1,102 @@
+# geoclient/authentication.py
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+# Как и для ролей: общий кэш + короткая копия в процессе.
+TOKEN_CACHE_TTL = getattr(settings, 'GEOCLIENT_TOKEN_CACHE_TTL', 60)
+TOKEN_LOCAL_TTL = getattr(settings, 'GEOCLIENT_TOKEN_LOCAL_TTL', 10)
+
+# В кэш попадают только эти поля: хэш пароля и персональные данные там не хранятся
+CACHED_USER_FIELDS = ('username', 'is_active', 'is_staff', 'is_superuser')
+
+_local_tokens = {}
+_local_lock = threading.Lock()
+
+
+def _cache_key(key):
+    # Сам токен в ключ кэша не попадает
+    return 'geoclient:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _user_to_cache(user):
+    data = {name: getattr(user, name) for name in CACHED_USER_FIELDS}
+    data[user._meta.pk.attname] = user.pk
+    return data
+
+
+def _user_from_cache(data):
+    # Остальные поля отложены (deferred) и при обращении дочитываются из БД
+    model = get_user_model()
+    names = [f.attname for f in model._meta.concrete_fields if f.attname in data]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [data[name] for name in names])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кэшированием пары токен -> пользователь.
+    При прогретом кэше аутентификация не делает запросов к БД.
+    Кэш сбрасывается при выходе, удалении токена и сохранении пользователя
+    (в т.ч. при деактивации), см. invalidate_token / invalidate_user_tokens.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        now = time.monotonic()
+
+        entry = _local_tokens.get(cache_key)
+        if entry and entry[0] > now:
+            data = entry[1]
+        else:
+            data = cache.get(cache_key)
+            if data is None:
+                user, _ = super().authenticate_credentials(key)
+                data = _user_to_cache(user)
+                cache.set(cache_key, data, TOKEN_CACHE_TTL)
+            with _local_lock:
+                _local_tokens[cache_key] = (now + TOKEN_LOCAL_TTL, data)
+
+        if not data['is_active']:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        # Каждому запросу — свой объект, чтобы атрибуты запроса не попадали в кэш
+        user = _user_from_cache(data)
+        return (user, Token(key=key, user=user))
+
+
+def invalidate_token(key):
+    cache_key = _cache_key(key)
+    with _local_lock:
+        _local_tokens.pop(cache_key, None)
+    cache.delete(cache_key)
+
+
+def invalidate_user_tokens(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+def clear_local_tokens():
+    with _local_lock:
+        _local_tokens.clear()
+
+
+# --- Сигналы ---
+
+def on_token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+def on_user_saved(sender, instance, created, **kwargs):
+    # Деактивация, смена пароля или имени — данные в кэше устарели
+    if not created:
+        invalidate_user_tokens(instance.pk)
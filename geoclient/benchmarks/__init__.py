@@ -0,0 +1,25 @@
+# geoclient/benchmarks/__init__.py
+"""
+Бенчмарки. Каждый модуль содержит функцию run(iterations, size) -> dict
+с результатами (None — значение по умолчанию модуля); запуск через
+`python manage.py benchmark <имя>` или `benchmark all --output results.json`.
+Данные создаются синтетически (synthetic.py) и откатываются, портал ФППД
+заменяется локальной заглушкой (fppd_stub.py).
+"""
+
+from importlib import import_module
+
+BENCHMARKS = {
+    'auth': 'geoclient.benchmarks.auth',
+    'group_download': 'geoclient.benchmarks.group_download',
+    'ingest': 'geoclient.benchmarks.ingest',
+    'kml_import': 'geoclient.benchmarks.kml_import',
+    'points_list': 'geoclient.benchmarks.points_list',
+    'rinex_header': 'geoclient.benchmarks.rinex_header',
+    'spatial': 'geoclient.benchmarks.spatial',
+}
+
+
+def run_benchmark(name, **options):
+    # Незаданные параметры не передаются: у каждого бенчмарка свои значения по умолчанию
+    return import_module(BENCHMARKS[name]).run(**{k: v for k, v in options.items() if v is not None})
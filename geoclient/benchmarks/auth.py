@@ -0,0 +1,60 @@
+# geoclient/benchmarks/auth.py
+
+import time
+
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from geoclient.api import UserStatusView
+from geoclient.authentication import CachedTokenAuthentication, clear_local_tokens
+from geoclient.roles import clear_local_roles
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _measure(view, request_factory, key, iterations):
+    # Прогрев (первый запрос заполняет кэши)
+    view(request_factory.get('/api/user-status/', HTTP_AUTHORIZATION=f'Token {key}'))
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            response = view(request_factory.get('/api/user-status/', HTTP_AUTHORIZATION=f'Token {key}'))
+            assert response.status_code == 200, response.status_code
+        elapsed = time.perf_counter() - started
+    return {
+        'requests_per_second': round(iterations / elapsed, 1),
+        'queries_per_request': round(len(queries) / iterations, 2),
+    }
+
+
+def run(iterations=1000, size=None):
+    """
+    Запросы к /api/user-status/ (аутентификация + роли) со стандартной
+    TokenAuthentication и с CachedTokenAuthentication. Данные откатываются.
+    """
+    factory = APIRequestFactory()
+    results = {}
+    try:
+        with transaction.atomic():
+            user = User.objects.create_user('benchmark-auth-user', password='benchmark')
+            user.groups.add(Group.objects.get_or_create(name='Viewer')[0])
+            token = Token.objects.create(user=user)
+
+            for label, auth_class in (('token', TokenAuthentication), ('cached_token', CachedTokenAuthentication)):
+                clear_local_tokens()
+                clear_local_roles()
+                view = UserStatusView.as_view(authentication_classes=[auth_class])
+                results[label] = _measure(view, factory, token.key, iterations)
+            raise _Rollback
+    except _Rollback:
+        pass
+
+    results['speedup'] = round(results['cached_token']['requests_per_second'] / results['token']['requests_per_second'], 2)
+    results['iterations'] = iterations
+    return results
@@ -0,0 +1,57 @@
+# geoclient/benchmarks/fppd_stub.py
+"""
+Локальная заглушка портала ФППД: HTTP-сервер на 127.0.0.1 с фиксированным ответом
+поиска пунктов. Загрузка в бенчмарках не зависит от сети и доступности портала,
+но запрос из parsers._fetch_fppd_metadata выполняется по-настоящему.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test.utils import override_settings
+
+STUB_ENTITY = {
+    'properties': {
+        'index': 'N-37-1', 'name': 'Синтетический', 'mark': '0001', 'class_ref': 5,
+        'guid': '00000000-0000-0000-0000-000000000000', 'surveyyear': 1970, 'subtype_ref': 110,
+    },
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = json.dumps({'entities': [STUB_ENTITY]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def fppd_stub(latency=0.0):
+    """
+    Запускает заглушку и подставляет ее адрес в GEOCLIENT_FPPD_SEARCH_URL.
+    latency — искусственная задержка ответа, с. Отдает сервер: server.requests — число запросов.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.requests = 0
+    server.latency = latency
+    thread = threading.Thread(target=server.serve_forever, name='geoclient-fppd-stub', daemon=True)
+    thread.start()
+    try:
+        with override_settings(GEOCLIENT_FPPD_SEARCH_URL=f'http://127.0.0.1:{server.server_port}/api/v1/GGSStation/Search'):
+            yield server
+    finally:
+        server.shutdown()
+        server.server_close()
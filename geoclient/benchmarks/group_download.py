@@ -0,0 +1,57 @@
+# geoclient/benchmarks/group_download.py
+
+import os
+import tempfile
+import time
+import uuid
+
+from django.core.files import File
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from geoclient.benchmarks.support import benchmark_user, latency_summary, rolled_back, temporary_media
+from geoclient.benchmarks.synthetic import station_corpus
+from geoclient.models import rinex_file_type
+from geoclient.storage import hash_upload, store_rinex_upload
+from geoclient.views import RinexDownloadApiView
+
+
+def _store_set(paths):
+    group = uuid.uuid4()
+    for path in paths:
+        with open(path, 'rb') as f:
+            content = File(f, name=os.path.basename(path))
+            store_rinex_upload(content, hash_upload(content), file_type=rinex_file_type(path), upload_group=group)
+    return group
+
+
+def run(iterations=None, size=None):
+    """
+    Скачивание комплекта одним ZIP (GET /api/download/rinex/<group>/, потоковый архив):
+    пропускная способность на size комплектах O/N/G суточных 30-секундных файлов
+    (по умолчанию 3), iterations скачиваний (по умолчанию 10). Данные откатываются.
+    """
+    size = size or 3
+    iterations = iterations or 10
+    view = RinexDownloadApiView.as_view()
+    factory = APIRequestFactory()
+    with tempfile.TemporaryDirectory() as directory, temporary_media(), rolled_back():
+        user = benchmark_user('Viewer')
+        groups = [_store_set(paths) for paths in station_corpus(directory, size, epochs=2880).values()]
+        samples, total = [], 0
+        started = time.perf_counter()
+        for i in range(iterations):
+            request = factory.get('/api/download/rinex/')
+            force_authenticate(request, user)
+            request_started = time.perf_counter()
+            response = view(request, group_id=groups[i % len(groups)])
+            assert response.status_code == 200, response.status_code
+            total += sum(len(chunk) for chunk in response.streaming_content)
+            samples.append((time.perf_counter() - request_started) * 1000)
+        elapsed = time.perf_counter() - started
+    return {
+        'sets': size,
+        'iterations': iterations,
+        'archive_megabytes': round(total / iterations / 1e6, 2),
+        'megabytes_per_second': round(total / 1e6 / elapsed, 1),
+        'download': latency_summary(samples),
+    }
@@ -0,0 +1,71 @@
+# geoclient/benchmarks/ingest.py
+
+import json
+import os
+import tempfile
+import time
+from contextlib import ExitStack
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from geoclient.benchmarks.fppd_stub import fppd_stub
+from geoclient.benchmarks.support import benchmark_user, latency_summary, rolled_back, temporary_media
+from geoclient.benchmarks.synthetic import station_corpus
+from geoclient.models import GeodeticPoint, UploadedRinexFile
+from geoclient.views import RinexUploadApiView
+
+
+def _upload(view, factory, user, paths):
+    with ExitStack() as stack:
+        files = [stack.enter_context(open(path, 'rb')) for path in paths]
+        request = factory.post('/api/upload-rinex/', {'rinex_files': files}, format='multipart')
+        force_authenticate(request, user)
+        response = view(request)
+    assert response.status_code == 200, response.status_code
+    return json.loads(response.content)
+
+
+def run(iterations=None, size=None):
+    """
+    Полный путь загрузки через RinexUploadApiView: комплекты O/N/G RINEX 2/3 для size станций
+    (по умолчанию 20) по iterations суточных сессий (по умолчанию 2) — хэширование, хранение,
+    разбор навигации и наблюдений, поиск/слияние пунктов, обогащение из ФППД (локальная заглушка),
+    контроль качества. Каждая сессия — отдельный запрос, как из интерфейса. Данные откатываются.
+    """
+    size = size or 20
+    sessions = iterations or 2
+    with tempfile.TemporaryDirectory() as directory:
+        sets = station_corpus(directory, size, sessions=sessions, epochs=240)
+        total_bytes = sum(os.path.getsize(path) for paths in sets.values() for path in paths)
+
+        view = RinexUploadApiView.as_view()
+        factory = APIRequestFactory()
+        samples, created = [], 0
+        with fppd_stub() as stub, temporary_media(), rolled_back():
+            user = benchmark_user()
+            points_before, files_before = GeodeticPoint.objects.count(), UploadedRinexFile.objects.count()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for paths in sets.values():
+                    request_started = time.perf_counter()
+                    created += _upload(view, factory, user, paths)['total_created_count']
+                    samples.append((time.perf_counter() - request_started) * 1000)
+                elapsed = time.perf_counter() - started
+            results = {
+                'stations': size,
+                'sessions_per_station': sessions,
+                'files': sum(len(paths) for paths in sets.values()),
+                'megabytes': round(total_bytes / 1e6, 1),
+                'seconds': round(elapsed, 2),
+                'sets_per_second': round(len(sets) / elapsed, 2),
+                'megabytes_per_second': round(total_bytes / 1e6 / elapsed, 2),
+                'queries_per_set': round(len(queries) / len(sets), 1),
+                'request': latency_summary(samples),
+                'observations_created': created,
+                'points_created': GeodeticPoint.objects.count() - points_before,
+                'files_stored': UploadedRinexFile.objects.count() - files_before,
+                'fppd_requests': stub.requests,
+            }
+    return results
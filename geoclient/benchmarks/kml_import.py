@@ -0,0 +1,60 @@
+# geoclient/benchmarks/kml_import.py
+
+import io
+import os
+import random
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+from geoclient.benchmarks.support import insert_points, rolled_back
+from geoclient.kml_import import import_kml
+from geoclient.models import GeodeticPoint
+
+# Доля Placemark'ов вдали от пунктов (не найдены при сопоставлении)
+UNMATCHED_SHARE = 0.05
+JITTER_DEG = 0.00002  # ~2 м
+
+
+def write_kml(path, coordinates, seed=0):
+    """KML экспорта Geoeye: Placemark рядом с каждой точкой coordinates плюс UNMATCHED_SHARE чужих."""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2"><Document><Folder>\n')
+        extra = [(rng.uniform(-170, -60), rng.uniform(-50, 50)) for _ in range(int(len(coordinates) * UNMATCHED_SHARE))]
+        for i, (lon, lat) in enumerate(list(coordinates) + extra):
+            description = f"индекс: N-{i % 60}-{i % 144}, класс: ГГС {1 + i % 4}, центр: {100 + i % 90} оп.з., номер марки: {i}"
+            f.write(f'<Placemark><name>{escape(f"Пункт {i}")}</name><description>{escape(description)}</description>'
+                    f'<Point><coordinates>{lon + rng.uniform(-JITTER_DEG, JITTER_DEG):.8f},'
+                    f'{lat + rng.uniform(-JITTER_DEG, JITTER_DEG):.8f},0</coordinates></Point></Placemark>\n')
+        f.write('</Folder></Document></kml>\n')
+    return path
+
+
+def _timed_import(path, placemarks):
+    started = time.perf_counter()
+    counts = import_kml(path, report=io.StringIO())
+    elapsed = time.perf_counter() - started
+    return {'seconds': round(elapsed, 2), 'placemarks_per_second': round(placemarks / elapsed, 1), **counts}
+
+
+def run(iterations=None, size=None):
+    """
+    Импорт KML и KMZ (kml_import.import_kml): size пунктов каталога (по умолчанию 50 000)
+    и столько же Placemark'ов рядом с ними плюс 5% без пары. Данные откатываются.
+    """
+    size = size or 50_000
+    results = {'points': size}
+    with tempfile.TemporaryDirectory() as directory, rolled_back():
+        insert_points(size)
+        coordinates = [(p.x, p.y) for p in GeodeticPoint.objects.filter(id__startswith='BENCH').values_list('location', flat=True).iterator()]
+        kml_path = write_kml(os.path.join(directory, 'points.kml'), coordinates)
+        kmz_path = os.path.join(directory, 'points.kmz')
+        with zipfile.ZipFile(kmz_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.write(kml_path, 'doc.kml')
+        results['kml_megabytes'] = round(os.path.getsize(kml_path) / 1e6, 1)
+        placemarks = len(coordinates) + int(len(coordinates) * UNMATCHED_SHARE)
+        results['kml'] = _timed_import(kml_path, placemarks)
+        results['kmz'] = _timed_import(kmz_path, placemarks)
+    return results
@@ -0,0 +1,41 @@
+# geoclient/benchmarks/points_list.py
+
+import random
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from geoclient.api import PointViewSet
+from geoclient.benchmarks.support import benchmark_user, insert_points, rolled_back, timed_requests
+
+OBSERVATIONS_PER_POINT = 3
+
+
+def run(iterations=None, size=None):
+    """
+    Список пунктов для карты (GET /api/points/, GeoJSON со статистикой и последним наблюдением):
+    задержка, SQL-запросы и объем страницы на каталоге из size пунктов (по умолчанию 10 000)
+    по OBSERVATIONS_PER_POINT наблюдения. Страницы выбираются случайно; данные откатываются.
+    """
+    size = size or 10_000
+    iterations = iterations or 50
+    random.seed(42)
+    view = PointViewSet.as_view({'get': 'list'})
+    factory = APIRequestFactory()
+    results = {'points': size, 'iterations': iterations}
+    with rolled_back():
+        user = benchmark_user('Viewer')
+        insert_points(size, OBSERVATIONS_PER_POINT)
+        pages = max(size // 100, 1)
+        sizes = []
+
+        def list_page():
+            request = factory.get('/api/points/', {'page': random.randint(1, pages)})
+            force_authenticate(request, user)
+            response = view(request)
+            response.render()
+            assert response.status_code == 200, response.status_code
+            sizes.append(len(response.content))
+
+        results['list_page'] = timed_requests(list_page, iterations)
+        results['page_kilobytes'] = round(sum(sizes) / len(sizes) / 1024, 1)
+    return results
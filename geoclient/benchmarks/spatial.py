@@ -0,0 +1,56 @@
+# geoclient/benchmarks/spatial.py
+
+import random
+import statistics
+import time
+
+from django.db import connection, transaction
+
+from geoclient.models import GeodeticPoint
+from geoclient.serializers import NearbyPointSerializer
+from geoclient.spatial import nearest_points, points_within
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _latencies(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        lon, lat = random.uniform(35, 135), random.uniform(47, 68)
+        started = time.perf_counter()
+        NearbyPointSerializer(list(func(lon, lat)), many=True).data
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 2),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 2),
+        'max_ms': round(samples[-1], 2),
+    }
+
+
+def run(iterations=200, size=None):
+    """
+    Задержка /nearest и /within на синтетическом каталоге (по умолчанию 1 млн пунктов).
+    Точки вставляются одним INSERT ... SELECT generate_series и откатываются.
+    """
+    size = size or 1_000_000
+    random.seed(42)
+    results = {'points': size, 'iterations': iterations}
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {GeodeticPoint._meta.db_table} (id, location, point_type, created_at, updated_at) "
+                    "SELECT 'BENCH' || g, ST_SetSRID(ST_MakePoint(30 + random() * 110, 45 + random() * 25), 4326), "
+                    "'default', now(), now() FROM generate_series(1, %s) AS g",
+                    [size],
+                )
+                cursor.execute(f"ANALYZE {GeodeticPoint._meta.db_table}")
+            results['nearest_k10'] = _latencies(lambda lon, lat: nearest_points(lon, lat, 10), iterations)
+            results['within_5km'] = _latencies(lambda lon, lat: points_within(lon, lat, 5000), iterations)
+            raise _Rollback
+    except _Rollback:
+        pass
+    return results
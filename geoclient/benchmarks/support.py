@@ -0,0 +1,100 @@
+# geoclient/benchmarks/support.py
+"""
+Общее для бенчмарков уровня запросов: откат данных, временное хранилище файлов,
+пользователь-загрузчик, массовая вставка пунктов и сводка задержек.
+"""
+
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from geoclient.models import GeodeticPoint, Observation, PointStatistics
+from geoclient.roles import clear_local_roles
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Транзакция, которая всегда откатывается (после замеров в БД ничего не остается)."""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+@contextmanager
+def temporary_media():
+    """MEDIA_ROOT во временном каталоге: файлы загрузок удаляются вместе с ним."""
+    with tempfile.TemporaryDirectory() as directory, override_settings(MEDIA_ROOT=directory):
+        yield directory
+
+
+def benchmark_user(group='Uploader'):
+    user = User.objects.create_user(f'benchmark-{group.lower()}', password='benchmark')
+    user.groups.add(Group.objects.get_or_create(name=group)[0])
+    clear_local_roles()
+    return user
+
+
+def insert_points(size, observations_per_point=0):
+    """
+    size пунктов 'BENCH<n>' (юг России — Сибирь) одним INSERT ... SELECT generate_series,
+    по observations_per_point суточных наблюдений на пункт и строки PointStatistics.
+    """
+    points, observations = GeodeticPoint._meta.db_table, Observation._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {points} (id, location, point_type, created_at, updated_at) "
+            "SELECT 'BENCH' || g, ST_SetSRID(ST_MakePoint(30 + random() * 110, 45 + random() * 25), 4326), "
+            "(ARRAY['ggs','survey','astro','leveling','default'])[1 + g % 5], now(), now() "
+            "FROM generate_series(1, %s) AS g",
+            [size],
+        )
+        if observations_per_point:
+            cursor.execute(
+                f"INSERT INTO {observations} (point_id, location, timestamp, duration, raw_x, raw_y, raw_z, "
+                "ellipsoidal_height, receiver_number, antenna_height) "
+                f"SELECT p.id, p.location, timestamp '2024-01-01' + s * interval '1 day', interval '1 hour', "
+                "2850000, 2200000, 5250000, 150, 'REC' || s, 1.5 "
+                f"FROM {points} p CROSS JOIN generate_series(1, %s) AS s WHERE p.id LIKE 'BENCH%%'",
+                [observations_per_point],
+            )
+        cursor.execute(
+            f"INSERT INTO {PointStatistics._meta.db_table} (point_id, observation_count, first_observation, "
+            "last_observation, total_duration, receiver_count, updated_at) "
+            f"SELECT p.id, %s, timestamp '2024-01-02', timestamp '2024-01-01' + %s * interval '1 day', "
+            f"%s * interval '1 hour', %s, now() FROM {points} p WHERE p.id LIKE 'BENCH%%'",
+            [observations_per_point, observations_per_point, observations_per_point, min(observations_per_point, 1)],
+        )
+        cursor.execute(f"ANALYZE {points}")
+
+
+def latency_summary(samples):
+    samples = sorted(samples)
+    return {
+        'p50_ms': round(statistics.median(samples), 2),
+        'p95_ms': round(samples[max(int(len(samples) * 0.95) - 1, 0)], 2),
+        'max_ms': round(samples[-1], 2),
+    }
+
+
+def timed_requests(call, iterations):
+    """Задержки и число SQL-запросов на вызов call() (после одного прогрева)."""
+    call()
+    samples = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - started) * 1000)
+    return {**latency_summary(samples), 'queries_per_request': round(len(queries) / iterations, 2)}
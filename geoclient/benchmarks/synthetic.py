@@ -0,0 +1,216 @@
+# geoclient/benchmarks/synthetic.py
+"""
+Синтетические RINEX-файлы для бенчмарков: детерминированные (random.Random(seed)),
+с правдоподобной структурой заголовка и тела. Наблюдения (O), навигация GPS (N)
+и ГЛОНАСС (G) в RINEX 2.11 и 3.04; station_corpus — комплекты O/N/G для многих станций.
+"""
+
+import math
+import os
+import random
+from datetime import datetime, timedelta
+
+V2_TYPES = ['C1', 'L1', 'L2', 'P2', 'S1', 'S2']
+GPS_EPOCH = datetime(1980, 1, 6)
+NAV_INTERVAL = timedelta(hours=2)
+V3_TYPES = {'G': ['C1C', 'L1C', 'S1C', 'C2W', 'L2W', 'S2W'], 'R': ['C1C', 'L1C', 'S1C', 'C2P', 'L2P', 'S2P']}
+
+
+def _line(content, label):
+    return f"{content:<60}{label}"
+
+
+def _time(moment):
+    seconds = moment.second + moment.microsecond / 1e6
+    return f"{moment.year:6d}{moment.month:6d}{moment.day:6d}{moment.hour:6d}{moment.minute:6d}{seconds:13.7f}     GPS"
+
+
+def obs_header(version, marker, xyz, first, last, interval, comments=0):
+    """Строки заголовка O-файла RINEX 2.11 или 3.04."""
+    lines = [
+        _line(f"{version:9.2f}           OBSERVATION DATA    {'M' if version >= 3 else 'M (MIXED)'}", 'RINEX VERSION / TYPE'),
+        _line(f"{'synthetic':<20}{'geoclient':<20}{first:%Y%m%d %H%M%S} UTC", 'PGM / RUN BY / DATE'),
+    ]
+    lines += [_line(f"synthetic comment {i}", 'COMMENT') for i in range(comments)]
+    lines += [
+        _line(marker, 'MARKER NAME'),
+        _line(marker, 'MARKER NUMBER'),
+        _line(f"{'observer':<20}{'agency':<40}", 'OBSERVER / AGENCY'),
+        _line(f"{'5' + marker[:4]:<20}{'SYNTHETIC RECEIVER':<20}{'1.0':<20}", 'REC # / TYPE / VERS'),
+        _line(f"{'A' + marker[:4]:<20}{'SYNTHETIC ANTENNA':<20}", 'ANT # / TYPE'),
+        _line(''.join(f"{v:14.4f}" for v in xyz), 'APPROX POSITION XYZ'),
+        _line(''.join(f"{v:14.4f}" for v in (1.5, 0.0, 0.0)), 'ANTENNA: DELTA H/E/N'),
+    ]
+    if version >= 3:
+        lines += [_line(f"{system}  {len(codes):3d}" + ''.join(f" {c}" for c in codes), 'SYS / # / OBS TYPES')
+                  for system, codes in V3_TYPES.items()]
+    else:
+        lines.append(_line(f"{len(V2_TYPES):6d}" + ''.join(f"{c:>6}" for c in V2_TYPES), '# / TYPES OF OBSERV'))
+    lines += [
+        _line(f"{interval:10.3f}", 'INTERVAL'),
+        _line(_time(first), 'TIME OF FIRST OBS'),
+        _line(_time(last), 'TIME OF LAST OBS'),
+        _line('', 'END OF HEADER'),
+    ]
+    return lines
+
+
+def _obs_value(rng, base):
+    return f"{base + rng.uniform(0, 1000):14.3f}  "
+
+
+def obs_body(version, first, epochs, interval, satellites, rng):
+    """Строки тела O-файла: satellites — список ('G', 5), ..."""
+    for k in range(epochs):
+        moment = first + timedelta(seconds=k * interval)
+        if version >= 3:
+            yield f"> {moment:%Y %m %d %H %M} {moment.second:10.7f}  0{len(satellites):3d}"
+            for system, prn in satellites:
+                yield f"{system}{prn:02d}" + ''.join(_obs_value(rng, 2e7) for _ in V3_TYPES[system]).rstrip()
+        else:
+            sats = ''.join(f"{system}{prn:02d}" for system, prn in satellites)
+            yield f" {moment:%y %m %d %H %M} {moment.second:10.7f}  0{len(satellites):3d}{sats[:36]}"
+            for i in range(36, len(sats), 36):
+                yield ' ' * 32 + sats[i:i + 36]
+            for _ in satellites:
+                values = [_obs_value(rng, 2e7) for _ in V2_TYPES]
+                for i in range(0, len(values), 5):
+                    yield ''.join(values[i:i + 5]).rstrip()
+
+
+def write_obs_file(path, version=3.04, marker='SYNT', epochs=10, interval=30.0, satellites=None, seed=0,
+                   first=None, comments=0, xyz=(2850000.0, 2200000.0, 5250000.0), line_ending='\n'):
+    """Пишет O-файл; возвращает путь."""
+    rng = random.Random(seed)
+    first = first or datetime(2024, 1, 1)
+    satellites = satellites or [('G', p) for p in range(1, 11)] + [('R', p) for p in range(1, 9)]
+    last = first + timedelta(seconds=(epochs - 1) * interval)
+    with open(path, 'w', newline='') as f:
+        for line in obs_header(version, marker, xyz, first, last, interval, comments):
+            f.write(line + line_ending)
+        for line in obs_body(version, first, epochs, interval, satellites, rng):
+            f.write(line + line_ending)
+    return path
+
+
+def obs_corpus(directory, count, epochs=20, seed=0):
+    """count O-файлов вперемешку RINEX 2/3, LF/CRLF, с разным числом комментариев."""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        version = 3.04 if i % 2 else 2.11
+        marker = f"S{i:03d}"[-4:]
+        ext = '.rnx' if version >= 3 else '.24o'
+        paths.append(write_obs_file(
+            os.path.join(directory, f"{marker}{i:04d}{ext}"), version=version, marker=marker, epochs=epochs,
+            seed=seed + i, comments=rng.randint(0, 30), line_ending='\r\n' if i % 5 == 0 else '\n',
+            xyz=(2850000.0 + rng.uniform(-1e5, 1e5), 2200000.0 + rng.uniform(-1e5, 1e5), 5250000.0),
+        ))
+    return paths
+
+
+def _nav_value(value):
+    return f"{value:19.12E}".replace('E', 'D')
+
+
+def _gps_values(rng, moment):
+    """27 значений записи GPS (см. rinex_nav._GPS_FIELDS) для момента moment."""
+    since_epoch = (moment - GPS_EPOCH).total_seconds()
+    week, toe = divmod(since_epoch, 7 * 86400)
+    return [
+        rng.uniform(-1e-4, 1e-4), rng.uniform(-1e-11, 1e-11), 0.0,
+        float(rng.randint(0, 255)), rng.uniform(-100, 100), rng.uniform(3e-9, 5e-9), rng.uniform(-3.1, 3.1),
+        rng.uniform(-5e-6, 5e-6), rng.uniform(0.001, 0.02), rng.uniform(-5e-6, 5e-6), rng.uniform(5153.5, 5153.8),
+        toe, rng.uniform(-2e-7, 2e-7), rng.uniform(-3.1, 3.1), rng.uniform(-2e-7, 2e-7),
+        rng.uniform(0.93, 0.99), rng.uniform(150, 350), rng.uniform(-3.1, 3.1), rng.uniform(-8.5e-9, -7.5e-9),
+        rng.uniform(-5e-10, 5e-10), 1.0, float(week), 0.0,
+        2.0, 0.0, rng.uniform(-1e-8, 1e-8), float(rng.randint(0, 1023)),
+        toe - 18, 4.0,
+    ]
+
+
+def _glonass_values(rng, moment):
+    """15 значений записи ГЛОНАСС (см. rinex_nav._GLONASS_FIELDS): координаты и скорости в км."""
+    return [
+        rng.uniform(-1e-4, 1e-4), rng.uniform(-1e-11, 1e-11), float(moment.hour * 3600 + moment.minute * 60),
+        rng.uniform(-2.5e4, 2.5e4), rng.uniform(-3.5, 3.5), 0.0, 0.0,
+        rng.uniform(-2.5e4, 2.5e4), rng.uniform(-3.5, 3.5), 0.0, float(rng.randint(-7, 6)),
+        rng.uniform(-2.5e4, 2.5e4), rng.uniform(-3.5, 3.5), 0.0, 0.0,
+    ]
+
+
+def nav_lines(version, system, first, hours, satellites, rng):
+    """Строки навигационного файла системы 'G' (GPS, N-файл) или 'R' (ГЛОНАСС, G-файл)."""
+    if version >= 3:
+        yield _line(f"{version:9.2f}           N: GNSS NAV DATA    {system}", 'RINEX VERSION / TYPE')
+    else:
+        kind = 'N: GPS NAV DATA' if system == 'G' else 'G: GLONASS NAV DATA'
+        yield _line(f"{version:9.2f}           {kind}", 'RINEX VERSION / TYPE')
+    yield _line(f"{'synthetic':<20}{'geoclient':<20}{first:%Y%m%d %H%M%S} UTC", 'PGM / RUN BY / DATE')
+    yield _line('', 'END OF HEADER')
+
+    values_of = _gps_values if system == 'G' else _glonass_values
+    steps = max(int(timedelta(hours=hours) / NAV_INTERVAL), 1)
+    for k in range(steps):
+        moment = first + k * NAV_INTERVAL
+        for prn in satellites:
+            values = values_of(rng, moment)
+            if version >= 3:
+                head, indent = f"{system}{prn:02d} {moment:%Y %m %d %H %M %S}", '    '
+            else:
+                head, indent = f"{prn:2d} {moment:%y %m %d %H %M} {moment.second:4.1f}", '   '
+            yield head + ''.join(_nav_value(v) for v in values[:3])
+            for i in range(3, len(values), 4):
+                yield indent + ''.join(_nav_value(v) for v in values[i:i + 4])
+
+
+def write_nav_file(path, version=3.04, system='G', first=None, hours=24, satellites=None, seed=0, line_ending='\n'):
+    """Пишет N (GPS) или G (ГЛОНАСС) файл с записями каждые два часа; возвращает путь."""
+    rng = random.Random(seed)
+    first = first or datetime(2024, 1, 1)
+    satellites = satellites or list(range(1, 33 if system == 'G' else 25))
+    with open(path, 'w', newline='') as f:
+        for line in nav_lines(version, system, first, hours, satellites, rng):
+            f.write(line + line_ending)
+    return path
+
+
+def station_xyz(index, rng):
+    """ECEF станции index: станции разнесены на десятки километров (каждая — отдельный пункт)."""
+    lat = math.radians(50.0 + (index // 50) * 0.5 + rng.uniform(-0.05, 0.05))
+    lon = math.radians(30.0 + (index % 50) * 0.5 + rng.uniform(-0.05, 0.05))
+    radius = 6378137.0
+    return (radius * math.cos(lat) * math.cos(lon), radius * math.cos(lat) * math.sin(lon), radius * math.sin(lat))
+
+
+def station_corpus(directory, stations, sessions=1, epochs=120, interval=30.0, version=None, seed=0, navigation=True):
+    """
+    Комплекты O/N/G для stations станций по sessions суточных сессий.
+    version — 2.11 или 3.04 (None — вперемешку по станциям). Сессии одной станции
+    смещены на сантиметры, поэтому при загрузке сливаются в один пункт.
+    Возвращает {база комплекта: [пути файлов]}.
+    """
+    rng = random.Random(seed)
+    sets = {}
+    for i in range(stations):
+        marker = f"B{i:03d}"[-4:] if stations <= 1000 else f"{i:04d}"
+        file_version = version or (3.04 if i % 2 else 2.11)
+        xyz = station_xyz(i, rng)
+        for day in range(sessions):
+            first = datetime(2024, 1, 1) + timedelta(days=day)
+            session_xyz = tuple(v + rng.uniform(-0.02, 0.02) for v in xyz)
+            if file_version >= 3:
+                base = f"{marker}00RUS_R_{first:%Y}{first.timetuple().tm_yday:03d}0000_01D"
+                names = {'o': f"{base}_30S_MO.rnx", 'n': f"{base}_GN.rnx", 'g': f"{base}_RN.rnx"}
+            else:
+                base = f"{marker}{first.timetuple().tm_yday:03d}0"
+                names = {'o': f"{base}.{first:%y}o", 'n': f"{base}.{first:%y}n", 'g': f"{base}.{first:%y}g"}
+            paths = [write_obs_file(
+                os.path.join(directory, names['o']), version=file_version, marker=marker, epochs=epochs,
+                interval=interval, seed=rng.randint(0, 2 ** 31), first=first, xyz=session_xyz,
+            )]
+            if navigation:
+                paths.append(write_nav_file(os.path.join(directory, names['n']), file_version, 'G', first, seed=rng.randint(0, 2 ** 31)))
+                paths.append(write_nav_file(os.path.join(directory, names['g']), file_version, 'R', first, seed=rng.randint(0, 2 ** 31)))
+            sets[base] = paths
+    return sets
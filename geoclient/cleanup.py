@@ -0,0 +1,142 @@
+# geoclient/cleanup.py
+
+import logging
+import threading
+
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import GeodeticPoint, Observation, UploadedRinexFile, PendingFileCleanup, RinexBlob
+
+logger = logging.getLogger(__name__)
+
+SWEEP_BATCH_SIZE = 500
+MAX_CLEANUP_ATTEMPTS = 5
+
+_sweeper_lock = threading.Lock()
+
+
+def enqueue_paths_sql(files_qs):
+    """
+    Ставит пути файлов из queryset в очередь удаления одним INSERT ... SELECT,
+    не вытягивая строки в Python.
+    """
+    select_sql, params = files_qs.exclude(file='').values('file').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {PendingFileCleanup._meta.db_table} (path, created_at, attempts) "
+            f"SELECT sub.file, %s, 0 FROM ({select_sql}) AS sub",
+            (timezone.now(), *params),
+        )
+        return cursor.rowcount
+
+
+def delete_points_deferred(point_ids):
+    """
+    Удаляет пункты, их наблюдения и все комплекты RINEX файлов набором SQL-запросов
+    в одной транзакции. Физические файлы только ставятся в очередь, их удаляет
+    фоновый обработчик после фиксации транзакции.
+    Возвращает (список удаленных ID, количество удаленных файлов).
+    """
+    with transaction.atomic():
+        points = GeodeticPoint.objects.filter(id__in=point_ids)
+        deleted_point_ids = list(points.values_list('id', flat=True))
+        if not deleted_point_ids:
+            return [], 0
+
+        observations = Observation.objects.filter(point_id__in=deleted_point_ids)
+        source_files = observations.exclude(source_file=None).values('source_file_id')
+        # Комплекты, склеенные в файлы этих наблюдений (geoclient/splice.py), удаляются вместе с ними
+        spliced = UploadedRinexFile.objects.filter(spliced_into__in=source_files)
+        files = UploadedRinexFile.objects.filter(
+            Q(upload_group__in=observations.exclude(source_file__upload_group=None).values('source_file__upload_group'))
+            | Q(pk__in=source_files)
+            | Q(upload_group__in=spliced.exclude(upload_group=None).values('upload_group'))
+            | Q(pk__in=spliced.values('pk'))
+        )
+        # Фиксируем набор файлов до каскадного удаления наблюдений
+        file_ids = list(files.values_list('pk', flat=True))
+        # Пути блобов в очередь не ставятся: их освобождает UploadedRinexFileQuerySet.delete()
+        enqueue_paths_sql(files.filter(blob=None))
+
+        # Наблюдения удалятся каскадом одним DELETE ... WHERE point_id IN (...)
+        points.delete()
+        # QuerySet.delete() не вызывает UploadedRinexFile.delete(): файлы без блоба уже в очереди,
+        # а ссылки на блобы снимаются в UploadedRinexFileQuerySet.delete()
+        UploadedRinexFile.objects.filter(pk__in=file_ids).delete()
+
+        transaction.on_commit(start_background_sweep)
+
+    return deleted_point_ids, len(file_ids)
+
+
+def sweep_pending_cleanup(batch_size=SWEEP_BATCH_SIZE):
+    """
+    Обрабатывает одну порцию очереди. Возвращает (снято с очереди, ошибок).
+    Пути, на которые снова ссылается запись в БД, просто снимаются с очереди.
+    """
+    removed, failed = 0, 0
+    with transaction.atomic():
+        batch = list(
+            PendingFileCleanup.objects.select_for_update(skip_locked=True)
+            .filter(attempts__lt=MAX_CLEANUP_ATTEMPTS)
+            .order_by('id')[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        paths = {item.path for item in batch}
+        still_used = set(UploadedRinexFile.objects.filter(file__in=paths).values_list('file', flat=True))
+        still_used.update(RinexBlob.objects.filter(file__in=paths).values_list('file', flat=True))
+
+        done_ids, failed_items = [], []
+        for item in batch:
+            if item.path not in still_used:
+                try:
+                    default_storage.delete(item.path)
+                except OSError as e:
+                    item.attempts += 1
+                    item.last_error = str(e)
+                    failed_items.append(item)
+                    continue
+            done_ids.append(item.pk)
+
+        PendingFileCleanup.objects.filter(pk__in=done_ids).delete()
+        removed = len(done_ids)
+        if failed_items:
+            PendingFileCleanup.objects.bulk_update(failed_items, ['attempts', 'last_error'])
+            failed = len(failed_items)
+    return removed, failed
+
+
+def sweep_all_pending(batch_size=SWEEP_BATCH_SIZE):
+    total_removed, total_failed = 0, 0
+    while True:
+        removed, failed = sweep_pending_cleanup(batch_size)
+        total_removed += removed
+        total_failed += failed
+        # Пустая очередь или в ней остались только сбойные пути — до следующего запуска
+        if removed == 0:
+            break
+    return total_removed, total_failed
+
+
+def _sweep_thread():
+    try:
+        removed, failed = sweep_all_pending()
+        if removed or failed:
+            logger.info("Очистка файлов: удалено %s, ошибок %s", removed, failed)
+    except Exception:
+        logger.exception("Сбой фоновой очистки файлов")
+    finally:
+        connection.close()
+        _sweeper_lock.release()
+
+
+def start_background_sweep():
+    """Запускает очистку в фоновом потоке, если она еще не идет в этом процессе."""
+    if not _sweeper_lock.acquire(blocking=False):
+        return
+    threading.Thread(target=_sweep_thread, name='geoclient-file-sweeper', daemon=True).start()
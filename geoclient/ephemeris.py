@@ -0,0 +1,74 @@
+# geoclient/ephemeris.py
+"""
+Хранилище эфемерид по суткам (NavigationDay): для каждой системы и даты — один массив .npy.
+Навигационные файлы разбираются один раз при загрузке, а любое число сессий
+берет эфемериды отсюда через load_ephemerides().
+"""
+
+import io
+from datetime import timedelta, timezone
+
+import numpy as np
+from django.db import transaction
+
+from .models import NavigationDay
+from .rinex_nav import EPHEMERIS_DTYPES, deduplicate, ephemeris_time
+
+# Эфемериды GPS действуют ±2 ч от Toe, ГЛОНАСС — ±15 мин от tb; запас берется с избытком
+LOAD_MARGIN = timedelta(hours=4)
+
+
+def _dumps(array):
+    buf = io.BytesIO()
+    np.save(buf, array, allow_pickle=False)
+    return buf.getvalue()
+
+
+def _loads(data, system):
+    array = np.load(io.BytesIO(bytes(data)), allow_pickle=False)
+    return array.astype(EPHEMERIS_DTYPES[system], copy=False)
+
+
+def _naive_utc(value):
+    """Aware datetime -> naive UTC; naive считается уже заданным в UTC."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo is not None else value
+
+
+def store_ephemerides(by_system):
+    """
+    Дописывает эфемериды ({система: массив}) в суточные наборы; повторы по (спутник, Toe)
+    заменяются новыми. Возвращает число действительно новых записей.
+    """
+    added = 0
+    for system, array in by_system.items():
+        days = ephemeris_time(system, array).astype('datetime64[D]')
+        for day in np.unique(days):
+            part = array[days == day]
+            with transaction.atomic():
+                nav_day, _ = NavigationDay.objects.select_for_update().get_or_create(
+                    date=day.item(), system=system, defaults={'data': _dumps(part[:0])}
+                )
+                existing = _loads(nav_day.data, system)
+                merged = deduplicate(system, np.concatenate([existing, part]))
+                added += len(merged) - len(existing)
+                nav_day.data = _dumps(merged)
+                nav_day.record_count = len(merged)
+                nav_day.satellite_count = len(np.unique(merged['prn']))
+                nav_day.save()
+    return added
+
+
+def load_ephemerides(system, start, end, margin=LOAD_MARGIN):
+    """Эфемериды системы для интервала [start, end] (datetime) с запасом margin по краям."""
+    first, last = _naive_utc(start) - margin, _naive_utc(end) + margin
+    parts = [
+        _loads(data, system) for data in NavigationDay.objects.filter(
+            system=system, date__range=(first.date(), last.date())
+        ).order_by('date').values_list('data', flat=True)
+    ]
+    if not parts:
+        return np.zeros(0, dtype=EPHEMERIS_DTYPES[system])
+    array = deduplicate(system, np.concatenate(parts))
+    times = ephemeris_time(system, array)
+    return array[(times >= np.datetime64(first, 'ms')) & (times <= np.datetime64(last, 'ms'))]
+
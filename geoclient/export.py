@@ -0,0 +1,160 @@
+# geoclient/export.py
+"""
+Потоковая выгрузка каталога пунктов для полевых контроллеров и Google Earth:
+KML (стили по типу пункта), KMZ (тот же KML в ZIP) и CSV.
+
+Строки читаются серверным курсором (QuerySet.iterator) как кортежи значений, координаты
+берутся ST_X/ST_Y в SQL — без объектов моделей и GEOS. Вывод собирается блоками
+по EXPORT_CHUNK_SIZE байт и сжимается на лету (gzip для KML/CSV, deflate внутри KMZ),
+поэтому память не зависит от числа пунктов.
+"""
+
+import csv
+import io
+import zlib
+from datetime import datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from django.db.models import F, FloatField, Func
+
+from .archives import ZipStream
+from .models import GeodeticPoint
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_ITERATOR_CHUNK = 2000
+EXPORT_FORMATS = ('kml', 'kmz', 'csv')
+CONTENT_TYPES = {
+    'kml': 'application/vnd.google-earth.kml+xml',
+    'kmz': 'application/vnd.google-earth.kmz',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Значок и цвет KML (aabbggrr) для каждого типа пункта — как условные знаки карты
+_ICON_BASE = 'http://maps.google.com/mapfiles/kml/shapes/'
+POINT_TYPE_STYLES = {
+    'ggs': ('triangle.png', 'ff0000ff'),
+    'ggs_kurgan': ('triangle.png', 'ff00a5ff'),
+    'survey': ('placemark_circle.png', 'ffff0000'),
+    'survey_kurgan': ('placemark_circle.png', 'ffffa500'),
+    'astro': ('star.png', 'ff800080'),
+    'leveling': ('square.png', 'ff008000'),
+    'default': ('placemark_circle.png', 'ff808080'),
+}
+
+CSV_HEADER = [
+    'name', 'latitude', 'longitude', 'code', 'station_name', 'network_class', 'index_name',
+    'center_type', 'mark_number', 'status', 'observation_count', 'last_observation', 'updated_at',
+]
+_FIELDS = [
+    'id', 'lat', 'lon', 'point_type', 'station_name', 'network_class', 'index_name',
+    'center_type', 'mark_number', 'status', 'statistics__observation_count', 'statistics__last_observation',
+    'updated_at', 'description',
+]
+
+
+def export_rows(queryset):
+    """Кортежи значений _FIELDS по пунктам queryset, серверным курсором."""
+    return queryset.annotate(
+        lon=Func(F('location'), function='ST_X', output_field=FloatField()),
+        lat=Func(F('location'), function='ST_Y', output_field=FloatField()),
+    ).order_by('id').values_list(*_FIELDS).iterator(chunk_size=EXPORT_ITERATOR_CHUNK)
+
+
+def _chunked(parts, size=EXPORT_CHUNK_SIZE):
+    """Строки -> блоки байтов UTF-8 не меньше size (кроме последнего)."""
+    buf, length = [], 0
+    for part in parts:
+        data = part.encode('utf-8')
+        buf.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(buf)
+            buf, length = [], 0
+    if buf:
+        yield b''.join(buf)
+
+
+def _iso(value):
+    return value.isoformat(timespec='seconds') if value else ''
+
+
+def _kml_styles():
+    for point_type, _ in GeodeticPoint.POINT_TYPES:
+        icon, color = POINT_TYPE_STYLES.get(point_type, POINT_TYPE_STYLES['default'])
+        yield (f'<Style id="{point_type}"><IconStyle><color>{color}</color><scale>0.8</scale>'
+               f'<Icon><href>{_ICON_BASE}{icon}</href></Icon></IconStyle>'
+               f'<LabelStyle><scale>0.7</scale></LabelStyle></Style>\n')
+
+
+def _kml_description(row):
+    """Описание в том же формате, что разбирает импорт (kml_import.parse_description)."""
+    _, _, _, _, _, network_class, index_name, center_type, mark_number, status, count, last, _, description = row
+    parts = [f"{label}: {value}" for label, value in (
+        ('индекс', index_name), ('класс', network_class), ('центр', center_type),
+        ('номер марки', mark_number), ('статус', status),
+    ) if value]
+    if count:
+        parts.append(f"наблюдений: {count}")
+    if last:
+        parts.append(f"последнее: {last:%Y-%m-%d}")
+    text = ', '.join(parts)
+    if description:
+        text = f"{text}\n{description}" if text else description
+    return text
+
+
+def iter_kml(rows, name='GeoClient'):
+    """Строки документа KML: стили по типам, затем по Placemark на пункт."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2"><Document>\n'
+    yield f'<name>{escape(name)}</name>\n'
+    yield from _kml_styles()
+    for row in rows:
+        point_id, lat, lon, point_type, station_name = row[:5]
+        title = f"{station_name} ({point_id})" if station_name else point_id
+        yield (f'<Placemark id={quoteattr(point_id)}><name>{escape(title)}</name>'
+               f'<description>{escape(_kml_description(row))}</description>'
+               f'<styleUrl>#{point_type if point_type in POINT_TYPE_STYLES else "default"}</styleUrl>'
+               f'<Point><coordinates>{lon:.8f},{lat:.8f},0</coordinates></Point></Placemark>\n')
+    yield '</Document></kml>\n'
+
+
+def iter_csv(rows):
+    """CSV для контроллеров: имя, широта, долгота, код (тип пункта) и атрибуты."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_HEADER)
+    for point_id, lat, lon, point_type, *attrs, count, last, updated, _ in rows:
+        writer.writerow([point_id, f"{lat:.8f}", f"{lon:.8f}", point_type, *attrs, count or 0, _iso(last), _iso(updated)])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+
+def gzip_chunks(chunks, level=6):
+    """Сжатие gzip на лету для Content-Encoding: gzip."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_export(queryset, export_format, name='GeoClient'):
+    """Байты выгрузки пунктов queryset в формате kml, kmz или csv (без сжатия для kml/csv)."""
+    rows = export_rows(queryset)
+    if export_format == 'csv':
+        yield b'\xef\xbb\xbf'  # BOM: Excel и контроллеры распознают UTF-8
+        yield from _chunked(iter_csv(rows))
+    elif export_format == 'kml':
+        yield from _chunked(iter_kml(rows, name))
+    elif export_format == 'kmz':
+        zs = ZipStream()
+        yield from zs.write_chunks('doc.kml', _chunked(iter_kml(rows, name)))
+        yield from zs.close()
+    else:
+        raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+
+
+def export_filename(export_format):
+    return f"points_{datetime.now():%Y%m%d_%H%M%S}.{export_format}"
@@ -0,0 +1,77 @@
+# geoclient/filters.py
+
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.contrib.gis.geos import Polygon
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def parse_time_bound(value, end_of_day=False):
+    """Граница интервала: ISO дата-время или просто дата."""
+    if not value: return None
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None: raise ValueError(f"Неверный формат даты: {value}")
+        dt = datetime.combine(d, time.max if end_of_day else time.min)
+    if timezone.is_naive(dt): dt = timezone.make_aware(dt, dt_timezone.utc)
+    return dt
+
+
+def as_list(value):
+    if value is None: return []
+    if isinstance(value, (list, tuple)): return [v for v in value if v not in (None, '')]
+    return [v.strip() for v in str(value).split(',') if v.strip()]
+
+
+def parse_bbox(value):
+    """bbox = min_lon,min_lat,max_lon,max_lat -> Polygon (SRID 4326) или None."""
+    bbox = as_list(value)
+    if not bbox: return None
+    if len(bbox) != 4: raise ValueError("bbox должен содержать 4 числа.")
+    polygon = Polygon.from_bbox(tuple(float(v) for v in bbox))
+    polygon.srid = 4326
+    return polygon
+
+
+def filter_observations(queryset, params):
+    """
+    Общие фильтры наблюдений: point_ids, observation_ids, bbox, start/end, receiver.
+    Условие по timestamp — обычное сравнение с константой, поэтому PostgreSQL
+    отсекает секции таблицы, не попадающие в интервал. ValueError — при неверных параметрах.
+    """
+    point_ids = as_list(params.get('point_ids'))
+    observation_ids = as_list(params.get('observation_ids'))
+    receivers = as_list(params.get('receiver'))
+    polygon = parse_bbox(params.get('bbox'))
+    start = parse_time_bound(params.get('start'))
+    end = parse_time_bound(params.get('end'), end_of_day=True)
+
+    if point_ids: queryset = queryset.filter(point_id__in=point_ids)
+    if observation_ids: queryset = queryset.filter(pk__in=[int(i) for i in observation_ids])
+    if receivers: queryset = queryset.filter(receiver_number__in=receivers)
+    if polygon is not None: queryset = queryset.filter(location__intersects=polygon)
+    if start: queryset = queryset.filter(timestamp__gte=start)
+    if end: queryset = queryset.filter(timestamp__lte=end)
+    return queryset
+
+
+def filter_points(queryset, params):
+    """
+    Фильтры выгрузки пунктов: point_ids, bbox, type (типы через запятую),
+    updated_since (изменение атрибутов) и observed_since (последнее наблюдение,
+    по PointStatistics). ValueError — при неверных параметрах.
+    """
+    point_ids = as_list(params.get('point_ids'))
+    point_types = as_list(params.get('type'))
+    polygon = parse_bbox(params.get('bbox'))
+    updated_since = parse_time_bound(params.get('updated_since'))
+    observed_since = parse_time_bound(params.get('observed_since'))
+
+    if point_ids: queryset = queryset.filter(id__in=point_ids)
+    if point_types: queryset = queryset.filter(point_type__in=point_types)
+    if polygon is not None: queryset = queryset.filter(location__intersects=polygon)
+    if updated_since: queryset = queryset.filter(updated_at__gte=updated_since)
+    if observed_since: queryset = queryset.filter(statistics__last_observation__gte=observed_since)
+    return queryset
@@ -4,6 +4,8 @@ import requests
 import urllib3
 import logging
 
+from django.conf import settings
+
 # Отключаем предупреждения SSL, так как портал использует специфичные сертификаты
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -24,7 +26,7 @@ def find_station_metadata(lat, lon):
         [lon - delta, lat - delta]
     ]
 
-    url = "https://mdss.fppd.cgkipd.ru/api/v1/GGSStation/Search"
+    url = settings.GEOCLIENT_FPPD_SEARCH_URL
 
     headers = {
         "Content-Type": "application/json",
@@ -0,0 +1,365 @@
+# geoclient/kml_import.py
+"""
+Импорт атрибутов пунктов из KML/KMZ (экспорт Geoeye).
+
+Placemark'и читаются потоково (iterparse, обработанный элемент удаляется из дерева),
+координаты и разобранные описания загружаются COPY во временную таблицу, затем
+все Placemark'и сопоставляются с GeodeticPoint одним пространственным соединением
+(ST_DWithin по geography — радиус в настоящих метрах, индекс geopoint_location_geog_idx).
+Однозначные совпадения применяются через bulk_update; неоднозначные — несколько
+пунктов в радиусе или один пункт у нескольких Placemark'ов — пишутся в отчет CSV.
+Загрузки из веб-интерфейса выполняются тем же движком в фоновом потоке (KmlImportJob).
+"""
+
+import csv
+import io
+import logging
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import GeodeticPoint, KmlImportJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RADIUS = 10.0  # м
+COPY_BATCH_SIZE = 20_000
+UPDATE_BATCH_SIZE = 500
+PROGRESS_EVERY = 5_000
+TEMP_TABLE = 'kml_import_placemarks'
+UPDATED_FIELDS = ['network_class', 'index_name', 'center_type', 'mark_number', 'station_name', 'updated_at']
+REPORT_HEADER = ['name', 'lon', 'lat', 'reason', 'candidates']
+KML_EXTENSIONS = ('.kml', '.kmz')
+MAX_RADIUS = 100.0  # м
+PROGRESS_CACHE_TTL = 24 * 3600
+# Выполняющееся задание без отметок хода дольше этого (с) считается прерванным (процесс остановлен)
+STALE_JOB_AFTER = 3600
+
+# Импорты обновляют одни и те же пункты — в процессе выполняются по одному
+_import_lock = threading.Lock()
+
+# Значение — до запятой или конца строки: после строки атрибутов может идти свободный текст (export.py)
+_DESCRIPTION_PATTERNS = {
+    'index_name': re.compile(r'индекс:\s*([^,\n]+)', re.IGNORECASE),
+    'network_class': re.compile(r'класс:\s*([^,\n]+)', re.IGNORECASE),
+    'center_type': re.compile(r'центр:\s*([^,\n]+)', re.IGNORECASE),
+    'mark_number': re.compile(r'номер марки:\s*([^,\n]+)', re.IGNORECASE),
+}
+
+
+def parse_description(description_text):
+    """Индекс, класс сети, тип центра и номер марки из текста description (None — не найдено)."""
+    data = {}
+    for key, pattern in _DESCRIPTION_PATTERNS.items():
+        match = pattern.search(description_text)
+        data[key] = match.group(1).strip() if match else None
+    return data
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child_text(element, name):
+    for child in element.iter():
+        if _local(child.tag) == name:
+            return child.text
+    return None
+
+
+def open_kml(source):
+    """Бинарный поток KML из пути или файла; в KMZ берется doc.kml или первый .kml архива."""
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        names = [n for n in archive.namelist() if n.lower().endswith('.kml')]
+        if not names:
+            raise ValueError("В архиве KMZ нет файла .kml.")
+        return archive.open('doc.kml' if 'doc.kml' in names else names[0])
+    if hasattr(source, 'seek'):
+        source.seek(0)
+        return source
+    return open(source, 'rb')
+
+
+def iter_placemarks(stream):
+    """
+    (имя, lon, lat, description) каждого Placemark; lon/lat — None, если координат нет или они неверны.
+    Обработанный Placemark удаляется из родителя, так что память не растет с размером файла.
+    """
+    path = []
+    for event, element in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            path.append(element)
+            continue
+        path.pop()
+        if _local(element.tag) != 'Placemark':
+            continue
+        name = (_child_text(element, 'name') or '').strip() or 'Без имени'
+        coordinates = _child_text(element, 'coordinates')
+        lon = lat = None
+        try:
+            lon, lat = (float(v) for v in coordinates.split()[0].split(',')[:2])
+        except (AttributeError, IndexError, ValueError):
+            pass
+        yield name, lon, lat, _child_text(element, 'description')
+        element.clear()
+        if path:
+            path[-1].remove(element)
+
+
+def _copy_rows(cursor, rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cursor.copy_expert(
+        f"COPY {TEMP_TABLE} (seq, name, lon, lat, network_class, index_name, center_type, mark_number, "
+        f"has_description) FROM STDIN WITH (FORMAT csv)", buf
+    )
+
+
+def _load_placemarks(cursor, stream, progress):
+    """Загружает Placemark'и во временную таблицу; возвращает (всего, без координат)."""
+    # При вложенном вызове (внешняя транзакция еще открыта) таблица прошлого импорта еще существует
+    cursor.execute(f"DROP TABLE IF EXISTS {TEMP_TABLE}")
+    cursor.execute(
+        f"CREATE TEMP TABLE {TEMP_TABLE} (seq integer PRIMARY KEY, name text, lon float8, lat float8, "
+        f"network_class text, index_name text, center_type text, mark_number text, has_description boolean) "
+        f"ON COMMIT DROP"
+    )
+    total = invalid = 0
+    batch = []
+    for name, lon, lat, description in iter_placemarks(stream):
+        total += 1
+        if lon is None:
+            invalid += 1
+            continue
+        parsed = parse_description(description) if description else dict.fromkeys(_DESCRIPTION_PATTERNS)
+        batch.append((total, name, lon, lat, parsed['network_class'], parsed['index_name'],
+                      parsed['center_type'], parsed['mark_number'], 't' if description else 'f'))
+        if len(batch) >= COPY_BATCH_SIZE:
+            _copy_rows(cursor, batch)
+            batch = []
+        if progress and total % PROGRESS_EVERY == 0:
+            progress('parse', total)
+    if batch:
+        _copy_rows(cursor, batch)
+    cursor.execute(f"ANALYZE {TEMP_TABLE}")
+    return total, invalid
+
+
+# Для каждого Placemark с кандидатами: ID пунктов в радиусе по возрастанию расстояния
+# и число Placemark'ов, для которых этот пункт — единственный кандидат
+_MATCH_SQL = f"""
+WITH matches AS (
+    SELECT k.seq, p.id, ST_Distance(p.location::geography, ST_SetSRID(ST_MakePoint(k.lon, k.lat), 4326)::geography) AS distance
+    FROM {TEMP_TABLE} k
+    JOIN {GeodeticPoint._meta.db_table} p
+      ON ST_DWithin(p.location::geography, ST_SetSRID(ST_MakePoint(k.lon, k.lat), 4326)::geography, %s)
+), grouped AS (
+    SELECT seq, array_agg(id ORDER BY distance) AS ids, array_agg(distance ORDER BY distance) AS distances
+    FROM matches GROUP BY seq
+), claims AS (
+    SELECT ids[1] AS id, count(*) AS n FROM grouped WHERE cardinality(ids) = 1 GROUP BY ids[1]
+)
+SELECT k.seq, k.name, k.lon, k.lat, k.network_class, k.index_name, k.center_type, k.mark_number,
+       k.has_description, g.ids, g.distances, c.n
+FROM {TEMP_TABLE} k
+JOIN grouped g ON g.seq = k.seq
+LEFT JOIN claims c ON c.id = g.ids[1] AND cardinality(g.ids) = 1
+ORDER BY k.seq
+"""
+
+
+def _candidates(ids, distances):
+    return '; '.join(f"{point_id} ({distance:.1f} м)" for point_id, distance in zip(ids, distances))
+
+
+def _apply_updates(updates):
+    """updates — {id пункта: (имя из KML, атрибуты)}; bulk_update порциями. Возвращает число обновленных."""
+    now = timezone.now()
+    ids = list(updates)
+    updated = 0
+    for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+        points = GeodeticPoint.objects.only('id', 'station_name').in_bulk(ids[start:start + UPDATE_BATCH_SIZE])
+        for point_id, point in points.items():
+            name, attrs = updates[point_id]
+            for field, value in attrs.items():
+                setattr(point, field, value)
+            if not point.station_name:
+                point.station_name = name
+            point.updated_at = now
+        GeodeticPoint.objects.bulk_update(points.values(), UPDATED_FIELDS, batch_size=UPDATE_BATCH_SIZE)
+        updated += len(points)
+    return updated
+
+
+def import_kml(source, radius=DEFAULT_RADIUS, report=None, progress=None):
+    """
+    Импортирует KML/KMZ (путь или бинарный файл). report — текстовый файл для CSV
+    неоднозначных совпадений; progress(stage, done) — необязательный обратный вызов
+    ('parse', 'match', 'update'). Все изменения — одна транзакция.
+    Возвращает счетчики: placemarks, updated_count, not_found_count, skipped_count, ambiguous_count.
+    """
+    writer = csv.writer(report) if report is not None else None
+    if writer:
+        writer.writerow(REPORT_HEADER)
+    counts = {'placemarks': 0, 'updated_count': 0, 'not_found_count': 0, 'skipped_count': 0, 'ambiguous_count': 0}
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        with open_kml(source) as stream:
+            total, invalid = _load_placemarks(cursor, stream, progress)
+        counts['placemarks'] = total
+        counts['skipped_count'] = invalid
+        if progress:
+            progress('match', total)
+
+        cursor.execute(_MATCH_SQL, [radius])
+        matched = 0
+        updates = {}
+        for seq, name, lon, lat, *attrs, has_description, ids, distances, claims in cursor.fetchall():
+            matched += 1
+            reason = None
+            if len(ids) > 1:
+                reason = 'several_points'
+            elif claims > 1:
+                reason = 'shared_point'
+            if reason:
+                counts['ambiguous_count'] += 1
+                if writer:
+                    writer.writerow([name, lon, lat, reason, _candidates(ids, distances)])
+            elif not has_description:
+                counts['skipped_count'] += 1
+            else:
+                updates[ids[0]] = (name, dict(zip(('network_class', 'index_name', 'center_type', 'mark_number'), attrs)))
+        counts['not_found_count'] = total - invalid - matched
+
+        if progress:
+            progress('update', len(updates))
+        counts['updated_count'] = _apply_updates(updates)
+    return counts
+
+
+def _progress_key(job_id):
+    return f'kml-import:{job_id}'
+
+
+def job_progress(job_id):
+    """Ход выполнения задания: {'stage', 'done', 'at'} или None (еще не начато или уже завершено)."""
+    return cache.get(_progress_key(job_id))
+
+
+def fail_stale_job(job):
+    """
+    Фоновый поток не переживает остановку процесса, и задание осталось бы 'running'
+    (или 'pending', если поток так и не стартовал) навсегда.
+    Если от задания давно нет отметок хода (или с его начала, если кэш их не видит),
+    а задание в очереди — с момента создания, оно помечается ошибкой, загруженный
+    файл удаляется. Возвращает задание (обновленное).
+    """
+    stale_after = getattr(settings, 'GEOCLIENT_KML_IMPORT_STALE_AFTER', STALE_JOB_AFTER)
+    now = timezone.now()
+    if job.status == KmlImportJob.STATUS_PENDING:
+        if now - job.created_at <= timedelta(seconds=stale_after):
+            return job
+        error = "Импорт не запустился: обработчик остановлен. Загрузите файл повторно."
+    elif job.status == KmlImportJob.STATUS_RUNNING:
+        progress = job_progress(job.pk)
+        if progress and time.time() - progress.get('at', 0) <= stale_after:
+            return job
+        if not progress and job.started_at and now - job.started_at <= timedelta(seconds=stale_after):
+            return job
+        error = "Импорт прерван: обработчик остановлен. Загрузите файл повторно."
+    else:
+        return job
+    updated = KmlImportJob.objects.filter(pk=job.pk, status=job.status).update(
+        status=KmlImportJob.STATUS_FAILED, error=error, finished_at=now,
+    )
+    if updated:
+        logger.warning("Задание импорта KML %s прервано, помечено ошибкой", job.pk)
+        job.file.delete(save=False)
+        cache.delete(_progress_key(job.pk))
+    job.refresh_from_db()
+    return job
+
+
+def create_import_job(uploaded_file, radius, user=None):
+    """Проверяет загрузку, сохраняет файл и создает задание; ValueError — неверные параметры."""
+    name = os.path.basename(uploaded_file.name)
+    if not name.lower().endswith(KML_EXTENSIONS):
+        raise ValueError(f"'{name}': ожидается файл .kml или .kmz.")
+    try:
+        radius = float(radius)
+    except (TypeError, ValueError):
+        raise ValueError("Радиус поиска должен быть числом.")
+    if not 0 < radius <= MAX_RADIUS:
+        raise ValueError(f"Радиус поиска должен быть от 0 до {MAX_RADIUS:g} м.")
+    job = KmlImportJob(original_name=name, radius=radius, created_by=user if user and user.is_authenticated else None)
+    job.file.save(name, uploaded_file, save=False)
+    job.save()
+    return job
+
+
+def run_import_job(job_id):
+    """Выполняет задание синхронно; ход пишется в кэш, итоги и отчет — в задание."""
+    job = KmlImportJob.objects.get(pk=job_id)
+    job.started_at = timezone.now()
+    started = KmlImportJob.objects.filter(pk=job.pk, status=KmlImportJob.STATUS_PENDING).update(
+        status=KmlImportJob.STATUS_RUNNING, started_at=job.started_at,
+    )
+    if not started:
+        # Задание уже помечено ошибкой как зависшее в очереди (fail_stale_job)
+        return job
+    key = _progress_key(job.pk)
+
+    def progress(stage, done):
+        cache.set(key, {'stage': stage, 'done': done, 'at': time.time()}, PROGRESS_CACHE_TTL)
+
+    report = io.StringIO()
+    try:
+        with job.file.open('rb') as source:
+            job.counts = import_kml(source, radius=job.radius, report=report, progress=progress)
+    except (ET.ParseError, zipfile.BadZipFile):
+        job.status, job.error = KmlImportJob.STATUS_FAILED, "Ошибка парсинга XML. Убедитесь, что это корректный KML/KMZ."
+    except ValueError as e:
+        job.status, job.error = KmlImportJob.STATUS_FAILED, str(e)
+    except Exception as e:
+        logger.exception("Сбой импорта KML %s", job.pk)
+        job.status, job.error = KmlImportJob.STATUS_FAILED, f"Сбой импорта: {e}"
+    else:
+        job.status = KmlImportJob.STATUS_DONE
+        if job.counts['ambiguous_count']:
+            job.report.save(f"{os.path.splitext(job.original_name)[0]}.ambiguous.csv",
+                            ContentFile(report.getvalue().encode('utf-8')), save=False)
+        # Исходный файл больше не нужен
+        job.file.delete(save=False)
+    job.finished_at = timezone.now()
+    job.save()
+    cache.delete(key)
+    return job
+
+
+def _job_thread(job_id):
+    try:
+        with _import_lock:
+            run_import_job(job_id)
+    except Exception:
+        logger.exception("Сбой фонового импорта KML %s", job_id)
+    finally:
+        connection.close()
+
+
+def start_import_job(job):
+    """Запускает задание в фоновом потоке после фиксации транзакции, в которой оно создано."""
+    transaction.on_commit(lambda: threading.Thread(
+        target=_job_thread, args=(job.pk,), name=f'geoclient-kml-import-{job.pk}', daemon=True,
+    ).start())
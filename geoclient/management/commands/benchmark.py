@@ -0,0 +1,62 @@
+# geoclient/management/commands/benchmark.py
+
+import json
+import platform
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from geoclient.benchmarks import BENCHMARKS, run_benchmark
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Запускает бенчмарк (или все — all) и печатает результат в JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=['all', *sorted(BENCHMARKS)], help='Имя бенчмарка или all.')
+        parser.add_argument('--iterations', type=int, default=None, help='Количество повторов (по умолчанию — свое у каждого).')
+        parser.add_argument('--size', type=int, default=None, help='Размер набора данных (если применимо).')
+        parser.add_argument('--output', default=None, help='Записать JSON в файл (для сравнения запусков).')
+
+    def handle(self, *args, **options):
+        names = sorted(BENCHMARKS) if options['name'] == 'all' else [options['name']]
+        started_at = timezone.now()
+        results = {}
+        for name in names:
+            started = time.perf_counter()
+            results[name] = run_benchmark(name, iterations=options['iterations'], size=options['size'])
+            results[name]['wall_seconds'] = round(time.perf_counter() - started, 2)
+            if len(names) > 1:
+                self.stderr.write(f"{name}: {results[name]['wall_seconds']} с")
+
+        document = {
+            'meta': {
+                'started_at': started_at.isoformat(timespec='seconds'),
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'size': options['size'],
+            },
+            'results': results,
+        }
+        text = json.dumps(document, ensure_ascii=False, indent=2, default=str)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+        self.stdout.write(text)
@@ -0,0 +1,145 @@
+# geoclient/management/commands/compress_media.py
+
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from geoclient.cleanup import sweep_all_pending
+from geoclient.models import UploadedRinexFile, PendingFileCleanup, RinexBlob
+from geoclient.rinex_io import LZW_MAGIC
+from geoclient.storage import ALREADY_COMPRESSED_SUFFIXES, COMPRESSION_SUFFIXES, CHUNK_SIZE, compression_of, write_compressed
+
+logger = logging.getLogger(__name__)
+
+
+class _HashingReader:
+    """Читает файл и попутно считает sha256 несжатого содержимого."""
+    def __init__(self, f):
+        self._f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=CHUNK_SIZE):
+        chunk = self._f.read(size)
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+        return chunk
+
+
+def _compress_file(task):
+    """
+    Выполняется в отдельном процессе: сжимает src в dst.
+    Возвращает (sha256 исходного содержимого, исходный размер, сжатый размер)
+    или None, если файл сжать не удалось (ошибка одного файла не прерывает остальные).
+    """
+    src, dst, method, level = task
+    try:
+        with open(src, 'rb') as f:
+            reader = _HashingReader(f)
+            compressed_size = write_compressed(reader, dst, method, level)
+    except Exception:
+        logger.exception("Не удалось сжать %s", src)
+        if os.path.exists(dst):
+            os.remove(dst)
+        return None
+    return reader.sha256.hexdigest(), reader.size, compressed_size
+
+
+def _already_compressed(name, path):
+    """
+    Unix compress (.Z) повторно не сжимается, как и в save_content. Блоб из .Z файла
+    хранится без суффикса, поэтому проверяется и сигнатура содержимого.
+    """
+    if name.lower().endswith(ALREADY_COMPRESSED_SUFFIXES):
+        return True
+    with open(path, 'rb') as f:
+        return f.read(len(LZW_MAGIC)) == LZW_MAGIC
+
+
+class Command(BaseCommand):
+    help = ('Сжимает хранящиеся RINEX-файлы (gzip/zstd) в фоне и перевешивает на них записи. '
+            'Несжатые оригиналы ставятся в очередь удаления.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=sorted(COMPRESSION_SUFFIXES), default='gzip', help='Метод сжатия.')
+        parser.add_argument('--level', type=int, default=None, help='Уровень сжатия (по умолчанию — метода).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Количество процессов сжатия.')
+        parser.add_argument('--batch-size', type=int, default=200, help='Файлов за одну порцию.')
+
+    def handle(self, *args, **options):
+        method, level = options['method'], options['level']
+        suffix = COMPRESSION_SUFFIXES[method]
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+
+        # Ожидаемый хэш несжатого содержимого для каждого пути
+        expected = {}
+        for name, file_hash in UploadedRinexFile.objects.exclude(file='').values_list('file', 'file_hash').iterator(chunk_size=5000):
+            if not compression_of(name):
+                expected.setdefault(name, file_hash)
+        for name, sha256 in RinexBlob.objects.values_list('file', 'sha256').iterator(chunk_size=5000):
+            if not compression_of(name):
+                expected[name] = sha256
+        names = sorted(expected)
+        self.stdout.write(self.style.SUCCESS(f'Несжатых файлов: {len(names)}'))
+
+        done = skipped = missing = failed = already_compressed = 0
+        original_total = compressed_total = 0
+
+        batch_size = options['batch_size']
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for start in range(0, len(names), batch_size):
+                batch = []
+                for name in names[start:start + batch_size]:
+                    src = default_storage.path(name)
+                    if not os.path.exists(src):
+                        missing += 1
+                        continue
+                    if _already_compressed(name, src):
+                        already_compressed += 1
+                        continue
+                    new_name = default_storage.get_available_name(name + suffix)
+                    batch.append((name, new_name, (src, default_storage.path(new_name), method, level)))
+
+                results = pool.map(_compress_file, [task for _, _, task in batch])
+                for (name, new_name, task), result in zip(batch, results):
+                    if result is None:
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(f'Ошибка сжатия, пропущен: {name}'))
+                        continue
+                    digest, size, compressed_size = result
+                    if expected[name] and expected[name] != digest:
+                        # Файл изменился или поврежден — сжатую копию не используем
+                        os.remove(task[1])
+                        skipped += 1
+                        self.stdout.write(self.style.WARNING(f'Хэш не совпадает, пропущен: {name}'))
+                        continue
+                    with transaction.atomic():
+                        list(RinexBlob.objects.select_for_update().filter(file=name))
+                        RinexBlob.objects.filter(file=name).update(file=new_name)
+                        UploadedRinexFile.objects.filter(file=name).update(file=new_name)
+                        PendingFileCleanup.objects.create(path=name)
+                    done += 1
+                    original_total += size
+                    compressed_total += compressed_size
+
+                self.stdout.write(f'  обработано {min(start + batch_size, len(names))} из {len(names)}...')
+
+        if done:
+            # Синхронно: фоновый поток не переживет завершение команды
+            removed, sweep_failed = sweep_all_pending()
+            self.stdout.write(f'Удалено несжатых оригиналов: {removed}, ошибок удаления: {sweep_failed}.')
+
+        saved = original_total - compressed_total
+        ratio = (compressed_total / original_total * 100) if original_total else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'\nСжато: {done}, пропущено (хэш не совпал): {skipped}, уже сжаты (.Z): {already_compressed}, '
+            f'без файла на диске: {missing}, с ошибкой: {failed}.\n'
+            f'Было: {original_total / 1024 / 1024:.1f} МБ, стало: {compressed_total / 1024 / 1024:.1f} МБ '
+            f'({ratio:.0f}%). Освобождается: {saved / 1024 / 1024:.1f} МБ.'
+        ))
@@ -0,0 +1,116 @@
+# geoclient/management/commands/dedupe_media.py
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from geoclient.models import UploadedRinexFile, PendingFileCleanup, RinexBlob, logical_rinex_name
+from geoclient.storage import acquire_blob, open_stored
+
+
+def _sha256_of(path):
+    sha256 = hashlib.sha256()
+    with open_stored(path) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _blob_on_disk(sha256):
+    """Блоб с этим хэшем, если его файл уже лежит в хранилище."""
+    blob = RinexBlob.objects.filter(pk=sha256).exclude(file='').first() if sha256 else None
+    if blob and default_storage.exists(blob.file.name):
+        return blob
+    return None
+
+
+class Command(BaseCommand):
+    help = ('Переводит существующие файлы mediafiles в контентно-адресуемое хранилище: '
+            'одинаковые файлы сводятся в один блоб, дубликаты ставятся в очередь удаления.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Потоков для подсчета недостающих хэшей.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Записей за одну транзакцию.')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, сколько места освободится.')
+
+    def handle(self, *args, **options):
+        pending = UploadedRinexFile.objects.filter(blob=None).exclude(file='').order_by('pk')
+        total = pending.count()
+        self.stdout.write(self.style.SUCCESS(f'Файлов в старой схеме хранения: {total}'))
+
+        migrated = duplicates = missing = 0
+        bytes_saved = 0
+        seen_hashes, seen_paths = set(), set()
+        last_pk = 0
+        if options['dry_run']:
+            # Содержимое, уже перенесенное в блобы, тоже считается встреченным
+            seen_hashes.update(RinexBlob.objects.values_list('sha256', flat=True))
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                batch = list(pending.filter(pk__gt=last_pk)[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                present = [rf for rf in batch if os.path.exists(rf.file.path)]
+                # Хэши, которых нет в БД, считаются параллельно
+                no_hash = [rf for rf in present if not rf.file_hash]
+                for rf, digest in zip(no_hash, pool.map(lambda r: _sha256_of(r.file.path), no_hash)):
+                    rf.file_hash = digest
+
+                if options['dry_run']:
+                    present_pks = {rf.pk for rf in present}
+                    for rf in batch:
+                        if rf.file.name in seen_paths:
+                            # Тот же путь у нескольких строк: файл один, строка просто перевешивается на блоб
+                            migrated += 1
+                            continue
+                        if rf.pk not in present_pks:
+                            if rf.file_hash in seen_hashes:
+                                migrated += 1
+                            else:
+                                missing += 1
+                            continue
+                        if rf.file_hash in seen_hashes:
+                            duplicates += 1
+                            bytes_saved += rf.file.size
+                        seen_paths.add(rf.file.name)
+                        seen_hashes.add(rf.file_hash)
+                        migrated += 1
+                    continue
+
+                for rf in batch:
+                    with transaction.atomic():
+                        old_name = rf.file.name
+                        if default_storage.exists(old_name):
+                            size = rf.file.size
+                            blob = acquire_blob(old_name, rf.file_hash, size=size)
+                            if blob.file.name != old_name and default_storage.exists(old_name):
+                                # Содержимое уже есть в блобе — старая копия больше не нужна
+                                PendingFileCleanup.objects.create(path=old_name)
+                                duplicates += 1
+                                bytes_saved += size
+                        elif _blob_on_disk(rf.file_hash):
+                            # Файл уже перенесен в блоб предыдущей строкой с тем же путем (acquire_blob делает os.replace)
+                            blob = acquire_blob(old_name, rf.file_hash)
+                        else:
+                            missing += 1
+                            continue
+                        rf.original_name = rf.original_name or logical_rinex_name(old_name)
+                        rf.blob = blob
+                        rf.file.name = blob.file.name
+                        rf.save(update_fields=['file', 'blob', 'original_name', 'file_hash'])
+                    migrated += 1
+
+                self.stdout.write(f'  обработано {migrated + missing} из {total}...')
+
+        verb = 'Будет освобождено' if options['dry_run'] else 'Освобождается (после sweep_pending_files)'
+        self.stdout.write(self.style.SUCCESS(
+            f'\nПереведено: {migrated}, дубликатов: {duplicates}, без файла на диске: {missing}. '
+            f'{verb}: {bytes_saved / 1024 / 1024:.1f} МБ.'
+        ))
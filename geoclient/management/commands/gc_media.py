@@ -0,0 +1,89 @@
+# geoclient/management/commands/gc_media.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from geoclient.models import UploadedRinexFile, PendingFileCleanup, RinexBlob
+
+MEDIA_SUBDIRS = ('rinex_files', 'blobs')
+CHECK_CHUNK = 1000
+
+
+def _scan_dir(path):
+    """Рекурсивный обход одной папки станции. Возвращает пути относительно MEDIA_ROOT."""
+    found = []
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    found.append(os.path.relpath(entry.path, settings.MEDIA_ROOT).replace(os.sep, '/'))
+    return found
+
+
+def _missing_in_chunk(rows):
+    return [(pk, name) for pk, name in rows if not os.path.exists(os.path.join(settings.MEDIA_ROOT, name))]
+
+
+class Command(BaseCommand):
+    help = 'Сверяет файлы в MEDIA_ROOT с записями UploadedRinexFile: файлы без записей и записи без файлов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Количество параллельных потоков ввода-вывода.')
+        parser.add_argument(
+            '--delete-orphans', action='store_true',
+            help='Поставить файлы без записей в очередь удаления (их удалит sweep_pending_files).'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+
+        known = set(UploadedRinexFile.objects.exclude(file='').values_list('file', flat=True).iterator(chunk_size=5000))
+        known.update(RinexBlob.objects.values_list('file', flat=True).iterator(chunk_size=5000))
+        pending = set(PendingFileCleanup.objects.values_list('path', flat=True))
+
+        # 1. Файлы на диске без записей: папки станций обходятся параллельно
+        on_disk = []
+        top_dirs = []
+        for subdir in MEDIA_SUBDIRS:
+            root = os.path.join(settings.MEDIA_ROOT, subdir)
+            if not os.path.isdir(root):
+                continue
+            with os.scandir(root) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        top_dirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        on_disk.append(os.path.relpath(entry.path, settings.MEDIA_ROOT).replace(os.sep, '/'))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for files in pool.map(_scan_dir, top_dirs):
+                on_disk.extend(files)
+        orphans = sorted(p for p in on_disk if p not in known and p not in pending)
+
+        # 2. Записи без файлов: проверка существования порциями в пуле потоков
+        rows = list(UploadedRinexFile.objects.exclude(file='').values_list('pk', 'file'))
+        chunks = [rows[i:i + CHECK_CHUNK] for i in range(0, len(rows), CHECK_CHUNK)]
+        missing = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(_missing_in_chunk, chunks):
+                missing.extend(part)
+
+        for path in orphans:
+            self.stdout.write(self.style.WARNING(f'Файл без записи в БД: {path}'))
+        for pk, name in missing:
+            self.stdout.write(self.style.ERROR(f'Запись #{pk} без файла на диске: {name}'))
+
+        if options['delete_orphans'] and orphans:
+            PendingFileCleanup.objects.bulk_create([PendingFileCleanup(path=p) for p in orphans], batch_size=1000)
+            self.stdout.write(self.style.SUCCESS(f'В очередь удаления добавлено файлов: {len(orphans)}.'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nПроверено файлов на диске: {len(on_disk)}, записей в БД: {len(rows)}. '
+            f'Файлов без записей: {len(orphans)}, записей без файлов: {len(missing)}.'
+        ))
@@ -0,0 +1,38 @@
+# geoclient/management/commands/generate_rinex_corpus.py
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from geoclient.benchmarks.synthetic import station_corpus
+
+
+class Command(BaseCommand):
+    help = ('Создает синтетический корпус RINEX: комплекты O/N/G для заданного числа станций и сессий '
+            '(для бенчмарков и ручной проверки загрузки).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для файлов (создается при необходимости).')
+        parser.add_argument('--stations', type=int, default=10, help='Количество станций.')
+        parser.add_argument('--sessions', type=int, default=1, help='Суточных сессий на станцию.')
+        parser.add_argument('--epochs', type=int, default=2880, help='Эпох в O-файле (2880 — сутки по 30 с).')
+        parser.add_argument('--interval', type=float, default=30.0, help='Интервал наблюдений, с.')
+        parser.add_argument('--version', type=float, choices=[2.11, 3.04], default=None,
+                            help='Версия RINEX (по умолчанию — вперемешку 2.11 и 3.04).')
+        parser.add_argument('--no-navigation', action='store_true', help='Только O-файлы, без N/G.')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора (корпус воспроизводим).')
+
+    def handle(self, *args, **options):
+        if options['stations'] < 1 or options['sessions'] < 1 or options['epochs'] < 1:
+            raise CommandError('stations, sessions и epochs должны быть положительными.')
+        os.makedirs(options['directory'], exist_ok=True)
+        sets = station_corpus(
+            options['directory'], options['stations'], sessions=options['sessions'], epochs=options['epochs'],
+            interval=options['interval'], version=options['version'], seed=options['seed'],
+            navigation=not options['no_navigation'],
+        )
+        files = [path for paths in sets.values() for path in paths]
+        size = sum(os.path.getsize(path) for path in files)
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано комплектов: {len(sets)}, файлов: {len(files)}, {size / 1e6:.1f} МБ в {options['directory']}"
+        ))
@@ -0,0 +1,28 @@
+# geoclient/management/commands/load_navigation.py
+
+from django.core.management.base import BaseCommand
+
+from geoclient.models import UploadedRinexFile
+from geoclient.parsers import parse_rinex_nav_file
+from geoclient.rinex_io import open_rinex_input
+from geoclient.storage import open_rinex
+
+
+class Command(BaseCommand):
+    help = ('Разбирает хранимые навигационные файлы (N/G) и пополняет суточные наборы эфемерид. '
+            'Повторный запуск безопасен: записи дедуплицируются по (спутник, Toe).')
+
+    def handle(self, *args, **options):
+        files = UploadedRinexFile.objects.filter(file_type__in=['n', 'g']).exclude(file='').order_by('pk')
+        total = 0
+        for rinex_file in files.iterator(chunk_size=100):
+            try:
+                with open_rinex_input(open_rinex(rinex_file)) as stream:
+                    _, messages = parse_rinex_nav_file(stream, rinex_file.file_type, rinex_file)
+            except OSError as e:
+                self.stdout.write(self.style.WARNING(f'#{rinex_file.pk} {rinex_file}: {e}'))
+                continue
+            total += 1
+            for message in messages:
+                self.stdout.write(f'#{rinex_file.pk} {rinex_file}: {message}')
+        self.stdout.write(self.style.SUCCESS(f'Обработано файлов: {total}.'))
@@ -0,0 +1,27 @@
+# geoclient/management/commands/qc_rinex.py
+
+from django.core.management.base import BaseCommand
+
+from geoclient.models import UploadedRinexFile
+from geoclient.qc import qc_uploaded_file
+
+
+class Command(BaseCommand):
+    help = 'Считает сводку контроля качества для O-файлов, у которых ее еще нет (или для всех с --all).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересчитать и уже посчитанные сводки.')
+
+    def handle(self, *args, **options):
+        files = UploadedRinexFile.objects.filter(file_type='o').exclude(file='').order_by('pk')
+        if not options['all']:
+            files = files.filter(qc_summary__isnull=True)
+
+        done = failed = 0
+        for rinex_file in files.iterator(chunk_size=100):
+            if qc_uploaded_file(rinex_file) is None:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Не удалось: #{rinex_file.pk} {rinex_file}'))
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f'Сводок посчитано: {done}, ошибок: {failed}.'))
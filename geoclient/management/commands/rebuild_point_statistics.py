@@ -0,0 +1,15 @@
+# geoclient/management/commands/rebuild_point_statistics.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from geoclient.statistics import rebuild_point_statistics
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересчитывает сводную статистику наблюдений по всем пунктам (PointStatistics).'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_point_statistics()
+        self.stdout.write(self.style.SUCCESS(f'Статистика пересчитана для пунктов: {count}.'))
@@ -0,0 +1,143 @@
+# geoclient/management/commands/scrub_storage.py
+
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from geoclient.models import UploadedRinexFile, StorageScrubRun, StorageScrubResult
+from geoclient.storage import CHUNK_SIZE, open_stored
+
+# Состояние процесса пула (задается в _init_worker)
+_io_slots = None
+_bytes_per_sec = 0
+
+
+def _init_worker(io_slots, bytes_per_sec):
+    global _io_slots, _bytes_per_sec
+    _io_slots = io_slots
+    _bytes_per_sec = bytes_per_sec
+
+
+def _hash_path(path):
+    """
+    Выполняется в процессе пула: sha256 содержимого файла (сжатые при хранении — распакованного).
+    Одновременных чтений с диска не больше io_slots; скорость ограничивается bytes_per_sec.
+    Возвращает (path, статус, хэш, размер, ошибка).
+    """
+    if not os.path.exists(path):
+        return path, StorageScrubResult.STATUS_MISSING, None, None, None
+    sha256 = hashlib.sha256()
+    size = 0
+    started = time.monotonic()
+    try:
+        with open_stored(path) as f:
+            while True:
+                with _io_slots:
+                    chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                size += len(chunk)
+                if _bytes_per_sec:
+                    ahead = size / _bytes_per_sec - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+    except Exception as e:
+        return path, StorageScrubResult.STATUS_ERROR, None, size, str(e)
+    return path, StorageScrubResult.STATUS_OK, sha256.hexdigest(), size, None
+
+
+class Command(BaseCommand):
+    help = ('Проверяет целостность хранилища: пересчитывает хэши файлов и сверяет с file_hash. '
+            'Результаты пишутся в StorageScrubResult; прерванная проверка продолжается с контрольной точки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Процессов для подсчета хэшей.')
+        parser.add_argument('--io-concurrency', type=int, default=2, help='Одновременных чтений с диска.')
+        parser.add_argument('--max-mb-per-sec', type=float, default=0, help='Ограничение скорости чтения (0 — без ограничения).')
+        parser.add_argument('--batch-size', type=int, default=200, help='Файлов между контрольными точками.')
+        parser.add_argument('--limit', type=int, default=0, help='Проверить не больше N файлов за запуск (0 — все).')
+        parser.add_argument('--restart', action='store_true', help='Начать новую проверку, не продолжая незавершенную.')
+
+    def handle(self, *args, **options):
+        workers, batch_size = options['workers'], options['batch_size']
+        if workers < 1 or batch_size < 1 or options['io_concurrency'] < 1:
+            raise CommandError('--workers, --batch-size и --io-concurrency должны быть положительными.')
+
+        run = None if options['restart'] else StorageScrubRun.objects.filter(finished_at=None).first()
+        if run:
+            self.stdout.write(self.style.SUCCESS(f'Продолжение проверки #{run.pk} с файла ID > {run.last_file_id}'))
+        else:
+            StorageScrubRun.objects.filter(finished_at=None).update(finished_at=timezone.now())
+            run = StorageScrubRun.objects.create()
+            self.stdout.write(self.style.SUCCESS(f'Новая проверка #{run.pk}'))
+
+        files = UploadedRinexFile.objects.exclude(file='').order_by('pk')
+        bytes_per_sec = options['max_mb_per_sec'] * 1024 * 1024 / workers
+        io_slots = multiprocessing.BoundedSemaphore(options['io_concurrency'])
+        checked_now = 0
+        finished = True
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(io_slots, bytes_per_sec)) as pool:
+            while True:
+                if options['limit'] and checked_now >= options['limit']:
+                    finished = False
+                    break
+                size = min(batch_size, options['limit'] - checked_now) if options['limit'] else batch_size
+                rows = list(files.filter(pk__gt=run.last_file_id).values_list('pk', 'file', 'file_hash')[:size])
+                if not rows:
+                    break
+
+                # Блоб с несколькими ссылками читается один раз
+                paths = sorted({default_storage.path(name) for _, name, _ in rows})
+                by_path = {result[0]: result for result in pool.map(_hash_path, paths)}
+
+                now = timezone.now()
+                existing = set(UploadedRinexFile.objects.filter(pk__in=[pk for pk, _, _ in rows]).values_list('pk', flat=True))
+                results = []
+                for pk, name, file_hash in rows:
+                    if pk not in existing:
+                        continue  # запись удалена во время проверки
+                    _, status, digest, file_size, error = by_path[default_storage.path(name)]
+                    if status == StorageScrubResult.STATUS_OK and file_hash and digest != file_hash:
+                        status = StorageScrubResult.STATUS_CORRUPT
+                        error = f'Ожидался {file_hash}'
+                    results.append(StorageScrubResult(
+                        file_id=pk, run=run, status=status, actual_hash=digest,
+                        size=file_size, detail=error, checked_at=now,
+                    ))
+                    if status == StorageScrubResult.STATUS_CORRUPT:
+                        run.corrupt_count += 1
+                        self.stdout.write(self.style.ERROR(f'Поврежден #{pk}: {name}'))
+                    elif status == StorageScrubResult.STATUS_MISSING:
+                        run.missing_count += 1
+                        self.stdout.write(self.style.ERROR(f'Нет файла #{pk}: {name}'))
+                    elif status == StorageScrubResult.STATUS_ERROR:
+                        self.stdout.write(self.style.WARNING(f'Ошибка чтения #{pk}: {name}: {error}'))
+
+                StorageScrubResult.objects.bulk_create(
+                    results, update_conflicts=True, unique_fields=['file'],
+                    update_fields=['run', 'status', 'actual_hash', 'size', 'detail', 'checked_at'],
+                )
+                run.last_file_id = rows[-1][0]
+                run.checked_count += len(results)
+                run.bytes_read += sum(by_path[p][3] or 0 for p in paths)
+                run.save(update_fields=['last_file_id', 'checked_count', 'corrupt_count', 'missing_count', 'bytes_read'])
+                checked_now += len(rows)
+                self.stdout.write(f'  проверено {run.checked_count} (контрольная точка: ID {run.last_file_id})...')
+
+        if finished:
+            run.finished_at = timezone.now()
+            run.save(update_fields=['finished_at'])
+        state = 'завершена' if finished else 'приостановлена (продолжится при следующем запуске)'
+        self.stdout.write(self.style.SUCCESS(
+            f'\nПроверка #{run.pk} {state}. Проверено: {run.checked_count}, '
+            f'повреждено: {run.corrupt_count}, отсутствует: {run.missing_count}, '
+            f'прочитано: {run.bytes_read / 1024 / 1024:.1f} МБ.'
+        ))
@@ -0,0 +1,37 @@
+# geoclient/management/commands/splice_sessions.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from geoclient.filters import as_list, parse_time_bound
+from geoclient.models import GeodeticPoint
+from geoclient.qc import qc_uploaded_file
+from geoclient.splice import splice_candidates, splice_observations
+
+
+class Command(BaseCommand):
+    help = ('Склеивает O-файлы сессий пункта в один RINEX-файл (новый комплект); '
+            'исходные наблюдения заменяются одним, исходные файлы сохраняются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('point_id', help='ID пункта.')
+        parser.add_argument('--observations', default='', help='ID наблюдений через запятую (по умолчанию — все).')
+        parser.add_argument('--start', help='Начало интервала (дата или дата-время).')
+        parser.add_argument('--end', help='Конец интервала (дата или дата-время).')
+
+    def handle(self, *args, **options):
+        point = GeodeticPoint.objects.filter(id=options['point_id']).first()
+        if point is None:
+            raise CommandError(f"Пункт {options['point_id']} не найден.")
+        try:
+            observations = splice_candidates(
+                point, as_list(options['observations']),
+                parse_time_bound(options['start']), parse_time_bound(options['end'], end_of_day=True),
+            )
+            observation, summary = splice_observations(point, observations)
+        except ValueError as e:
+            raise CommandError(str(e))
+        qc_uploaded_file(observation.source_file)
+        self.stdout.write(self.style.SUCCESS(
+            f"Склеено файлов: {len(observations)} -> #{observation.source_file_id} {observation.source_file}; "
+            f"эпох {summary['epochs']}, перекрытий пропущено {summary['overlaps']}, длительность {observation.duration}."
+        ))
@@ -0,0 +1,27 @@
+# geoclient/management/commands/sweep_pending_files.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from geoclient.cleanup import SWEEP_BATCH_SIZE, sweep_all_pending
+
+
+class Command(BaseCommand):
+    help = 'Удаляет с диска файлы из очереди PendingFileCleanup порциями (для cron или как постоянный процесс).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE, help='Размер порции.')
+        parser.add_argument(
+            '--loop', type=int, default=0, metavar='SECONDS',
+            help='Работать постоянно, проверяя очередь с указанным интервалом.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            removed, failed = sweep_all_pending(options['batch_size'])
+            if removed or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Снято с очереди: {removed}, ошибок: {failed}.'))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
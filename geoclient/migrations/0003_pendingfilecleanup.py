@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0002_alter_geodeticpoint_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingFileCleanup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, verbose_name='Путь в хранилище')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки в очередь')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток удаления')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Файл на удаление',
+                'verbose_name_plural': 'Очередь удаления файлов',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='uploadedrinexfile',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='Хэш-сумма SHA-256', max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0003_pendingfilecleanup'),
+    ]
+
+    operations = [
+        # Функциональный GiST-индекс по geography: KNN (<->) и ST_DWithin в метрах
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS geopoint_location_geog_idx '
+                'ON geoclient_geodeticpoint USING GIST ((location::geography));',
+            reverse_sql='DROP INDEX IF EXISTS geopoint_location_geog_idx;',
+        ),
+    ]
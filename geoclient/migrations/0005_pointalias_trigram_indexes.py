@@ -0,0 +1,80 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:00
+
+import re
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+ALIAS_RE = re.compile(r'\[Алиас из файла: ([^\]]+)\]')
+# Пометка целиком вместе с переводом строки, которым ее отделял parse_rinex_obs_file
+ALIAS_MARKER_RE = re.compile(r'\n?\[Алиас из файла: [^\]]+\]')
+
+
+def aliases_from_descriptions(apps, schema_editor):
+    """
+    Переносит алиасы, записанные текстом в description, в таблицу PointAlias
+    и убирает эти пометки из описания.
+    """
+    GeodeticPoint = apps.get_model('geoclient', 'GeodeticPoint')
+    PointAlias = apps.get_model('geoclient', 'PointAlias')
+    batch = []
+    points = []
+    for point_id, description in GeodeticPoint.objects.filter(description__contains='[Алиас из файла:').values_list('id', 'description').iterator():
+        for alias in set(ALIAS_RE.findall(description)):
+            batch.append(PointAlias(point_id=point_id, alias=alias.strip()[:50], source='rinex'))
+        points.append(GeodeticPoint(id=point_id, description=ALIAS_MARKER_RE.sub('', description).strip() or None))
+        if len(batch) >= 1000 or len(points) >= 1000:
+            PointAlias.objects.bulk_create(batch, ignore_conflicts=True)
+            GeodeticPoint.objects.bulk_update(points, ['description'])
+            batch = []
+            points = []
+    PointAlias.objects.bulk_create(batch, ignore_conflicts=True)
+    GeodeticPoint.objects.bulk_update(points, ['description'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0004_geodeticpoint_location_geography_idx'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='PointAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=50, verbose_name='Алиас')),
+                ('source', models.CharField(choices=[('rinex', 'Имя из RINEX файла'), ('merge', 'Объединенный пункт'), ('manual', 'Добавлено вручную')], default='rinex', max_length=20, verbose_name='Источник')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('point', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='geoclient.geodeticpoint', verbose_name='Геодезический пункт')),
+            ],
+            options={
+                'verbose_name': 'Алиас пункта',
+                'verbose_name_plural': 'Алиасы пунктов',
+                'ordering': ['alias'],
+                'indexes': [GinIndex(OpClass(django.db.models.functions.text.Upper('alias'), name='gin_trgm_ops'), name='pointalias_alias_trgm_idx')],
+                'unique_together': {('point', 'alias')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='geodeticpoint',
+            index=GinIndex(OpClass(django.db.models.functions.text.Upper('id'), name='gin_trgm_ops'), name='geopoint_id_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geodeticpoint',
+            index=GinIndex(OpClass(django.db.models.functions.text.Upper('station_name'), name='gin_trgm_ops'), name='geopoint_station_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geodeticpoint',
+            index=GinIndex(OpClass(django.db.models.functions.text.Upper('index_name'), name='gin_trgm_ops'), name='geopoint_index_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='geodeticpoint',
+            index=GinIndex(OpClass(django.db.models.functions.text.Upper('mark_number'), name='gin_trgm_ops'), name='geopoint_mark_trgm_idx'),
+        ),
+        migrations.RunPython(aliases_from_descriptions, migrations.RunPython.noop),
+    ]
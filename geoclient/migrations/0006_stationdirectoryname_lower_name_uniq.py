@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:00
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+
+
+def remove_case_duplicates(apps, schema_editor):
+    """
+    Прежнее unique=True различало регистр ("TATA" и "tata"), а новое ограничение — нет.
+    На справочник никто не ссылается, поэтому из каждой такой группы остается
+    самая ранняя запись, остальные удаляются.
+    """
+    StationDirectoryName = apps.get_model('geoclient', 'StationDirectoryName')
+    keep_ids = (
+        StationDirectoryName.objects.order_by().annotate(name_lower=Lower('name')).values('name_lower')
+        .annotate(n=Count('id'), keep_id=Min('id')).filter(n__gt=1).values_list('name_lower', 'keep_id')
+    )
+    for name_lower, keep_id in list(keep_ids):
+        StationDirectoryName.objects.annotate(name_lower=Lower('name')).filter(name_lower=name_lower).exclude(id=keep_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0005_pointalias_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='stationdirectoryname',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='stationdirname_lower_name_uniq'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0006_stationdirectoryname_lower_name_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RinexBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('file', models.FileField(max_length=255, upload_to='', verbose_name='Файл блоба')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Размер, байт')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Количество ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Блоб хранилища',
+                'verbose_name_plural': 'Блобы хранилища',
+            },
+        ),
+        migrations.AddField(
+            model_name='uploadedrinexfile',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='files', to='geoclient.rinexblob', verbose_name='Блоб'),
+        ),
+        migrations.AddField(
+            model_name='uploadedrinexfile',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Имя файла'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0007_rinexblob_uploadedrinexfile_blob_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageScrubRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Начало')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание')),
+                ('last_file_id', models.BigIntegerField(default=0, verbose_name='Последний проверенный файл (ID)')),
+                ('checked_count', models.PositiveIntegerField(default=0, verbose_name='Проверено')),
+                ('corrupt_count', models.PositiveIntegerField(default=0, verbose_name='Повреждено')),
+                ('missing_count', models.PositiveIntegerField(default=0, verbose_name='Отсутствует')),
+                ('bytes_read', models.BigIntegerField(default=0, verbose_name='Прочитано, байт')),
+            ],
+            options={
+                'verbose_name': 'Проверка хранилища',
+                'verbose_name_plural': 'Проверки хранилища',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StorageScrubResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('ok', 'В порядке'), ('corrupt', 'Хэш не совпадает'), ('missing', 'Нет файла на диске'), ('error', 'Ошибка чтения')], db_index=True, max_length=10, verbose_name='Статус')),
+                ('actual_hash', models.CharField(blank=True, max_length=64, null=True, verbose_name='Хэш на диске')),
+                ('size', models.BigIntegerField(blank=True, null=True, verbose_name='Размер, байт')),
+                ('detail', models.TextField(blank=True, null=True, verbose_name='Подробности')),
+                ('checked_at', models.DateTimeField(verbose_name='Время проверки')),
+                ('file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='scrub_result', to='geoclient.uploadedrinexfile', verbose_name='Файл')),
+                ('run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='results', to='geoclient.storagescrubrun', verbose_name='Проверка')),
+            ],
+            options={
+                'verbose_name': 'Результат проверки файла',
+                'verbose_name_plural': 'Результаты проверки файлов',
+                'ordering': ['-checked_at'],
+            },
+        ),
+    ]
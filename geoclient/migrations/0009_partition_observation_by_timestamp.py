@@ -0,0 +1,86 @@
+# Секционирование geoclient_observation по timestamp.
+# Таблица пересоздается как PARTITION BY RANGE ("timestamp") с годовыми секциями
+# от первого наблюдения до текущего года + 5 и секцией DEFAULT; данные переносятся.
+# Первичный ключ в БД — (id, timestamp), как требует PostgreSQL; для Django ключом остается id.
+
+from datetime import date
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+from geoclient.partitions import DEFAULT_PARTITION, OBSERVATION_TABLE, create_observation_partitions
+
+LEGACY_TABLE = f'{OBSERVATION_TABLE}_legacy'
+SEQUENCE = f'{OBSERVATION_TABLE}_part_id_seq'
+YEARS_AHEAD = 5
+
+
+def _constraints_sql(table, primary_key):
+    return [
+        f'ALTER TABLE "{table}" ADD PRIMARY KEY ({primary_key})',
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_point_id_timestamp_uniq" UNIQUE ("point_id", "timestamp")',
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_point_id_fk" FOREIGN KEY ("point_id") '
+        f'REFERENCES "geoclient_geodeticpoint" ("id") DEFERRABLE INITIALLY DEFERRED',
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_source_file_id_fk" FOREIGN KEY ("source_file_id") '
+        f'REFERENCES "geoclient_uploadedrinexfile" ("id") DEFERRABLE INITIALLY DEFERRED',
+        f'CREATE INDEX "{table}_source_file_id_idx" ON "{table}" ("source_file_id")',
+        # Имя совпадает с тем, что GeoDjango дает индексу PointField(spatial_index=True)
+        f'CREATE INDEX "{table}_location_id" ON "{table}" USING GIST ("location")',
+    ]
+
+
+def partition_observations(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{OBSERVATION_TABLE}" RENAME TO "{LEGACY_TABLE}"')
+        cursor.execute(
+            f'SELECT EXTRACT(YEAR FROM MIN("timestamp"))::int, COALESCE(MAX("id"), 0) FROM "{LEGACY_TABLE}"'
+        )
+        first_year, max_id = cursor.fetchone()
+
+        cursor.execute(f'CREATE TABLE "{OBSERVATION_TABLE}" (LIKE "{LEGACY_TABLE}") PARTITION BY RANGE ("timestamp")')
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCE}" OWNED BY "{OBSERVATION_TABLE}"."id"')
+        cursor.execute('SELECT setval(%s, %s, false)', [SEQUENCE, max_id + 1])
+        cursor.execute(f'ALTER TABLE "{OBSERVATION_TABLE}" ALTER COLUMN "id" SET DEFAULT nextval(\'"{SEQUENCE}"\')')
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{OBSERVATION_TABLE}" DEFAULT')
+
+    this_year = date.today().year
+    create_observation_partitions(connection, min(first_year or this_year, this_year), this_year + YEARS_AHEAD)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO "{OBSERVATION_TABLE}" SELECT * FROM "{LEGACY_TABLE}"')
+        # Старые ограничения и индексы уходят вместе с таблицей, их имена освобождаются
+        cursor.execute(f'DROP TABLE "{LEGACY_TABLE}"')
+        for sql in _constraints_sql(OBSERVATION_TABLE, '"id", "timestamp"'):
+            cursor.execute(sql)
+
+
+def unpartition_observations(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{OBSERVATION_TABLE}" RENAME TO "{LEGACY_TABLE}"')
+        cursor.execute(f'CREATE TABLE "{OBSERVATION_TABLE}" (LIKE "{LEGACY_TABLE}")')
+        cursor.execute(f'ALTER SEQUENCE "{SEQUENCE}" OWNED BY "{OBSERVATION_TABLE}"."id"')
+        cursor.execute(f'ALTER TABLE "{OBSERVATION_TABLE}" ALTER COLUMN "id" SET DEFAULT nextval(\'"{SEQUENCE}"\')')
+        cursor.execute(f'INSERT INTO "{OBSERVATION_TABLE}" SELECT * FROM "{LEGACY_TABLE}"')
+        cursor.execute(f'DROP TABLE "{LEGACY_TABLE}" CASCADE')
+        for sql in _constraints_sql(OBSERVATION_TABLE, '"id"'):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0008_storagescrubrun_storagescrubresult'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_observations, unpartition_observations),
+        migrations.AddIndex(
+            model_name='observation',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['timestamp'], name='observation_timestamp_brin'),
+        ),
+        migrations.AddIndex(
+            model_name='observation',
+            index=models.Index(fields=['receiver_number', 'timestamp'], name='observation_receiver_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0009_partition_observation_by_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='observation',
+            name='ellipsoidal_height',
+            field=models.FloatField(blank=True, help_text='Эллипсоидальная высота WGS84 (из ECEF)', null=True, verbose_name='Высота над эллипсоидом'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Начальное заполнение сводки тем же запросом, что и statistics.rebuild_point_statistics,
+# но со схемой на момент этой миграции (без импорта текущего кода приложения)
+FILL_STATISTICS_SQL = """
+    INSERT INTO geoclient_pointstatistics
+        (point_id, observation_count, first_observation, last_observation,
+         total_duration, receiver_count, updated_at)
+    SELECT p.id, COUNT(o.id), MIN(o."timestamp"), MAX(o."timestamp"),
+           SUM(o.duration), COUNT(DISTINCT o.receiver_number), NOW()
+    FROM geoclient_geodeticpoint p
+    LEFT JOIN geoclient_observation o ON o.point_id = p.id
+    GROUP BY p.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0010_observation_ellipsoidal_height'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointStatistics',
+            fields=[
+                ('point', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='geoclient.geodeticpoint', verbose_name='Пункт')),
+                ('observation_count', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Кол-во наблюдений')),
+                ('first_observation', models.DateTimeField(blank=True, null=True, verbose_name='Первое наблюдение')),
+                ('last_observation', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Последнее наблюдение')),
+                ('total_duration', models.DurationField(blank=True, null=True, verbose_name='Суммарная длительность')),
+                ('receiver_count', models.PositiveIntegerField(default=0, verbose_name='Разных приемников')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Статистика пункта',
+                'verbose_name_plural': 'Статистика пунктов',
+            },
+        ),
+        migrations.RunSQL(FILL_STATISTICS_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0011_pointstatistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedrinexfile',
+            name='qc_summary',
+            field=models.JSONField(blank=True, null=True, verbose_name='Контроль качества'),
+        ),
+    ]
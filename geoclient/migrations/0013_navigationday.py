@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0012_uploadedrinexfile_qc_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NavigationDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('system', models.CharField(choices=[('G', 'GPS'), ('R', 'ГЛОНАСС')], max_length=1, verbose_name='Система')),
+                ('data', models.BinaryField(verbose_name='Эфемериды (.npy)')),
+                ('record_count', models.PositiveIntegerField(default=0, verbose_name='Записей')),
+                ('satellite_count', models.PositiveIntegerField(default=0, verbose_name='Спутников')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Эфемериды за сутки',
+                'verbose_name_plural': 'Эфемериды по суткам',
+                'ordering': ['-date', 'system'],
+                'unique_together': {('date', 'system')},
+            },
+        ),
+    ]
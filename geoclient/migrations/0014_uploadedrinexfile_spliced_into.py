@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 21:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0013_navigationday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedrinexfile',
+            name='spliced_into',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='splice_sources', to='geoclient.uploadedrinexfile', verbose_name='Склеен в'),
+        ),
+    ]
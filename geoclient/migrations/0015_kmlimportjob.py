@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 22:00
+
+import django.db.models.deletion
+import geoclient.models
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0014_uploadedrinexfile_spliced_into'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KmlImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file', models.FileField(blank=True, upload_to=geoclient.models.kml_import_path, verbose_name='Файл')),
+                ('original_name', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('radius', models.FloatField(verbose_name='Радиус поиска, м')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершен'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('counts', models.JSONField(blank=True, null=True, verbose_name='Итоги')),
+                ('report', models.FileField(blank=True, upload_to=geoclient.models.kml_import_path, verbose_name='Отчет')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Импорт KML',
+                'verbose_name_plural': 'Импорт KML',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geoclient', '0015_kmlimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kmlimportjob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Начало'),
+        ),
+    ]
@@ -3,8 +3,54 @@
 import os
 import re
 import uuid
+from django.conf import settings
 from django.contrib.gis.db import models as gis_models
-from django.db import models
+from django.contrib.postgres.indexes import BrinIndex, GinIndex, OpClass
+from django.db import models, transaction
+from django.db.models.functions import Lower, Upper
+
+# Имена RINEX: короткие (.20o/.20n/.20g, Hatanaka .20d) и длинные RINEX 3
+# (..._01D_30S_MO.rnx, ..._01D_GN.rnx, ..._01D_30S_MO.crx), с необязательным сжатием .gz / .Z / .zst.
+RINEX_EXT_REGEX = r'(?:\.\d{2}[ognd]|(?:_\d{2}[SMHDU]){1,2}_[A-Z]{2}\.(?:rnx|crx))'
+RINEX_COMPRESSION_REGEX = r'(?:\.(?:gz|z|zst))?'
+# Для поиска по БД (iregex): расширение RINEX + сжатие в конце имени
+RINEX_SUFFIX_REGEX = RINEX_EXT_REGEX + RINEX_COMPRESSION_REGEX
+RINEX_NAME_RE = re.compile(
+    rf'^(?P<base>.+?)(?P<ext>{RINEX_EXT_REGEX})(?P<compression>\.(?:gz|z|zst))?$', re.IGNORECASE
+)
+_COMPRESSION_CASE = {'.gz': '.gz', '.z': '.Z', '.zst': '.zst'}
+# Сжатие при хранении (см. storage.COMPRESSION_SUFFIXES): содержимое файла — распакованные данные
+_AT_REST_SUFFIXES = ('.gz', '.zst')
+
+
+def split_rinex_name(filename):
+    """
+    Разбирает имя RINEX на (база комплекта, расширение, суффикс сжатия).
+    Для чужих имен возвращает None.
+    """
+    match = RINEX_NAME_RE.match(os.path.basename(filename))
+    if not match:
+        return None
+    ext = match.group('ext')
+    # Короткие расширения — в нижнем регистре; в длинных именах регистр значим (_MO.rnx)
+    ext = ext.lower() if ext.startswith('.') else ext[:-4] + ext[-4:].lower()
+    compression = _COMPRESSION_CASE[match.group('compression').lower()] if match.group('compression') else ''
+    return match.group('base'), ext, compression
+
+
+def rinex_file_type(filename):
+    """Тип файла комплекта: 'o' (наблюдения, в т.ч. Hatanaka), 'n' (GPS nav), 'g' (ГЛОНАСС nav)."""
+    parts = split_rinex_name(filename)
+    if not parts:
+        return None
+    ext = parts[1].lower()
+    if ext.startswith('.'):
+        return 'o' if ext[-1] in 'od' else ext[-1]
+    data_type = ext[-6:-4]
+    if ext.endswith('.crx') or data_type[1] == 'o':
+        return 'o'
+    return 'g' if data_type == 'rn' else 'n'
+
 
 # --- НОВАЯ, БОЛЕЕ НАДЕЖНАЯ ФУНКЦИЯ ГЕНЕРАЦИИ ПУТИ ---
 def rinex_file_path(instance, filename):
@@ -12,33 +58,140 @@ def rinex_file_path(instance, filename):
     Генерирует чистый и предсказуемый путь для сохранения RINEX файлов.
     Эта версия устойчива к случайным символам, добавляемым Django.
     Пример: из 'KAM32700_2_Abc123.20g' сделает 'rinex_files/KAM32700/KAM32700_2.20g'
+    Сжатые и Hatanaka-файлы сохраняют свое расширение: 'TATA1230.20d.Z'.
     """
 
-    name_part = re.sub(r'\.\d{2}[ogn]$', '', filename, flags=re.IGNORECASE)
-    match = re.search(r'(\.\d{2}[ogn])$', filename, re.IGNORECASE)
-    extension = match.group(1).lower() if match else os.path.splitext(filename)[1].lower()
+    parts = split_rinex_name(filename)
+    if parts:
+        name_part = parts[0]
+        extension = parts[1] + parts[2]
+    else:
+        name_part = filename
+        extension = os.path.splitext(filename)[1].lower()
     station_folder_name = re.split(r'[_ -]', name_part)[0].upper()
     clean_filename = f"{name_part}{extension}"
     return os.path.join('rinex_files', station_folder_name, clean_filename)
 
 
+def logical_rinex_name(filename):
+    """
+    Имя файла для пользователя (как в rinex_file_path, но без папки станции).
+    Суффикс сжатия при хранении (.gz/.zst) отбрасывается: скачивается распакованное содержимое.
+    """
+    name = os.path.basename(rinex_file_path(None, os.path.basename(filename)))
+    for suffix in _AT_REST_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def rinex_blob_path(sha256):
+    """Путь блоба в контентно-адресуемом хранилище: blobs/ab/cd/abcd...."""
+    return os.path.join('blobs', sha256[:2], sha256[2:4], sha256)
+
+
+class RinexBlob(models.Model):
+    """
+    Уникальное содержимое файла в контентно-адресуемом хранилище (RINEX_STORAGE_LAYOUT='cas').
+    Одинаковые файлы разных комплектов ссылаются на один блоб; ref_count — число ссылок.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True, verbose_name="SHA-256")
+    file = models.FileField(max_length=255, verbose_name="Файл блоба")
+    size = models.BigIntegerField(default=0, verbose_name="Размер, байт")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="Количество ссылок")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Блоб хранилища"
+        verbose_name_plural = "Блобы хранилища"
+
+    def __str__(self):
+        return f"{self.sha256[:12]}… ({self.ref_count})"
+
+    @classmethod
+    def release(cls, counts):
+        """
+        Уменьшает ref_count одним UPDATE (counts: {sha256: число снятых ссылок}).
+        Удаляет блобы без ссылок и возвращает их пути для удаления с диска.
+        """
+        if not counts:
+            return []
+        cls.objects.filter(pk__in=counts).update(ref_count=models.Case(
+            *[models.When(pk=sha, then=models.F('ref_count') - n) for sha, n in counts.items()],
+            output_field=models.IntegerField(),
+        ))
+        orphaned = cls.objects.filter(pk__in=counts, ref_count__lte=0)
+        paths = list(orphaned.values_list('file', flat=True))
+        orphaned.delete()
+        return paths
+
+
+def _enqueue_orphaned_blobs(paths):
+    """Файлы блобов без ссылок удаляются очередью после фиксации транзакции, а не сразу."""
+    if not paths:
+        return
+    PendingFileCleanup.objects.bulk_create([PendingFileCleanup(path=path) for path in paths])
+
+    def sweep():
+        from .cleanup import start_background_sweep
+        start_background_sweep()
+    transaction.on_commit(sweep)
+
+
+class UploadedRinexFileQuerySet(models.QuerySet):
+    def delete(self):
+        # QuerySet.delete() (и «удалить выбранные» в админке) минует UploadedRinexFile.delete(),
+        # поэтому ссылки на блобы снимаются здесь: одним UPDATE на все затронутые блобы
+        with transaction.atomic(using=self.db):
+            blob_refs = dict(self.order_by().exclude(blob=None).values_list('blob').annotate(n=models.Count('pk')))
+            result = super().delete()
+            _enqueue_orphaned_blobs(RinexBlob.release(blob_refs))
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class UploadedRinexFile(models.Model):
     # Используем нашу новую функцию
     file = models.FileField(upload_to=rinex_file_path, verbose_name="Файл")
+    # В режиме 'cas' file указывает на путь блоба, а имя для скачивания хранится в original_name
+    blob = models.ForeignKey(RinexBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='files', verbose_name="Блоб")
+    original_name = models.CharField(max_length=255, blank=True, null=True, verbose_name="Имя файла")
     file_hash = models.CharField(max_length=64, db_index=True, blank=True, null=True, help_text="Хэш-сумма SHA-256")
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name="Время загрузки")
     file_type = models.CharField(max_length=10, blank=True, null=True, verbose_name="Тип файла")
     remarks = models.TextField(blank=True, null=True, verbose_name="Заметки")
     upload_group = models.UUIDField(default=uuid.uuid4, db_index=True, null=True, blank=True, help_text="ID группы связанных файлов")
+    # Сводка контроля качества O-файла (geoclient/qc.py); NULL — еще не считалась
+    qc_summary = models.JSONField(null=True, blank=True, verbose_name="Контроль качества")
+    # O-файл, в который этот файл вошел при склейке сессий (geoclient/splice.py)
+    spliced_into = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='splice_sources', verbose_name="Склеен в")
+
+    objects = UploadedRinexFileQuerySet.as_manager()
 
     def delete(self, *args, **kwargs):
+        if self.blob_id:
+            # Общий блоб удаляется только вместе с последней ссылкой на него
+            blob_id = self.blob_id
+            with transaction.atomic():
+                result = super().delete(*args, **kwargs)
+                _enqueue_orphaned_blobs(RinexBlob.release({blob_id: 1}))
+            return result
         # Добавлена проверка на существование файла перед удалением
         if self.file and hasattr(self.file, 'path') and os.path.exists(self.file.path):
             self.file.delete(save=False)
         super().delete(*args, **kwargs)
 
+    @property
+    def download_name(self):
+        """Логическое имя файла (для скачивания и архивов) независимо от схемы хранения."""
+        if self.original_name:
+            return self.original_name
+        return os.path.basename(self.file.name) if self.file else None
+
     def __str__(self):
-        return os.path.basename(self.file.name) if self.file else "Файл отсутствует"
+        return self.download_name or "Файл отсутствует"
 
     class Meta:
         verbose_name = "Загруженный RINEX файл"
@@ -55,6 +208,8 @@ class StationDirectoryName(models.Model):
         verbose_name = "Запись справочника имен"
         verbose_name_plural = "Справочник имен станций"
         ordering = ['name']
+        # Уникальность без учета регистра; индекс по lower(name) обслуживает и проверки дубликатов
+        constraints = [models.UniqueConstraint(Lower('name'), name='stationdirname_lower_name_uniq')]
 
     def __str__(self):
         return self.name
@@ -87,7 +242,14 @@ class GeodeticPoint(models.Model):
     class Meta:
         verbose_name = "Геодезический пункт"
         verbose_name_plural = "Геодезические пункты"
-        indexes = [gis_models.Index(fields=['location'], name='geopoint_location_idx')]
+        indexes = [
+            gis_models.Index(fields=['location'], name='geopoint_location_idx'),
+            # Триграммные индексы для нечеткого поиска (geoclient/search.py ищет по UPPER(...))
+            GinIndex(OpClass(Upper('id'), name='gin_trgm_ops'), name='geopoint_id_trgm_idx'),
+            GinIndex(OpClass(Upper('station_name'), name='gin_trgm_ops'), name='geopoint_station_trgm_idx'),
+            GinIndex(OpClass(Upper('index_name'), name='gin_trgm_ops'), name='geopoint_index_trgm_idx'),
+            GinIndex(OpClass(Upper('mark_number'), name='gin_trgm_ops'), name='geopoint_mark_trgm_idx'),
+        ]
         ordering = ['id']
 
     def __str__(self):
@@ -95,6 +257,33 @@ class GeodeticPoint(models.Model):
         return f"Пункт: {display_identifier} (ID: {self.id})"
 
 
+class PointAlias(models.Model):
+    """
+    Альтернативные имена пункта: MARKER NAME из файлов, привязанных к нему
+    по близости координат, и ID пунктов, влитых в него при объединении.
+    """
+    SOURCES = [
+        ('rinex', 'Имя из RINEX файла'),
+        ('merge', 'Объединенный пункт'),
+        ('manual', 'Добавлено вручную'),
+    ]
+
+    point = models.ForeignKey(GeodeticPoint, on_delete=models.CASCADE, related_name='aliases', verbose_name="Геодезический пункт")
+    alias = models.CharField(max_length=50, verbose_name="Алиас")
+    source = models.CharField(max_length=20, choices=SOURCES, default='rinex', verbose_name="Источник")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Алиас пункта"
+        verbose_name_plural = "Алиасы пунктов"
+        unique_together = ('point', 'alias')
+        ordering = ['alias']
+        indexes = [GinIndex(OpClass(Upper('alias'), name='gin_trgm_ops'), name='pointalias_alias_trgm_idx')]
+
+    def __str__(self):
+        return f"{self.alias} → {self.point_id}"
+
+
 class Observation(models.Model):
     id = models.BigAutoField(primary_key=True)
     point = models.ForeignKey(GeodeticPoint, on_delete=models.CASCADE, related_name='observations', verbose_name="Геодезический пункт")
@@ -105,6 +294,7 @@ class Observation(models.Model):
     raw_x = models.FloatField(null=True, blank=True, help_text="Исходная координата X (ECEF из RINEX)")
     raw_y = models.FloatField(null=True, blank=True, help_text="Исходная координата Y (ECEF из RINEX)")
     raw_z = models.FloatField(null=True, blank=True, help_text="Исходная координата Z (ECEF из RINEX)")
+    ellipsoidal_height = models.FloatField(null=True, blank=True, help_text="Эллипсоидальная высота WGS84 (из ECEF)", verbose_name="Высота над эллипсоидом")
     receiver_number = models.CharField(max_length=100, blank=True, null=True, verbose_name="Номер приемника")
     antenna_height = models.FloatField(null=True, blank=True, help_text="Высота антенны (H) из RINEX", verbose_name="Высота антенны (H)")
     
@@ -113,6 +303,173 @@ class Observation(models.Model):
         verbose_name_plural = "Наблюдения"
         unique_together = ('point', 'timestamp')
         ordering = ['-timestamp']
+        # Таблица секционирована по timestamp (миграция 0009, geoclient/partitions.py):
+        # фильтр по времени отсекает лишние секции, BRIN внутри секций почти ничего не весит.
+        indexes = [
+            BrinIndex(fields=['timestamp'], name='observation_timestamp_brin', autosummarize=True),
+            models.Index(fields=['receiver_number', 'timestamp'], name='observation_receiver_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"Наблюдение для {self.point.id} в {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+class PointStatistics(models.Model):
+    """
+    Сводка по наблюдениям пункта. Пересчитывается для затронутых пунктов при загрузке
+    и объединении (geoclient/statistics.py), полностью — командой rebuild_point_statistics.
+    """
+    point = models.OneToOneField(GeodeticPoint, on_delete=models.CASCADE, primary_key=True, related_name='statistics', verbose_name="Пункт")
+    observation_count = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Кол-во наблюдений")
+    first_observation = models.DateTimeField(null=True, blank=True, verbose_name="Первое наблюдение")
+    last_observation = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name="Последнее наблюдение")
+    total_duration = models.DurationField(null=True, blank=True, verbose_name="Суммарная длительность")
+    receiver_count = models.PositiveIntegerField(default=0, verbose_name="Разных приемников")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Статистика пункта"
+        verbose_name_plural = "Статистика пунктов"
+
+    def __str__(self):
+        return f"{self.point_id}: {self.observation_count}"
+
+
+class PendingFileCleanup(models.Model):
+    """
+    Очередь путей в хранилище, которые нужно удалить с диска.
+    Строки добавляются в той же транзакции, что и удаление записей из БД,
+    а сами файлы удаляет фоновый обработчик (см. geoclient/cleanup.py).
+    """
+    path = models.CharField(max_length=500, verbose_name="Путь в хранилище")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата постановки в очередь")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток удаления")
+    last_error = models.TextField(blank=True, null=True, verbose_name="Последняя ошибка")
+
+    class Meta:
+        verbose_name = "Файл на удаление"
+        verbose_name_plural = "Очередь удаления файлов"
+        ordering = ['id']
+
+    def __str__(self):
+        return self.path
+
+
+class StorageScrubRun(models.Model):
+    """
+    Проход проверки целостности хранилища (scrub_storage).
+    last_file_id — контрольная точка: незавершенный проход продолжается с нее.
+    """
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name="Начало")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Окончание")
+    last_file_id = models.BigIntegerField(default=0, verbose_name="Последний проверенный файл (ID)")
+    checked_count = models.PositiveIntegerField(default=0, verbose_name="Проверено")
+    corrupt_count = models.PositiveIntegerField(default=0, verbose_name="Повреждено")
+    missing_count = models.PositiveIntegerField(default=0, verbose_name="Отсутствует")
+    bytes_read = models.BigIntegerField(default=0, verbose_name="Прочитано, байт")
+
+    class Meta:
+        verbose_name = "Проверка хранилища"
+        verbose_name_plural = "Проверки хранилища"
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Проверка от {self.started_at:%Y-%m-%d %H:%M}"
+
+
+class StorageScrubResult(models.Model):
+    """Последний результат проверки файла: совпадает ли содержимое на диске с file_hash."""
+    STATUS_OK = 'ok'
+    STATUS_CORRUPT = 'corrupt'
+    STATUS_MISSING = 'missing'
+    STATUS_ERROR = 'error'
+    STATUS_CHOICES = [
+        (STATUS_OK, 'В порядке'),
+        (STATUS_CORRUPT, 'Хэш не совпадает'),
+        (STATUS_MISSING, 'Нет файла на диске'),
+        (STATUS_ERROR, 'Ошибка чтения'),
+    ]
+
+    file = models.OneToOneField(UploadedRinexFile, on_delete=models.CASCADE, related_name='scrub_result', verbose_name="Файл")
+    run = models.ForeignKey(StorageScrubRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='results', verbose_name="Проверка")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, db_index=True, verbose_name="Статус")
+    actual_hash = models.CharField(max_length=64, blank=True, null=True, verbose_name="Хэш на диске")
+    size = models.BigIntegerField(null=True, blank=True, verbose_name="Размер, байт")
+    detail = models.TextField(blank=True, null=True, verbose_name="Подробности")
+    checked_at = models.DateTimeField(verbose_name="Время проверки")
+
+    class Meta:
+        verbose_name = "Результат проверки файла"
+        verbose_name_plural = "Результаты проверки файлов"
+        ordering = ['-checked_at']
+
+    def __str__(self):
+        return f"{self.file_id}: {self.get_status_display()}"
+
+
+class NavigationDay(models.Model):
+    """
+    Эфемериды одной системы за сутки: структурированный массив NumPy в формате .npy
+    (см. geoclient/rinex_nav.py). Пополняется из загруженных N/G файлов без дубликатов
+    по (спутник, Toe); сессии берут эфемериды отсюда, не разбирая файлы заново.
+    """
+    SYSTEM_CHOICES = [('G', 'GPS'), ('R', 'ГЛОНАСС')]
+
+    date = models.DateField(verbose_name="Дата")
+    system = models.CharField(max_length=1, choices=SYSTEM_CHOICES, verbose_name="Система")
+    data = models.BinaryField(verbose_name="Эфемериды (.npy)")
+    record_count = models.PositiveIntegerField(default=0, verbose_name="Записей")
+    satellite_count = models.PositiveIntegerField(default=0, verbose_name="Спутников")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Эфемериды за сутки"
+        verbose_name_plural = "Эфемериды по суткам"
+        unique_together = ('date', 'system')
+        ordering = ['-date', 'system']
+
+    def __str__(self):
+        return f"{self.get_system_display()} {self.date}: {self.record_count}"
+
+
+
+def kml_import_path(instance, filename):
+    return os.path.join('kml_imports', str(instance.pk), os.path.basename(filename))
+
+
+class KmlImportJob(models.Model):
+    """
+    Фоновый импорт KML/KMZ из веб-интерфейса (geoclient/kml_import.py). Загруженный файл
+    хранится до окончания импорта; ход выполнения — в кэше, итоговые счетчики — в counts.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Завершен'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.FileField(upload_to=kml_import_path, blank=True, verbose_name="Файл")
+    original_name = models.CharField(max_length=255, verbose_name="Имя файла")
+    radius = models.FloatField(verbose_name="Радиус поиска, м")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    counts = models.JSONField(null=True, blank=True, verbose_name="Итоги")
+    # CSV неоднозначных совпадений; пусто, если их не было
+    report = models.FileField(upload_to=kml_import_path, blank=True, verbose_name="Отчет")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Пользователь")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создан")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начало")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Окончание")
+
+    class Meta:
+        verbose_name = "Импорт KML"
+        verbose_name_plural = "Импорт KML"
+        ordering = ['-created_at']
 
     def __str__(self):
-        return f"Наблюдение для {self.point.id} в {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.original_name}: {self.get_status_display()}"
@@ -0,0 +1,308 @@
+# geoclient/orbits.py
+"""
+Положения спутников по бортовым эфемеридам, углы видимости и DOP для пункта.
+
+Все функции считают сразу по всем спутникам и эпохам: пары (спутник, эпоха)
+разворачиваются в плоские массивы, для каждой выбирается ближайшая эфемерида,
+а затем одним проходом считается кеплерова орбита (GPS) или интегрирование
+Рунге–Кутты 4-го порядка (ГЛОНАСС).
+
+Время сетки — GPST. Эфемериды ГЛОНАСС заданы в UTC, разница — LEAP_SECONDS.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+from .ephemeris import load_ephemerides
+from .rinex_nav import GPS, GLONASS, EPHEMERIS_DTYPES, ephemeris_time
+from .timeseries import ecef_to_geodetic, enu_rotation
+
+# GPS (IS-GPS-200)
+GPS_GM = 3.986005e14
+GPS_OMEGA_E = 7.2921151467e-5
+RELATIVISTIC_F = -4.442807633e-10
+KEPLER_ITERATIONS = 10
+GPS_MAX_AGE = 4 * 3600
+
+# ГЛОНАСС (ИКД, ПЗ-90), км и с
+GLO_GM = 398600.4418
+GLO_AE = 6378.136
+GLO_J2 = 1.08262575e-3
+GLO_OMEGA_E = 7.292115e-5
+GLO_STEP = 60.0
+GLO_MAX_AGE = 30 * 60
+
+# GPST - UTC с 2017-01-01
+LEAP_SECONDS = 18
+
+DEFAULT_INTERVAL = 30
+DEFAULT_ELEVATION_MASK = 10.0
+MAX_GRID_EPOCHS = 5761  # двое суток с шагом 30 с
+
+_MAX_AGE = {GPS: GPS_MAX_AGE, GLONASS: GLO_MAX_AGE}
+
+# WGS84
+_WGS84_A = 6378137.0
+_WGS84_E2 = (1 / 298.257223563) * (2 - 1 / 298.257223563)
+
+
+def geodetic_to_ecef(lat, lon, height=0.0):
+    """Широта/долгота (градусы) и эллипсоидальная высота (м) -> ECEF (м)."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    n = _WGS84_A / np.sqrt(1 - _WGS84_E2 * np.sin(lat) ** 2)
+    return np.array([
+        (n + height) * np.cos(lat) * np.cos(lon),
+        (n + height) * np.cos(lat) * np.sin(lon),
+        (n * (1 - _WGS84_E2) + height) * np.sin(lat),
+    ])
+
+
+def _select(system, eph, prn, times):
+    """
+    Индекс ближайшей по времени эфемериды того же спутника для каждой пары (prn, время)
+    и признак, что она не старше допустимого. eph отсортирован по (prn, время) — см. deduplicate().
+    """
+    eph_times = ephemeris_time(system, eph).astype('datetime64[ms]').astype(np.int64)
+    if system == GLONASS:
+        times = times - np.timedelta64(LEAP_SECONDS, 's')
+    query = times.astype('datetime64[ms]').astype(np.int64)
+    # Составной ключ (prn, время) сохраняет порядок сортировки
+    span = max(int(eph_times.max()), int(query.max())) - min(int(eph_times.min()), int(query.min())) + 1
+    base = min(int(eph_times.min()), int(query.min()))
+    eph_key = eph['prn'].astype(np.int64) * span + (eph_times - base)
+    query_key = prn.astype(np.int64) * span + (query - base)
+
+    right = np.clip(np.searchsorted(eph_key, query_key), 0, len(eph) - 1)
+    left = np.clip(right - 1, 0, len(eph) - 1)
+    dist_left = np.where(eph['prn'][left] == prn, np.abs(eph_times[left] - query), np.iinfo(np.int64).max)
+    dist_right = np.where(eph['prn'][right] == prn, np.abs(eph_times[right] - query), np.iinfo(np.int64).max)
+    index = np.where(dist_left <= dist_right, left, right)
+    valid = np.minimum(dist_left, dist_right) <= _MAX_AGE[system] * 1000
+    return index, valid, (query - eph_times[index]) / 1000.0
+
+
+def _gps_positions(eph, dt_toe, dt_toc):
+    """Кеплерова орбита: ECEF (м) и поправка часов спутника (с) для плоских массивов."""
+    a = eph['sqrt_a'] ** 2
+    n = np.sqrt(GPS_GM / a ** 3) + eph['delta_n']
+    mean_anomaly = eph['m0'] + n * dt_toe
+    e = eph['e']
+    ecc_anomaly = mean_anomaly.copy()
+    for _ in range(KEPLER_ITERATIONS):
+        ecc_anomaly = ecc_anomaly - (ecc_anomaly - e * np.sin(ecc_anomaly) - mean_anomaly) / (1 - e * np.cos(ecc_anomaly))
+    sin_e, cos_e = np.sin(ecc_anomaly), np.cos(ecc_anomaly)
+    nu = np.arctan2(np.sqrt(1 - e ** 2) * sin_e, cos_e - e)
+    phi = nu + eph['omega']
+    sin2, cos2 = np.sin(2 * phi), np.cos(2 * phi)
+    u = phi + eph['cus'] * sin2 + eph['cuc'] * cos2
+    r = a * (1 - e * cos_e) + eph['crs'] * sin2 + eph['crc'] * cos2
+    inc = eph['i0'] + eph['idot'] * dt_toe + eph['cis'] * sin2 + eph['cic'] * cos2
+    x_orb, y_orb = r * np.cos(u), r * np.sin(u)
+    node = eph['omega0'] + (eph['omega_dot'] - GPS_OMEGA_E) * dt_toe - GPS_OMEGA_E * eph['toe']
+    xyz = np.column_stack([
+        x_orb * np.cos(node) - y_orb * np.cos(inc) * np.sin(node),
+        x_orb * np.sin(node) + y_orb * np.cos(inc) * np.cos(node),
+        y_orb * np.sin(inc),
+    ])
+    clock = (eph['af0'] + eph['af1'] * dt_toc + eph['af2'] * dt_toc ** 2
+             + RELATIVISTIC_F * e * eph['sqrt_a'] * sin_e - eph['tgd'])
+    return xyz, clock
+
+
+def _glonass_derivatives(state, accel):
+    r, v = state[:, :3], state[:, 3:]
+    rad = np.linalg.norm(r, axis=1)[:, np.newaxis]
+    z2 = (r[:, 2:3] / rad) ** 2
+    j2 = 1.5 * GLO_J2 * GLO_GM * GLO_AE ** 2 / rad ** 5
+    a = -GLO_GM / rad ** 3 * r - j2 * r * np.column_stack([1 - 5 * z2, 1 - 5 * z2, 3 - 5 * z2]) + accel
+    a[:, 0] += GLO_OMEGA_E ** 2 * r[:, 0] + 2 * GLO_OMEGA_E * v[:, 1]
+    a[:, 1] += GLO_OMEGA_E ** 2 * r[:, 1] - 2 * GLO_OMEGA_E * v[:, 0]
+    return np.hstack([v, a])
+
+
+def _rk4(state, accel, h):
+    k1 = _glonass_derivatives(state, accel)
+    k2 = _glonass_derivatives(state + h / 2 * k1, accel)
+    k3 = _glonass_derivatives(state + h / 2 * k2, accel)
+    k4 = _glonass_derivatives(state + h * k3, accel)
+    return state + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+def _glonass_positions(eph, index, dt):
+    """
+    Интегрирование RK4 от tb. Каждая использованная эфемерида интегрируется один раз
+    по узлам tb ± k·GLO_STEP, затем для каждой пары (спутник, эпоха) делается один шаг
+    (не длиннее GLO_STEP/2) от ближайшего узла. Возвращает ECEF (м) и часы (с).
+    """
+    used, inverse = np.unique(index, return_inverse=True)
+    records = eph[used]
+    state0 = np.column_stack([records['x'], records['y'], records['z'], records['vx'], records['vy'], records['vz']])
+    accel = np.column_stack([records['ax'], records['ay'], records['az']])
+
+    max_steps = int(np.ceil(np.abs(dt).max() / GLO_STEP)) if len(dt) else 0
+    nodes = np.empty((2 * max_steps + 1,) + state0.shape)
+    nodes[max_steps] = state0
+    for direction in (1, -1):
+        state = state0
+        for k in range(1, max_steps + 1):
+            state = _rk4(state, accel, direction * GLO_STEP)
+            nodes[max_steps + direction * k] = state
+
+    node = np.clip(np.rint(dt / GLO_STEP).astype(int), -max_steps, max_steps)
+    h = (dt - node * GLO_STEP)[:, np.newaxis]
+    state = _rk4(nodes[node + max_steps, inverse], accel[inverse], h)
+    clock = records['minus_tau_n'][inverse] + records['gamma_n'][inverse] * dt
+    return state[:, :3] * 1000.0, clock
+
+
+def positions_at(system, eph, prn, times, offset=None):
+    """
+    ECEF (м) и поправки часов (с) спутников одной системы для пар (prn, момент).
+    Момент — times (datetime64, GPST) плюс offset секунд (например, минус время
+    распространения сигнала). Где подходящей эфемериды нет — NaN.
+    """
+    times = np.asarray(times, dtype='datetime64[ms]')
+    if not len(eph) or not len(times):
+        return np.full((len(times), 3), np.nan), np.full(len(times), np.nan)
+    index, valid, dt = _select(system, eph, prn, times)
+    if offset is not None:
+        dt = dt + offset
+    dt = np.where(valid, dt, 0.0)  # пары без эфемериды не удлиняют интегрирование
+    if system == GPS:
+        selected = eph[index]
+        dt_toc = (times - selected['toc']) / np.timedelta64(1, 's') + (0.0 if offset is None else offset)
+        xyz, clock = _gps_positions(selected, dt, dt_toc)
+    else:
+        xyz, clock = _glonass_positions(eph, index, dt)
+    xyz[~valid] = np.nan
+    clock[~valid] = np.nan
+    return xyz, clock
+
+
+def satellite_positions(ephemerides, times):
+    """
+    ECEF спутников (м) и поправки их часов (с) на сетке times (datetime64, GPST).
+    ephemerides — {система: массив из load_ephemerides()}.
+    Возвращает (список 'G05', 'R12', ..., xyz (спутников, эпох, 3), clock (спутников, эпох));
+    там, где подходящей эфемериды нет, — NaN.
+    """
+    times = np.asarray(times, dtype='datetime64[ms]')
+    sats, xyz_parts, clock_parts = [], [], []
+    for system, eph in sorted(ephemerides.items()):
+        if not len(eph):
+            continue
+        prns = np.unique(eph['prn'])
+        xyz, clock = positions_at(system, eph, np.repeat(prns, len(times)), np.tile(times, len(prns)))
+        sats.extend(f'{system}{p:02d}' for p in prns)
+        xyz_parts.append(xyz.reshape(len(prns), len(times), 3))
+        clock_parts.append(clock.reshape(len(prns), len(times)))
+    if not sats:
+        return [], np.empty((0, len(times), 3)), np.empty((0, len(times)))
+    return sats, np.concatenate(xyz_parts), np.concatenate(clock_parts)
+
+
+def look_angles(receiver_xyz, sat_xyz, lat, lon):
+    """Азимут и угол места (градусы) спутников из точки receiver_xyz (lat/lon в градусах)."""
+    rotation = enu_rotation(np.radians(lat), np.radians(lon))
+    enu = (sat_xyz - receiver_xyz) @ rotation.T
+    horizontal = np.hypot(enu[..., 0], enu[..., 1])
+    azimuth = np.degrees(np.arctan2(enu[..., 0], enu[..., 1])) % 360
+    elevation = np.degrees(np.arctan2(enu[..., 2], horizontal))
+    return azimuth, elevation
+
+
+def dilution_of_precision(azimuth, elevation, systems, mask=10.0):
+    """
+    GDOP/PDOP/HDOP/VDOP/TDOP по эпохам для спутников выше маски.
+    azimuth, elevation — (спутников, эпох) в градусах; systems — буква системы каждого спутника:
+    для каждой системы своя поправка часов приемника. Где спутников меньше неизвестных — NaN.
+    """
+    az, el = np.radians(azimuth), np.radians(elevation)
+    visible = np.nan_to_num(elevation, nan=-90.0) >= mask
+    system_list = sorted(set(systems))
+    n_unknowns = 3 + len(system_list)
+
+    design = np.zeros(az.shape + (n_unknowns,))
+    design[..., 0] = -np.cos(el) * np.sin(az)
+    design[..., 1] = -np.cos(el) * np.cos(az)
+    design[..., 2] = -np.sin(el)
+    for i, system in enumerate(system_list):
+        design[np.array(systems) == system, :, 3 + i] = 1.0
+    design[~visible] = 0.0
+    design = np.nan_to_num(design)
+
+    normal = np.einsum('set,seu->etu', design, design)
+    # Системы без видимых спутников в эпоху не участвуют: фиктивная единица на диагонали
+    unused = np.diagonal(normal, axis1=1, axis2=2)[:, 3:] == 0
+    for i in range(len(system_list)):
+        normal[unused[:, i], 3 + i, 3 + i] = 1.0
+    count = visible.sum(axis=0)
+    solvable = (count >= 3 + (~unused).sum(axis=1)) & (np.linalg.matrix_rank(normal) == n_unknowns)
+
+    q = np.full(normal.shape, np.nan)
+    if solvable.any():
+        q[solvable] = np.linalg.inv(normal[solvable])
+    diag = np.diagonal(q, axis1=1, axis2=2).copy()
+    diag[:, 3:][unused] = 0.0
+    return {
+        'satellites': count,
+        'gdop': np.sqrt(diag.sum(axis=1)),
+        'pdop': np.sqrt(diag[:, :3].sum(axis=1)),
+        'hdop': np.sqrt(diag[:, :2].sum(axis=1)),
+        'vdop': np.sqrt(diag[:, 2]),
+        'tdop': np.sqrt(diag[:, 3:].sum(axis=1)),
+    }
+
+
+def _series(values, digits):
+    return [None if not np.isfinite(v) else round(float(v), digits) for v in values]
+
+
+def sky_view(receiver_xyz, start, end, interval=DEFAULT_INTERVAL, mask=DEFAULT_ELEVATION_MASK, systems=None):
+    """
+    Видимость спутников и DOP из точки receiver_xyz (ECEF, м) на интервале [start, end]
+    (datetime, GPST) с шагом interval секунд по эфемеридам из NavigationDay.
+    """
+    if interval <= 0 or end <= start:
+        raise ValueError("Интервал должен быть положительным, а конец — позже начала.")
+    n_epochs = int((end - start).total_seconds() // interval) + 1
+    if n_epochs > MAX_GRID_EPOCHS:
+        raise ValueError(f"Слишком много эпох ({n_epochs}), допускается не больше {MAX_GRID_EPOCHS}.")
+
+    ephemerides = {
+        system: load_ephemerides(system, start, end)
+        for system in (systems or EPHEMERIS_DTYPES)
+        if system in EPHEMERIS_DTYPES
+    }
+    if not any(len(eph) for eph in ephemerides.values()):
+        raise LookupError("Нет эфемерид за этот интервал.")
+
+    naive_start = start.replace(tzinfo=None) - (start.utcoffset() or timedelta(0))
+    times = np.datetime64(naive_start, 'ms') + np.arange(n_epochs) * np.timedelta64(int(interval * 1000), 'ms')
+    sats, sat_xyz, _ = satellite_positions(ephemerides, times)
+    receiver_xyz = np.asarray(receiver_xyz, dtype=float)
+    lat, lon, _ = ecef_to_geodetic(receiver_xyz[np.newaxis, :])
+    azimuth, elevation = look_angles(receiver_xyz, sat_xyz, np.degrees(lat[0]), np.degrees(lon[0]))
+    dop = dilution_of_precision(azimuth, elevation, [sat[0] for sat in sats], mask)
+
+    above = np.nan_to_num(elevation, nan=-90.0) > 0
+    azimuth = np.where(above, azimuth, np.nan)
+    elevation = np.where(above, elevation, np.nan)
+    return {
+        'start': str(times[0].astype('datetime64[s]')),
+        'end': str(times[-1].astype('datetime64[s]')),
+        'interval': interval,
+        'elevation_mask': mask,
+        'receiver': dict(zip('xyz', receiver_xyz.round(3).tolist())),
+        'times': [str(t) for t in times.astype('datetime64[s]')],
+        'satellites': [
+            {'sat': sat, 'azimuth': _series(azimuth[i], 1), 'elevation': _series(elevation[i], 1)}
+            for i, sat in enumerate(sats) if above[i].any()
+        ],
+        'dop': {
+            'satellites': dop['satellites'].tolist(),
+            **{key: _series(dop[key], 2) for key in ('gdop', 'pdop', 'hdop', 'vdop', 'tdop')},
+        },
+    }
+
@@ -8,12 +8,19 @@ import requests
 import urllib3
 from pyproj import Transformer
 
+from django.conf import settings
 from django.contrib.gis.geos import Point as DjangoPoint
 from django.contrib.gis.measure import D
 from django.contrib.gis.db.models.functions import Transform
 from django.db import transaction
 
-from .models import GeodeticPoint, Observation
+from .ephemeris import store_ephemerides
+from .models import GeodeticPoint, Observation, PointAlias
+from .rinex_io import open_rinex_input
+from .rinex_header import scan_rinex_header
+from .rinex_nav import parse_navigation
+from .spp import check_approx_position
+from .statistics import refresh_point_statistics
 
 # Отключаем предупреждения SSL
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -35,7 +42,8 @@ def _fetch_fppd_metadata(lat, lon):
     """Поиск ближайшего пункта на портале fppd."""
     delta = 0.0005
     polygon = [[lon - delta, lat - delta], [lon + delta, lat - delta], [lon + delta, lat + delta], [lon - delta, lat + delta], [lon - delta, lat - delta]]
-    url = "https://mdss.fppd.cgkipd.ru/api/v1/GGSStation/Search"
+    # Адрес из настроек: в бенчмарках подменяется локальной заглушкой
+    url = settings.GEOCLIENT_FPPD_SEARCH_URL
     headers = {
         "Content-Type": "application/json", "Accept": "application/json, text/plain, */*",
         "Origin": "https://portal.fppd.cgkipd.ru", "Referer": "https://portal.fppd.cgkipd.ru/",
@@ -119,28 +127,36 @@ def parse_rinex_obs_file(file_path_or_obj, uploaded_file_instance):
             return datetime(int(parts[0]), int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4]), int(sec), int((sec-int(sec))*1000000))
         except: return None
 
-    should_close = False
-    f = None
-    
     try:
-        # Открываем файл как поток, чтобы не грузить в RAM
+        # 1. Парсим заголовок. Файл на диске читается через mmap до END OF HEADER;
+        # поток открывается как есть, сжатие (.gz/.Z/.zst) и Hatanaka распаковываются на лету.
         if isinstance(file_path_or_obj, str):
-            f = open(file_path_or_obj, 'rb')
-            should_close = True
+            header = scan_rinex_header(file_path_or_obj)
         else:
-            f = file_path_or_obj
-            f.seek(0)
-
-        # 1. Парсим заголовок
-        header = manual_parse_rinex_header(f)
+            file_path_or_obj.seek(0)
+            header = manual_parse_rinex_header(open_rinex_input(file_path_or_obj))
         
         raw_id = header.get('marker_name', '').strip().upper()
         if not raw_id: return 0, ["Критическая ошибка: MARKER NAME не найден."]
-        if not header.get('approx_pos_xyz'): return 0, ["Критическая ошибка: Нет координат."]
+
+        # Координаты заголовка сверяются с кодовым решением (SPP) по эфемеридам комплекта
+        solution, deviation, replace = check_approx_position(uploaded_file_instance, header.get('approx_pos_xyz'))
+        if solution and replace:
+            spp_xyz = ', '.join(f"{v:.1f}" for v in solution['xyz'])
+            reason = (f"отличается от решения SPP на {deviation:.1f} м" if deviation is not None
+                      else "отсутствует в заголовке")
+            note = f"APPROX POSITION XYZ {reason}; использованы координаты SPP ({spp_xyz}), эпох {solution['epochs']}."
+            header['approx_pos_xyz'] = solution['xyz']
+            messages.append(note)
+            if note not in (uploaded_file_instance.remarks or ''):
+                uploaded_file_instance.remarks = '\n'.join(filter(None, [uploaded_file_instance.remarks, note]))
+                uploaded_file_instance.save(update_fields=['remarks'])
+        if not header.get('approx_pos_xyz') or not any(header['approx_pos_xyz']):
+            return 0, ["Критическая ошибка: Нет координат."]
 
         # 2. Координаты и Время
         x, y, z = header['approx_pos_xyz']
-        lon, lat, _ = transformer_ecef_to_wgs84.transform(x, y, z)
+        lon, lat, ellipsoidal_height = transformer_ecef_to_wgs84.transform(x, y, z)
         
         # Округляем
         quantizer = Decimal('1e-{}'.format(COORDINATE_PRECISION))
@@ -183,19 +199,23 @@ def parse_rinex_obs_file(file_path_or_obj, uploaded_file_instance):
                     dup_ids = list(duplicates.values_list('id', flat=True))
                     # Перевешиваем наблюдения на main_point
                     Observation.objects.filter(point__in=duplicates).update(point=main_point)
+                    # ID влитых пунктов и их алиасы становятся алиасами main_point
+                    merged_aliases = [PointAlias(point=main_point, alias=dup_id, source='merge') for dup_id in dup_ids]
+                    merged_aliases += [
+                        PointAlias(point=main_point, alias=alias, source=source)
+                        for alias, source in PointAlias.objects.filter(point__in=duplicates).values_list('alias', 'source')
+                    ]
+                    PointAlias.objects.bulk_create(merged_aliases, ignore_conflicts=True)
                     # Удаляем лишние пункты
                     duplicates.delete()
                     messages.append(f"Объединение: Пункты {dup_ids} влиты в '{main_point.id}' из-за близости координат.")
                 
                 point_obj = main_point
                 
-                # Если у основного пункта имя отличается от файла (SANG vs TATA), 
-                # добавляем примечание, но не меняем ID
+                # Если у основного пункта имя отличается от файла (SANG vs TATA),
+                # запоминаем имя из файла как алиас, но не меняем ID
                 if point_obj.id != raw_id:
-                    if not point_obj.description: point_obj.description = ""
-                    if raw_id not in point_obj.description:
-                         point_obj.description += f"\n[Алиас из файла: {raw_id}]"
-                    point_obj.save(update_fields=['description'])
+                    PointAlias.objects.bulk_create([PointAlias(point=point_obj, alias=raw_id, source='rinex')], ignore_conflicts=True)
                     messages.append(f"Найден близкий пункт '{point_obj.id}'. Файл '{raw_id}' привязан к нему.")
                 else:
                     messages.append(f"Найден существующий пункт: {point_obj.id}")
@@ -226,6 +246,8 @@ def parse_rinex_obs_file(file_path_or_obj, uploaded_file_instance):
                     point=point_obj, location=new_location, timestamp=t_start,
                     source_file=uploaded_file_instance,
                     duration=duration,
+                    raw_x=x, raw_y=y, raw_z=z,
+                    ellipsoidal_height=ellipsoidal_height,
                     receiver_number=header.get('receiver_number'),
                     antenna_height=header.get('antenna_height_h')
                 )
@@ -237,18 +259,24 @@ def parse_rinex_obs_file(file_path_or_obj, uploaded_file_instance):
                     point_obj.location = latest.location
                     point_obj.save(update_fields=['location'])
 
+            # Сводка пересчитывается и после объединения (наблюдения перевешены), и для нового наблюдения
+            refresh_point_statistics([point_obj.pk])
+
     except Exception as e:
         messages.append(f"Ошибка обработки: {e}")
         traceback.print_exc()
-    finally:
-        if should_close and f: f.close()
 
     return created_points_count, messages
 
 def parse_rinex_nav_file(text_stream, file_type, uploaded_file_instance):
     """
-    Заглушка для обработки навигационных файлов.
-    Нужна для совместимости, если views.py пытается её вызвать.
+    Разбирает навигационный файл (GPS .n, ГЛОНАСС .g, смешанный N v3) из бинарного потока
+    и пополняет суточные наборы эфемерид (geoclient/ephemeris.py). Пунктов не создает.
     """
-    msg = f"Файл навигации '{file_type.upper()}' сохранен, но не создает точек."
-    return 0, [msg]
\ No newline at end of file
+    try:
+        by_system = parse_navigation(text_stream)
+        added = store_ephemerides(by_system)
+    except Exception as e:
+        return 0, [f"Ошибка разбора файла навигации '{file_type.upper()}': {e}"]
+    counts = ', '.join(f"{system}: {len(array)}" for system, array in sorted(by_system.items()))
+    return 0, [f"Файл навигации '{file_type.upper()}': эфемерид {counts or 0}, новых {added}."]
@@ -0,0 +1,61 @@
+# geoclient/partitions.py
+"""
+Секционирование таблицы наблюдений по времени (PostgreSQL, PARTITION BY RANGE (timestamp)).
+
+Секции годовые (или месячные) с именами geoclient_observation_y2024 / _m2024_05,
+плюс секция DEFAULT для всего, что не попало в диапазоны. Новые диапазоны
+добавляются миграциями через create_observation_partitions(): строки, уже
+попавшие в DEFAULT, переносятся в новую секцию.
+"""
+
+from datetime import datetime, timezone
+
+OBSERVATION_TABLE = 'geoclient_observation'
+DEFAULT_PARTITION = f'{OBSERVATION_TABLE}_default'
+GRANULARITY_YEAR = 'year'
+GRANULARITY_MONTH = 'month'
+
+
+def partition_ranges(start_year, end_year, granularity=GRANULARITY_YEAR):
+    """(имя секции, начало, конец) для лет start_year..end_year включительно."""
+    for year in range(start_year, end_year + 1):
+        if granularity == GRANULARITY_YEAR:
+            yield (f'{OBSERVATION_TABLE}_y{year}',
+                   datetime(year, 1, 1, tzinfo=timezone.utc), datetime(year + 1, 1, 1, tzinfo=timezone.utc))
+            continue
+        for month in range(1, 13):
+            end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+            yield f'{OBSERVATION_TABLE}_m{year}_{month:02d}', datetime(year, month, 1, tzinfo=timezone.utc), end
+
+
+def existing_partitions(cursor, table=OBSERVATION_TABLE):
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s", [table]
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def create_observation_partitions(connection, start_year, end_year, granularity=GRANULARITY_YEAR):
+    """Создает недостающие секции; подходящие строки из DEFAULT переносятся в них. Возвращает имена созданных."""
+    qn = connection.ops.quote_name
+    created = []
+    with connection.cursor() as cursor:
+        existing = existing_partitions(cursor)
+        for name, start, end in partition_ranges(start_year, end_year, granularity):
+            if name in existing:
+                continue
+            cursor.execute(f'CREATE TABLE {qn(name)} (LIKE {qn(OBSERVATION_TABLE)})')
+            if DEFAULT_PARTITION in existing:
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} '
+                    f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                    f'INSERT INTO {qn(name)} SELECT * FROM moved', [start, end]
+                )
+            cursor.execute(
+                f'ALTER TABLE {qn(OBSERVATION_TABLE)} ATTACH PARTITION {qn(name)} '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            created.append(name)
+    return created
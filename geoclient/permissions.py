@@ -1,16 +1,18 @@
 # geoclient/permissions.py
 from rest_framework import permissions
 
+from .roles import get_user_roles, ROLE_UPLOADER, ROLE_VIEWER
+
 class IsUploader(permissions.BasePermission):
     """
-    Разрешает доступ только пользователям из группы 'Uploader'.python manage.py migrate
+    Разрешает доступ только пользователям из группы 'Uploader'.
     Это право дает возможность изменять и удалять данные.
     """
     message = "У вас нет прав для выполнения этого действия (требуется роль 'Uploader')."
     
     def has_permission(self, request, view):
-        # Проверяем, что пользователь аутентифицирован и состоит в группе 'Uploader'
-        return request.user and request.user.is_authenticated and request.user.groups.filter(name='Uploader').exists()
+        # Роли берутся из кэша (geoclient/roles.py), без запроса к БД на каждый вызов
+        return bool(request.user and request.user.is_authenticated and ROLE_UPLOADER in get_user_roles(request.user))
 
 class CanDownloadOrView(permissions.BasePermission):
     """
@@ -21,4 +23,4 @@ class CanDownloadOrView(permissions.BasePermission):
 
     def has_permission(self, request, view):
         # Проверяем, что пользователь аутентифицирован и состоит хотя бы в одной из нужных групп
-        return request.user and request.user.is_authenticated and request.user.groups.filter(name__in=['Uploader', 'Viewer']).exists()
\ No newline at end of file
+        return bool(request.user and request.user.is_authenticated and get_user_roles(request.user) & {ROLE_UPLOADER, ROLE_VIEWER})
\ No newline at end of file
@@ -0,0 +1,175 @@
+# geoclient/qc.py
+"""
+Контроль качества RINEX-наблюдений в духе teqc: эпохи, фактический интервал, пропуски,
+спутники по системам, средний SNR по диапазонам и признаки срывов фазы.
+Все метрики считаются по массивам ObservationData целиком.
+"""
+
+import logging
+
+import numpy as np
+
+from .models import UploadedRinexFile
+from .rinex_io import open_rinex_input
+from .rinex_obs import read_observations
+from .storage import open_rinex
+
+logger = logging.getLogger(__name__)
+
+SPEED_OF_LIGHT = 299792458.0
+
+# Несущие частоты (система, диапазон) -> Гц. ГЛОНАСС (FDMA) не указан: частота зависит
+# от литеры, поэтому для него срывы определяются только по LLI.
+FREQUENCIES = {
+    ('G', '1'): 1575.42e6, ('G', '2'): 1227.60e6, ('G', '5'): 1176.45e6,
+    ('J', '1'): 1575.42e6, ('J', '2'): 1227.60e6, ('J', '5'): 1176.45e6,
+    ('E', '1'): 1575.42e6, ('E', '5'): 1176.45e6, ('E', '7'): 1207.14e6, ('E', '8'): 1191.795e6, ('E', '6'): 1278.75e6,
+    ('C', '2'): 1561.098e6, ('C', '7'): 1207.14e6, ('C', '6'): 1268.52e6,
+}
+# Пары диапазонов для геометрически-свободной комбинации, по убыванию предпочтения
+GF_BAND_PAIRS = {
+    'G': (('1', '2'), ('1', '5')),
+    'J': (('1', '2'), ('1', '5')),
+    'E': (('1', '5'), ('1', '7'), ('1', '8')),
+    'C': (('2', '7'), ('2', '6')),
+}
+
+# Шаг больше GAP_FACTOR интервалов считается пропуском (и разрывом дуги спутника)
+GAP_FACTOR = 1.5
+# Порог скачка геометрически-свободной комбинации: 400 см/мин, как у teqc, но не меньше 5 см
+IONO_SLIP_RATE = 4.0 / 60
+IONO_SLIP_MIN = 0.05
+MAX_LISTED_GAPS = 20
+
+# Для QC нужны только фаза (срывы) и SNR
+QC_OBS_PREFIXES = 'LS'
+
+
+def _round(value, digits=2):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def _best_phase_columns(data, rows, system):
+    """Для каждого диапазона системы — столбец фазы с наибольшим числом наблюдений."""
+    best = {}
+    for col, code in enumerate(data.types):
+        if code[0] != 'L' or (system, code[1]) not in FREQUENCIES:
+            continue
+        count = np.count_nonzero(~np.isnan(data.values[rows, col]))
+        if count and count > best.get(code[1], (None, 0))[1]:
+            best[code[1]] = (col, count)
+    return {band: col for band, (col, _) in best.items()}
+
+
+def _gf_slips(data, rows, system, seconds, interval):
+    """Число скачков геометрически-свободной комбинации по дугам спутников системы."""
+    bands = _best_phase_columns(data, rows, system)
+    pair = next((p for p in GF_BAND_PAIRS.get(system, ()) if p[0] in bands and p[1] in bands), None)
+    if pair is None or not interval:
+        return None
+    wl_a = SPEED_OF_LIGHT / FREQUENCIES[(system, pair[0])]
+    wl_b = SPEED_OF_LIGHT / FREQUENCIES[(system, pair[1])]
+    gf = data.values[rows, bands[pair[0]]] * wl_a - data.values[rows, bands[pair[1]]] * wl_b
+    valid = ~np.isnan(gf)
+    gf, prn, t = gf[valid], data.prn[rows][valid], seconds[data.epoch[rows][valid]]
+
+    order = np.lexsort((t, prn))
+    gf, prn, t = gf[order], prn[order], t[order]
+    dt = np.diff(t)
+    same_arc = (prn[1:] == prn[:-1]) & (dt <= GAP_FACTOR * interval)
+    threshold = np.maximum(IONO_SLIP_MIN, IONO_SLIP_RATE * dt)
+    return int(np.count_nonzero(same_arc & (np.abs(np.diff(gf)) > threshold)))
+
+
+def compute_qc(data):
+    """Сводка QC по ObservationData (словарь, пригодный для JSONField)."""
+    n_epochs = len(data.times)
+    summary = {
+        'rinex_version': data.header['version'],
+        'epochs': n_epochs,
+        'first_epoch': None, 'last_epoch': None,
+        'interval_header': data.header['interval'],
+        'interval': None,
+        'expected_epochs': None, 'completeness': None,
+        'gaps': 0, 'gap_seconds': 0.0, 'gap_list': [],
+        'systems': {}, 'snr': {}, 'cycle_slips': {},
+        'phase_observations': 0, 'slips_total': 0, 'obs_per_slip': None,
+    }
+    if not n_epochs:
+        return summary
+
+    seconds = (data.times - data.times[0]) / np.timedelta64(1, 's')
+    steps = np.diff(seconds)
+    interval = float(np.median(steps[steps > 0])) if (steps > 0).any() else data.header['interval']
+    summary['first_epoch'] = str(data.times[0].astype('datetime64[s]'))
+    summary['last_epoch'] = str(data.times[-1].astype('datetime64[s]'))
+    summary['interval'] = _round(interval, 3)
+    if interval:
+        gap_idx = np.flatnonzero(steps > GAP_FACTOR * interval)
+        summary['gaps'] = int(gap_idx.size)
+        summary['gap_seconds'] = _round((steps[gap_idx] - interval).sum(), 1)
+        summary['gap_list'] = [
+            {'start': str(data.times[i].astype('datetime64[s]')), 'end': str(data.times[i + 1].astype('datetime64[s]'))}
+            for i in gap_idx[:MAX_LISTED_GAPS]
+        ]
+        summary['expected_epochs'] = int(round(seconds[-1] / interval)) + 1
+        summary['completeness'] = _round(n_epochs / summary['expected_epochs'] * 100, 1)
+
+    phase_cols = [col for col, code in enumerate(data.types) if code[0] == 'L']
+    snr_cols = [(col, code[1]) for col, code in enumerate(data.types) if code[0] == 'S']
+    has_phase = ~np.isnan(data.values[:, phase_cols]).all(axis=1) if phase_cols else np.zeros(len(data.prn), bool)
+    lli_slip = ((data.lli[:, phase_cols] & 1).any(axis=1) & has_phase) if phase_cols else has_phase
+
+    for code in np.unique(data.system):
+        system = chr(code)
+        rows = np.flatnonzero(data.system == code)
+        summary['systems'][system] = {
+            'satellites': int(np.unique(data.prn[rows]).size),
+            'mean_per_epoch': _round(rows.size / n_epochs),
+            'records': int(rows.size),
+        }
+
+        bands = {}
+        for col, band in snr_cols:
+            values = data.values[rows, col]
+            values = values[values > 0]
+            if values.size:
+                total, count = bands.get(band, (0.0, 0))
+                bands[band] = (total + values.sum(), count + values.size)
+        if bands:
+            summary['snr'][system] = {f'S{band}': _round(total / count) for band, (total, count) in sorted(bands.items())}
+
+        phase_records = int(np.count_nonzero(has_phase[rows]))
+        if phase_records:
+            gf = _gf_slips(data, rows, system, seconds, interval)
+            lli = int(np.count_nonzero(lli_slip[rows]))
+            summary['cycle_slips'][system] = {'lli': lli, 'gf': gf}
+            summary['phase_observations'] += phase_records
+            summary['slips_total'] += max(lli, gf or 0)
+
+    if summary['slips_total']:
+        summary['obs_per_slip'] = int(summary['phase_observations'] // summary['slips_total'])
+    return summary
+
+
+def format_qc(summary):
+    """Короткая строка для сообщений загрузки."""
+    systems = ', '.join(f"{s}:{info['satellites']}" for s, info in sorted(summary['systems'].items()))
+    return (f"QC: эпох {summary['epochs']}, интервал {summary['interval']} с, "
+            f"пропусков {summary['gaps']}, срывов {summary['slips_total']}, спутники {systems or '—'}")
+
+
+def qc_uploaded_file(rinex_file):
+    """
+    Считает QC-сводку O-файла и сохраняет ее в qc_summary.
+    Возвращает сводку или None, если файл не удалось разобрать.
+    """
+    try:
+        with open_rinex_input(open_rinex(rinex_file)) as stream:
+            summary = compute_qc(read_observations(stream, types=lambda code: code[0] in QC_OBS_PREFIXES))
+    except Exception as e:
+        logger.warning("QC файла %s не выполнен: %s", rinex_file.pk, e)
+        return None
+    UploadedRinexFile.objects.filter(pk=rinex_file.pk).update(qc_summary=summary)
+    rinex_file.qc_summary = summary
+    return summary
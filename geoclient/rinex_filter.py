@@ -0,0 +1,224 @@
+# geoclient/rinex_filter.py
+"""
+Потоковая выборка из RINEX-файла наблюдений (2.xx и 3.xx): прореживание эпох
+до заданного интервала и вырезка окна по времени.
+
+Тело файла проходит эпоха за эпохой, строки отобранных эпох копируются как есть,
+поэтому память не зависит от размера файла, а вывод начинается сразу после заголовка.
+В заголовке переписываются INTERVAL, TIME OF FIRST OBS и TIME OF LAST OBS.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from .models import split_rinex_name
+from .rinex_io import open_rinex_input
+from .storage import open_rinex
+
+OUTPUT_CHUNK_SIZE = 256 * 1024
+V2_SATS_PER_LINE = 12
+V2_FIELDS_PER_LINE = 5
+# Флаги 2–5 — события (строки заголовка, новая стоянка и т. п.): передаются, если окно уже открыто
+EVENT_FLAGS = (b'2', b'3', b'4', b'5')
+HEADER_LABEL = slice(60, 80)
+
+
+def header_label(line):
+    return line[HEADER_LABEL].strip()
+
+
+def format_header_line(content, label):
+    return (content.ljust(60) + label).rstrip().encode('ascii') + b'\n'
+
+
+def format_time_line(moment, time_system, label):
+    seconds = moment.second + moment.microsecond / 1e6
+    content = (f"{moment.year:6d}{moment.month:6d}{moment.day:6d}{moment.hour:6d}{moment.minute:6d}"
+               f"{seconds:13.7f}     {time_system:>3}")
+    return format_header_line(content, label)
+
+
+def _parse_epoch_time(text):
+    """'yy mm dd hh mm ss.sssssss' (или с 4-значным годом) -> naive datetime; None для пустого времени."""
+    parts = text.split()
+    if len(parts) < 6:
+        return None
+    year = int(parts[0])
+    if year < 100:
+        year += 2000 if year < 80 else 1900
+    sec = float(parts[5])
+    return datetime(year, int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4])) + timedelta(
+        milliseconds=round(sec * 1000)
+    )
+
+
+def _header_time(line):
+    try:
+        return _parse_epoch_time(line[:43].decode('ascii'))
+    except ValueError:
+        return None
+
+
+def read_header_lines(lines):
+    """Строки заголовка (с END OF HEADER), версия и число типов наблюдений RINEX 2."""
+    header, version, v2_types = [], None, 0
+    for line in lines:
+        header.append(line)
+        label = header_label(line)
+        if label == b'RINEX VERSION / TYPE':
+            version = float(line[:9])
+        elif label == b'# / TYPES OF OBSERV' and line[:6].strip():
+            v2_types = int(line[:6])
+        elif label == b'END OF HEADER':
+            break
+    if version is None:
+        raise ValueError("Не найдена строка RINEX VERSION / TYPE.")
+    return header, version, v2_types
+
+
+def epoch_records(lines, version, v2_types):
+    """(момент или None, флаг, строки записи эпохи как есть) для RINEX 2 и 3."""
+    v3 = version >= 3
+    lines_per_sat = -(-v2_types // V2_FIELDS_PER_LINE) if v2_types else 1
+    for line in lines:
+        if v3:
+            if line[:1] != b'>':
+                continue
+            flag, count, time_text = line[31:32], int(line[32:35] or 0), line[2:29]
+            extra = count
+        else:
+            if len(line.rstrip(b'\r\n')) < 32:
+                continue
+            flag, count, time_text = line[28:29], int(line[29:32] or 0), line[1:26]
+            if flag in EVENT_FLAGS:
+                extra = count
+            else:
+                extra = (count - 1) // V2_SATS_PER_LINE + count * lines_per_sat if count else 0
+        record = [line]
+        record.extend(islice(lines, extra))
+        yield _parse_epoch_time(time_text.decode('ascii', errors='ignore')), flag, record
+
+
+def _on_grid(moment, interval_ms):
+    since_midnight = ((moment.hour * 60 + moment.minute) * 60 + moment.second) * 1000 + moment.microsecond // 1000
+    return since_midnight % interval_ms == 0
+
+
+def _last_on_grid(moment, interval_ms):
+    """Последний момент сетки интервала, не позднее moment."""
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    since_midnight = (moment - midnight) // timedelta(milliseconds=1)
+    return midnight + timedelta(milliseconds=since_midnight - since_midnight % interval_ms)
+
+
+def _naive(value):
+    """Aware datetime -> naive UTC; время эпох RINEX сравнивается без учета шкалы."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value is not None and value.tzinfo is not None else value
+
+
+def iter_filtered_observations(stream, interval=None, start=None, end=None):
+    """
+    Бинарный поток O-файла (например, open_rinex_input) -> блоки байтов нового файла.
+    interval — секунды: остаются эпохи, кратные интервалу от начала суток (как в teqc);
+    start/end — границы окна включительно. Заголовок выдается, как только найдена
+    первая подходящая эпоха; TIME OF LAST OBS — последняя точка сетки в пределах
+    окна и исходного файла (заранее, без второго прохода).
+    """
+    lines = iter(stream)
+    header, version, v2_types = read_header_lines(lines)
+    start, end = _naive(start), _naive(end)
+    interval_ms = round(interval * 1000) if interval else None
+
+    def selected(moment):
+        if moment is None:
+            return False
+        if start and moment < start:
+            return False
+        if end and moment > end:
+            return False
+        return interval_ms is None or _on_grid(moment, interval_ms)
+
+    epochs = epoch_records(lines, version, v2_types)
+    first_record, first_moment = None, None
+    for moment, flag, record in epochs:
+        if flag not in EVENT_FLAGS and selected(moment):
+            first_record, first_moment = record, moment
+            break
+        if end and moment and moment > end:
+            break
+
+    yield b''.join(_rewrite_header(header, interval, first_moment, end, interval_ms))
+    if first_record is None:
+        return
+
+    out, size = list(first_record), sum(map(len, first_record))
+    for moment, flag, record in epochs:
+        if flag not in EVENT_FLAGS and end and moment and moment > end:
+            break
+        if flag in EVENT_FLAGS or selected(moment):
+            out.extend(record)
+            size += sum(map(len, record))
+            if size >= OUTPUT_CHUNK_SIZE:
+                yield b''.join(out)
+                out, size = [], 0
+    if out:
+        yield b''.join(out)
+
+
+def iter_filtered_rinex(rinex_file, interval=None, start=None, end=None):
+    """Выборка из хранимого O-файла; файл закрывается по окончании (или при закрытии генератора)."""
+    with open_rinex_input(open_rinex(rinex_file)) as stream:
+        yield from iter_filtered_observations(stream, interval, start, end)
+
+
+def _rewrite_header(header, interval, first_moment, end, interval_ms):
+    last_moment = None
+    time_system = 'GPS'
+    for line in header:
+        label = header_label(line)
+        if label == b'TIME OF FIRST OBS':
+            time_system = line[48:51].decode('ascii', errors='ignore').strip() or time_system
+        elif label == b'TIME OF LAST OBS':
+            last_moment = _header_time(line)
+        elif label == b'INTERVAL' and not interval_ms:
+            # Без прореживания конец окна выравнивается по исходному интервалу
+            try:
+                interval_ms = round(float(line[:10]) * 1000) or None
+            except ValueError:
+                pass
+    if last_moment and end:
+        last_moment = min(last_moment, end)
+    if last_moment and interval_ms:
+        last_moment = _last_on_grid(last_moment, interval_ms)
+
+    has_interval = False
+    for line in header:
+        label = header_label(line)
+        if label == b'INTERVAL' and interval:
+            has_interval = True
+            yield format_header_line(f"{interval:10.3f}", 'INTERVAL')
+        elif label == b'TIME OF FIRST OBS' and first_moment:
+            yield format_time_line(first_moment, time_system, 'TIME OF FIRST OBS')
+        elif label == b'TIME OF LAST OBS' and first_moment:
+            if last_moment and last_moment >= first_moment:
+                yield format_time_line(last_moment, time_system, 'TIME OF LAST OBS')
+        elif label == b'END OF HEADER':
+            if interval and not has_interval:
+                yield format_header_line(f"{interval:10.3f}", 'INTERVAL')
+            yield line
+        else:
+            yield line
+
+
+def filtered_name(name):
+    """Имя файла выборки: всегда несжатый RINEX (Hatanaka .d/.crx -> .o/.rnx)."""
+    parts = split_rinex_name(name)
+    if not parts:
+        return name
+    base, ext, _ = parts
+    if ext.startswith('.') and ext[-1] == 'd':
+        ext = ext[:-1] + 'o'
+    elif ext.endswith('.crx'):
+        ext = ext[:-4] + '.rnx'
+    return os.path.basename(base + ext)
@@ -0,0 +1,98 @@
+# geoclient/rinex_header.py
+"""
+Быстрое чтение заголовка RINEX для массовой переиндексации архива.
+
+Несжатый файл отображается в память (mmap), конец заголовка ищется поиском байтов,
+метки сравниваются как байты (колонки 61–80), в строку декодируются только значения
+найденных полей. Результат — тот же словарь, что у parsers.manual_parse_rinex_header.
+Сжатые файлы (.gz/.zst/.Z) читаются потоково до END OF HEADER.
+"""
+
+import mmap
+
+from .rinex_io import GZIP_MAGIC, LZW_MAGIC, open_rinex_input
+from .storage import compression_of, open_stored
+
+END_OF_HEADER = b'END OF HEADER'
+LABEL_START_COL = 60
+# Как у manual_parse_rinex_header: без END OF HEADER читаются первые 501 строка
+MAX_HEADER_LINES = 501
+MAX_HEADER_BYTES = 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def _text(content):
+    return content.decode('ascii', errors='ignore')
+
+
+def _receiver_number(content):
+    parts = content.split()
+    return _text(parts[0]) if parts else None
+
+
+# Метка -> (ключ словаря, преобразование содержимого колонок 1–60 без пробелов по краям)
+_FIELDS = {
+    b'MARKER NAME': ('marker_name', _text),
+    b'REC # / TYPE / VERS': ('receiver_number', _receiver_number),
+    b'ANTENNA: DELTA H/E/N': ('antenna_height_h', lambda content: float(content.split()[0])),
+    b'APPROX POSITION XYZ': ('approx_pos_xyz', lambda content: [float(x) for x in content.split()[:3]]),
+    b'TIME OF FIRST OBS': ('time_first_obs_str', _text),
+    b'TIME OF LAST OBS': ('time_last_obs_str', _text),
+}
+
+
+def empty_header():
+    return {
+        'marker_name': None, 'approx_pos_xyz': None, 'time_first_obs_str': None,
+        'time_last_obs_str': None, 'receiver_number': None, 'antenna_height_h': None, 'rinextype': None,
+    }
+
+
+def _header_end(data, limit):
+    """Позиция строки END OF HEADER (метка с колонки 61) или -1."""
+    pos = data.find(END_OF_HEADER, 0, limit)
+    while pos >= 0:
+        if pos - (data.rfind(b'\n', 0, pos) + 1) == LABEL_START_COL:
+            return pos
+        pos = data.find(END_OF_HEADER, pos + 1, limit)
+    return -1
+
+
+def parse_header_bytes(data):
+    """Заголовок из байтов начала файла (bytes или mmap)."""
+    header = empty_header()
+    end = _header_end(data, MAX_HEADER_BYTES)
+    region = data[:end if end >= 0 else MAX_HEADER_BYTES]
+    for line in region.split(b'\n', MAX_HEADER_LINES)[:MAX_HEADER_LINES]:
+        label = line[LABEL_START_COL:].strip()
+        field = _FIELDS.get(label)
+        if field:
+            key, convert = field
+            try:
+                header[key] = convert(line[:LABEL_START_COL].strip())
+            except (ValueError, IndexError):
+                pass
+        elif label == b'RINEX VERSION / TYPE' and b'OBSERVATION DATA' in line[:LABEL_START_COL]:
+            header['rinextype'] = 'obs'
+    return header
+
+
+def scan_rinex_header(path):
+    """Заголовок файла по пути (в том числе Hatanaka: его заголовок содержит заголовок RINEX)."""
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+        if not (compression_of(path) or magic in (LZW_MAGIC, GZIP_MAGIC)):
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return parse_header_bytes(data)
+            except ValueError:  # пустой файл не отображается
+                return empty_header()
+
+    with open_rinex_input(open_stored(path)) as stream:
+        data = b''
+        while len(data) < MAX_HEADER_BYTES and _header_end(data, len(data)) < 0:
+            chunk = stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            data += chunk
+    return parse_header_bytes(data)
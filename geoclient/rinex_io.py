@@ -0,0 +1,333 @@
+# geoclient/rinex_io.py
+
+import gzip
+import io
+
+# Входные форматы определяются по содержимому, а не по имени файла:
+# .Z (Unix compress), .gz, Compact RINEX (Hatanaka) и их сочетания (.crx.gz, .20d.Z).
+LZW_MAGIC = b'\x1f\x9d'
+GZIP_MAGIC = b'\x1f\x8b'
+CRINEX_LABEL = b'CRINEX VERS'
+
+CHUNK_SIZE = 256 * 1024
+
+
+class _IterStream(io.RawIOBase):
+    """Бинарный поток только для чтения поверх генератора байтовых блоков."""
+    def __init__(self, chunks, source=None):
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b'')
+        self._source = source
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            if hasattr(self._chunks, 'close'):
+                self._chunks.close()
+            if self._source is not None:
+                self._source.close()
+        super().close()
+
+
+def _buffered(chunks, source=None):
+    return io.BufferedReader(_IterStream(chunks, source), CHUNK_SIZE)
+
+
+def _iter_read(stream, chunk_size=CHUNK_SIZE):
+    return iter(lambda: stream.read(chunk_size), b'')
+
+
+def iter_unlzw(stream, chunk_size=CHUNK_SIZE):
+    """
+    Потоковая распаковка Unix compress (.Z, LZW) по алгоритму unlzw из pigz.
+    Читает stream блоками и отдает распакованные блоки.
+    """
+    chunks = _iter_read(stream, chunk_size)
+    data, pos = b'', 0
+
+    def read_byte():
+        nonlocal data, pos
+        if pos >= len(data):
+            data, pos = next(chunks, b''), 0
+            if not data:
+                return -1
+        pos += 1
+        return data[pos - 1]
+
+    def skip(count):
+        for _ in range(count):
+            if read_byte() < 0:
+                return False
+        return True
+
+    if read_byte() != LZW_MAGIC[0] or read_byte() != LZW_MAGIC[1]:
+        raise ValueError("Неверная сигнатура .Z файла.")
+    flags = read_byte()
+    max_bits = flags & 0x1f
+    if flags < 0 or flags & 0x60 or not 9 <= max_bits <= 16:
+        raise ValueError("Неверный заголовок .Z файла.")
+    if max_bits == 9:
+        max_bits = 10  # 9 на деле означает 10
+    block_mode = flags & 0x80
+
+    bits, mask = 9, 0x1ff
+    end = 256 if block_mode else 255
+    prefix = [0] * 65536
+    suffix = [0] * 65536
+
+    first, second = read_byte(), read_byte()
+    if first < 0:
+        return
+    if second < 0:
+        raise ValueError("Файл .Z оборван посередине кода.")
+    buf = first | (second << 8)
+    final = prev = buf & mask
+    buf >>= bits
+    left = 16 - bits
+    if prev > 255:
+        raise ValueError("Первый код .Z должен быть литералом.")
+
+    out = bytearray([final])
+    mark, consumed = 3, 5
+    while True:
+        if end >= mask and bits < max_bits:
+            # Коды пишутся группами по bits байт: при смене ширины остаток группы пропускается
+            rest = (consumed - mark) % bits
+            if rest:
+                if not skip(bits - rest):
+                    break
+                consumed += bits - rest
+            buf = left = 0
+            mark = consumed
+            bits += 1
+            mask = (mask << 1) | 1
+
+        byte = read_byte()
+        if byte < 0:
+            break
+        consumed += 1
+        buf |= byte << left
+        left += 8
+        if left < bits:
+            byte = read_byte()
+            if byte < 0:
+                raise ValueError("Файл .Z оборван посередине кода.")
+            consumed += 1
+            buf |= byte << left
+            left += 8
+        code = buf & mask
+        buf >>= bits
+        left -= bits
+
+        if code == 256 and block_mode:
+            # Код очистки словаря
+            rest = (consumed - mark) % bits
+            if rest:
+                if not skip(bits - rest):
+                    break
+                consumed += bits - rest
+            buf = left = 0
+            mark = consumed
+            bits, mask, end = 9, 0x1ff, 255
+            continue
+
+        current = code
+        stack = bytearray()
+        if code > end:
+            if code != end + 1 or prev > end:
+                raise ValueError("Поврежденные данные .Z файла.")
+            stack.append(final)
+            code = prev
+        while code >= 256:
+            stack.append(suffix[code])
+            code = prefix[code]
+        stack.append(code)
+        final = code
+        if end < mask:
+            end += 1
+            prefix[end] = prev
+            suffix[end] = final
+        prev = current
+
+        stack.reverse()
+        out += stack
+        if len(out) >= chunk_size:
+            yield bytes(out)
+            out.clear()
+    if out:
+        yield bytes(out)
+
+
+class _Differenced:
+    """Восстановление ряда по разностям n-го порядка (поля данных и часов CRINEX)."""
+    __slots__ = ('values', 'order', 'max_order')
+
+    def __init__(self):
+        self.values = None
+        self.order = self.max_order = 0
+
+    def feed(self, field):
+        if '&' in field:
+            order, value = field.split('&', 1)
+            self.max_order = int(order)
+            self.values = [int(value)]
+            self.order = 0
+        else:
+            if self.values is None:
+                raise ValueError("Разность без инициализации ряда в Compact RINEX.")
+            if self.order < self.max_order:
+                self.order += 1
+                self.values.append(0)
+            values = self.values
+            values[self.order] = int(field)
+            for i in range(self.order - 1, -1, -1):
+                values[i] += values[i + 1]
+        return self.values[0]
+
+
+def _repair(previous, diff):
+    """Текстовая разность CRINEX: пробел — символ не изменился, '&' — стал пробелом."""
+    chars = list(previous.ljust(len(diff)))
+    for i, c in enumerate(diff):
+        if c == '&':
+            chars[i] = ' '
+        elif c != ' ':
+            chars[i] = c
+    return ''.join(chars)
+
+
+def _fixed(value, decimals, width):
+    """Целое число в единицах 10^-decimals как F<width>.<decimals>."""
+    sign = '-' if value < 0 else ''
+    whole, frac = divmod(abs(value), 10 ** decimals)
+    return f'{sign}{whole}.{frac:0{decimals}d}'.rjust(width)
+
+
+def iter_crx_to_rinex(stream):
+    """
+    Compact RINEX (Hatanaka, CRINEX 1.0 и 3.0) -> строки обычного RINEX (bytes).
+    Работает построчно: в памяти только состояние предыдущей эпохи.
+    """
+    lines = (raw.decode('ascii', errors='ignore').rstrip('\r\n') for raw in stream)
+    first = next(lines, '')
+    if 'CRINEX VERS' not in first:
+        raise ValueError("Не найден заголовок Compact RINEX.")
+    v3 = first[:20].strip().startswith('3')
+    next(lines, '')  # CRINEX PROG / DATE
+
+    # Заголовок RINEX передается без изменений; из него нужны только типы наблюдений
+    n_types = {}
+    for line in lines:
+        yield (line + '\n').encode('ascii')
+        label = line[60:].strip()
+        if label == '# / TYPES OF OBSERV' and line[:6].strip():
+            n_types[''] = int(line[:6])
+        elif label == 'SYS / # / OBS TYPES' and line[:1].strip():
+            n_types[line[0]] = int(line[3:6])
+        elif label == 'END OF HEADER':
+            break
+
+    flag_col, count_slice, sat_start = (31, slice(32, 35), 41) if v3 else (28, slice(29, 32), 32)
+    init_char = '>' if v3 else '&'
+    epoch = ''
+    clock = _Differenced()
+    sat_state = {}
+
+    for line in lines:
+        if line.startswith(init_char):
+            epoch = line if v3 else ' ' + line[1:]
+            sat_state = {}
+            clock = _Differenced()
+        else:
+            epoch = _repair(epoch, line)
+
+        count = int(epoch[count_slice] or 0)
+        if epoch[flag_col:flag_col + 1] in ('2', '3', '4', '5'):
+            # Событие: за строкой эпохи следуют count строк заголовка как есть
+            epoch = epoch[:sat_start]
+            yield (epoch[:count_slice.stop] + '\n').encode('ascii')
+            for _ in range(count):
+                yield (next(lines, '') + '\n').encode('ascii')
+            continue
+
+        epoch = epoch[:sat_start + 3 * count]
+        sats = [epoch[sat_start + 3 * i:sat_start + 3 * i + 3] for i in range(count)]
+
+        clock_line = next(lines, '').strip()
+        if clock_line:
+            clock_value = clock.feed(clock_line)
+        else:
+            clock_value = None
+            clock = _Differenced()
+
+        if v3:
+            out = [epoch[:35] + (' ' * 6 + _fixed(clock_value, 12, 15) if clock_value is not None else '')]
+        else:
+            out = [epoch[:32] + ''.join(sats[:12])]
+            if clock_value is not None:
+                out[0] = out[0].ljust(68) + _fixed(clock_value, 9, 12)
+            for i in range(12, count, 12):
+                out.append(' ' * 32 + ''.join(sats[i:i + 12]))
+
+        new_state = {}
+        for sat in sats:
+            ntype = n_types.get(sat[0] if v3 else '', 0)
+            fields = next(lines, '').split(' ', ntype)
+            fields += [''] * (ntype + 1 - len(fields))
+            series, old_flags = sat_state.get(sat, (None, ''))
+            series = series or [None] * ntype
+            flags = _repair(old_flags, fields[ntype])
+            obs = []
+            for i in range(ntype):
+                if not fields[i]:
+                    # Пропуск наблюдения сбрасывает и ряд, и флаги LLI/SSI (как в crx2rnx)
+                    series[i] = None
+                    flags = flags[:2 * i].ljust(2 * i) + '  ' + flags[2 * i + 2:]
+                    obs.append(' ' * 16)
+                    continue
+                if series[i] is None:
+                    series[i] = _Differenced()
+                obs.append(_fixed(series[i].feed(fields[i]), 3, 14) + flags[2 * i:2 * i + 2].ljust(2))
+            new_state[sat] = (series, flags)
+
+            if v3:
+                out.append((sat + ''.join(obs)).rstrip())
+            else:
+                for i in range(0, ntype, 5):
+                    out.append(''.join(obs[i:i + 5]).rstrip())
+        sat_state = new_state
+
+        yield ('\n'.join(out) + '\n').encode('ascii')
+
+
+def open_rinex_input(stream):
+    """
+    Обычный RINEX из загруженного или хранимого файла как бинарный поток строк.
+    .Z и gzip распаковываются, Compact RINEX восстанавливается — все потоково,
+    без временных файлов. Закрытие результата закрывает исходный поток.
+    """
+    reader = _buffered(_iter_read(stream), stream)
+    while True:
+        head = reader.peek(len(CRINEX_LABEL) + 80)
+        if head[:2] == LZW_MAGIC:
+            reader = _buffered(iter_unlzw(reader), reader)
+        elif head[:2] == GZIP_MAGIC:
+            reader = _buffered(_iter_read(gzip.GzipFile(fileobj=reader)), reader)
+        elif CRINEX_LABEL in head[:81]:
+            return _buffered(iter_crx_to_rinex(reader), reader)
+        else:
+            return reader
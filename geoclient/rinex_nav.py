@@ -0,0 +1,175 @@
+# geoclient/rinex_nav.py
+"""
+Разбор навигационных файлов RINEX 2/3 (GPS .n, ГЛОНАСС .g, смешанные N v3)
+в структурированные массивы NumPy — по одной записи на эфемериду спутника.
+
+Время: для GPS toc и toe_time — шкала GPST, для ГЛОНАСС toc — UTC (как в файле).
+Координаты и скорости ГЛОНАСС хранятся в километрах, как в RINEX.
+"""
+
+import numpy as np
+
+GPS = 'G'
+GLONASS = 'R'
+
+GPS_EPOCH = np.datetime64('1980-01-06T00:00:00', 'ms')
+SECONDS_PER_WEEK = 7 * 86400
+
+VALUE_WIDTH = 19
+
+GPS_EPHEMERIS_DTYPE = np.dtype([
+    ('prn', 'i2'), ('toc', 'M8[ms]'), ('toe_time', 'M8[ms]'),
+    ('af0', 'f8'), ('af1', 'f8'), ('af2', 'f8'),
+    ('iode', 'f8'), ('crs', 'f8'), ('delta_n', 'f8'), ('m0', 'f8'),
+    ('cuc', 'f8'), ('e', 'f8'), ('cus', 'f8'), ('sqrt_a', 'f8'),
+    ('toe', 'f8'), ('cic', 'f8'), ('omega0', 'f8'), ('cis', 'f8'),
+    ('i0', 'f8'), ('crc', 'f8'), ('omega', 'f8'), ('omega_dot', 'f8'),
+    ('idot', 'f8'), ('week', 'i4'), ('health', 'f8'), ('tgd', 'f8'), ('iodc', 'f8'),
+])
+
+GLONASS_EPHEMERIS_DTYPE = np.dtype([
+    ('prn', 'i2'), ('toc', 'M8[ms]'),
+    ('minus_tau_n', 'f8'), ('gamma_n', 'f8'), ('tk', 'f8'),
+    ('x', 'f8'), ('vx', 'f8'), ('ax', 'f8'), ('health', 'f8'),
+    ('y', 'f8'), ('vy', 'f8'), ('ay', 'f8'), ('freq_num', 'f8'),
+    ('z', 'f8'), ('vz', 'f8'), ('az', 'f8'), ('age', 'f8'),
+])
+
+# Порядок значений в записи (первая строка — 3 значения, остальные — по 4); None — не сохраняется
+_GPS_FIELDS = (
+    'af0', 'af1', 'af2',
+    'iode', 'crs', 'delta_n', 'm0',
+    'cuc', 'e', 'cus', 'sqrt_a',
+    'toe', 'cic', 'omega0', 'cis',
+    'i0', 'crc', 'omega', 'omega_dot',
+    'idot', None, 'week', None,
+    None, 'health', 'tgd', 'iodc',
+)
+_GLONASS_FIELDS = (
+    'minus_tau_n', 'gamma_n', 'tk',
+    'x', 'vx', 'ax', 'health',
+    'y', 'vy', 'ay', 'freq_num',
+    'z', 'vz', 'az', 'age',
+)
+
+EPHEMERIS_DTYPES = {GPS: GPS_EPHEMERIS_DTYPE, GLONASS: GLONASS_EPHEMERIS_DTYPE}
+_FIELDS = {GPS: _GPS_FIELDS, GLONASS: _GLONASS_FIELDS}
+
+# Строк на запись в RINEX 3 по системам (остальные системы пропускаются целиком)
+_V3_RECORD_LINES = {'G': 8, 'E': 8, 'J': 8, 'C': 8, 'I': 8, 'R': 4, 'S': 4}
+
+
+def _value(text):
+    text = text.strip().replace('D', 'E').replace('d', 'e')
+    return float(text) if text else np.nan
+
+
+def _values(line, start, count):
+    return [_value(line[start + VALUE_WIDTH * i:start + VALUE_WIDTH * (i + 1)]) for i in range(count)]
+
+
+def _epoch(text):
+    parts = text.split()
+    year = int(parts[0])
+    if year < 100:
+        year += 2000 if year < 80 else 1900
+    sec = float(parts[5])
+    return (np.datetime64(f'{year:04d}-{int(parts[1]):02d}-{int(parts[2]):02d}', 'ms')
+            + np.timedelta64(int(parts[3]) * 3600000 + int(parts[4]) * 60000 + round(sec * 1000), 'ms'))
+
+
+def _read_header(lines):
+    """(версия, система файла) по заголовку; итератор остается после END OF HEADER."""
+    version, system = None, None
+    for raw in lines:
+        line = raw.decode('ascii', errors='ignore').rstrip('\r\n')
+        label = line[60:80].strip()
+        if label == 'RINEX VERSION / TYPE':
+            version = float(line[:9])
+            file_type = line[20:21].upper()
+            if version >= 3:
+                system = line[40:41].upper() or 'M'
+            else:
+                system = GLONASS if file_type == 'G' else GPS
+        elif label == 'END OF HEADER':
+            break
+    if version is None:
+        raise ValueError("Не найдена строка RINEX VERSION / TYPE.")
+    return version, system
+
+
+def _records(lines, version, file_system):
+    """(система, номер спутника, эпоха, значения) для каждой записи GPS/ГЛОНАСС."""
+    v3 = version >= 3
+    glonass_lines = 5 if version >= 3.05 else 4
+    for raw in lines:
+        line = raw.decode('ascii', errors='ignore').rstrip('\r\n')
+        if not line.strip():
+            continue
+        if v3:
+            system = line[0]
+            n_lines = glonass_lines if system == GLONASS else _V3_RECORD_LINES.get(system, 8)
+            rest = [next(lines, b'').decode('ascii', errors='ignore').rstrip('\r\n') for _ in range(n_lines - 1)]
+            if system not in EPHEMERIS_DTYPES:
+                continue
+            prn, epoch_text, first_start, orbit_start = int(line[1:3]), line[4:23], 23, 4
+        else:
+            system = file_system
+            n_lines = 8 if system == GPS else 4
+            rest = [next(lines, b'').decode('ascii', errors='ignore').rstrip('\r\n') for _ in range(n_lines - 1)]
+            prn, epoch_text, first_start, orbit_start = int(line[:2]), line[3:22], 22, 3
+
+        values = _values(line, first_start, 3)
+        for orbit in rest[:len(_FIELDS[system]) // 4]:
+            values.extend(_values(orbit.ljust(orbit_start + 4 * VALUE_WIDTH), orbit_start, 4))
+        yield system, prn, _epoch(epoch_text), values
+
+
+def parse_navigation(stream):
+    """
+    Разбирает навигационный файл из бинарного потока (например, open_rinex_input).
+    Возвращает {система: структурированный массив эфемерид}, без дубликатов.
+    """
+    lines = iter(stream)
+    version, file_system = _read_header(lines)
+    rows = {system: [] for system in EPHEMERIS_DTYPES}
+    for system, prn, epoch, values in _records(lines, version, file_system):
+        rows[system].append((prn, epoch, values))
+
+    result = {}
+    for system, items in rows.items():
+        if not items:
+            continue
+        dtype = EPHEMERIS_DTYPES[system]
+        array = np.zeros(len(items), dtype=dtype)
+        array['prn'] = [prn for prn, _, _ in items]
+        array['toc'] = [epoch for _, epoch, _ in items]
+        for i, name in enumerate(_FIELDS[system]):
+            if name:
+                array[name] = [values[i] if i < len(values) else np.nan for _, _, values in items]
+        if system == GPS:
+            array['toe_time'] = GPS_EPOCH + (
+                (array['week'].astype(np.int64) * SECONDS_PER_WEEK + array['toe']) * 1000
+            ).astype('timedelta64[ms]')
+        result[system] = deduplicate(system, array)
+    return result
+
+
+def ephemeris_time(system, array):
+    """Момент, к которому относится эфемерида (ключ дедупликации вместе с номером спутника)."""
+    return array['toe_time'] if system == GPS else array['toc']
+
+
+def deduplicate(system, array):
+    """
+    Одна запись на (спутник, Toe): из повторов остается последняя по порядку в массиве
+    (новые загрузки дописываются в конец). Результат отсортирован по спутнику и времени.
+    """
+    if not len(array):
+        return array
+    order = np.lexsort((np.arange(len(array)), ephemeris_time(system, array), array['prn']))
+    array = array[order]
+    times = ephemeris_time(system, array)
+    last = np.ones(len(array), dtype=bool)
+    last[:-1] = (array['prn'][1:] != array['prn'][:-1]) | (times[1:] != times[:-1])
+    return array[last]
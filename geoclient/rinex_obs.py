@@ -0,0 +1,209 @@
+# geoclient/rinex_obs.py
+"""
+Чтение тела RINEX-файла наблюдений (2.xx и 3.xx) в массивы NumPy.
+
+Строки спутников собираются в записи фиксированной ширины «спутник + поля по 16 символов»
+и разбираются блоками целиком: числа F14.3 получаются умножением матрицы цифр
+на вектор весов, без преобразования каждого поля в Python.
+"""
+
+from itertools import islice
+
+import numpy as np
+
+SAT_WIDTH = 3
+FIELD_WIDTH = 16
+VALUE_WIDTH = 14
+V2_FIELDS_PER_LINE = 5
+V2_LINE_WIDTH = 80
+V2_SATS_PER_LINE = 12
+BLOCK_RECORDS = 100_000
+
+# Флаги эпох с данными; остальные (события, записи о срывах) пропускаются
+DATA_EPOCH_FLAGS = (b'0', b'1')
+# Флаги 2–5 — события: за строкой эпохи следуют count строк заголовка. Флаг 6 (срывы фазы)
+# устроен как обычная эпоха: список спутников и их наблюдения
+EVENT_FLAGS = (b'2', b'3', b'4', b'5')
+
+# Поле F14.3: 10 знаков целой части, точка, 3 знака дробной — мантисса в тысячных
+_VALUE_WEIGHTS = np.array(
+    [10.0 ** (12 - i) for i in range(10)] + [0.0] + [10.0 ** (13 - i) for i in range(11, VALUE_WIDTH)]
+)
+_ZERO = ord('0')
+_MINUS = ord('-')
+_SPACE = ord(' ')
+
+
+class ObservationData:
+    """
+    Наблюдения одного файла.
+    times — моменты эпох (datetime64[ms]); для каждой записи (спутник в эпохе):
+    epoch — индекс эпохи, system — код буквы системы (uint8), prn — номер спутника.
+    values и lli — матрицы (записей, len(types)); NaN — наблюдения этого типа нет.
+    """
+    def __init__(self, header, times, epoch, system, prn, types, values, lli):
+        self.header = header
+        self.times = times
+        self.epoch = epoch
+        self.system = system
+        self.prn = prn
+        self.types = types
+        self.values = values
+        self.lli = lli
+
+    def column(self, obs_type):
+        return self.values[:, self.types.index(obs_type)]
+
+
+def read_obs_header(lines):
+    """Заголовок O-файла из итератора байтовых строк; итератор остается после END OF HEADER."""
+    header = {'version': None, 'obs_types': {}, 'interval': None, 'marker_name': None, 'approx_pos_xyz': None}
+    system = None
+    for raw in lines:
+        line = raw.decode('ascii', errors='ignore').rstrip('\r\n')
+        label = line[60:80].strip()
+        if label == 'RINEX VERSION / TYPE':
+            header['version'] = float(line[:9])
+        elif label == '# / TYPES OF OBSERV':
+            header['obs_types'].setdefault('', []).extend(line[6:60].split())
+        elif label == 'SYS / # / OBS TYPES':
+            if line[:1].strip():
+                system = line[0]
+                header['obs_types'][system] = []
+            if system:
+                header['obs_types'][system].extend(line[7:60].split())
+        elif label == 'INTERVAL':
+            try: header['interval'] = float(line[:10])
+            except ValueError: pass
+        elif label == 'MARKER NAME':
+            header['marker_name'] = line[:60].strip()
+        elif label == 'APPROX POSITION XYZ':
+            try: header['approx_pos_xyz'] = [float(x) for x in line[:42].split()[:3]]
+            except ValueError: pass
+        elif label == 'END OF HEADER':
+            break
+    if header['version'] is None:
+        raise ValueError("Не найдена строка RINEX VERSION / TYPE.")
+    if not header['obs_types']:
+        raise ValueError("В заголовке нет типов наблюдений.")
+    return header
+
+
+def _epochs_v3(lines, obs_types):
+    """(текст времени эпохи, записи спутников) для RINEX 3: записи — строки как есть."""
+    for line in lines:
+        if line[:1] != b'>':
+            continue
+        count = int(line[32:35] or 0)
+        if line[31:32] not in DATA_EPOCH_FLAGS:
+            next(islice(lines, count, count), None)
+            continue
+        yield line[2:29], list(islice(lines, count))
+
+
+def _epochs_v2(lines, obs_types):
+    """То же для RINEX 2: запись — номер спутника и склеенные строки его наблюдений по 80 символов."""
+    lines_per_sat = -(-len(obs_types['']) // V2_FIELDS_PER_LINE)
+    for line in lines:
+        line = line.rstrip(b'\r\n')
+        if len(line) < 32:
+            continue
+        count, flag = int(line[29:32] or 0), line[28:29]
+        if flag in EVENT_FLAGS:
+            next(islice(lines, count, count), None)
+            continue
+        sat_text = line[32:68].ljust(36)
+        for extra in islice(lines, (count - 1) // V2_SATS_PER_LINE):
+            sat_text += extra.rstrip(b'\r\n')[32:68].ljust(36)
+        body = [row.rstrip(b'\r\n').ljust(V2_LINE_WIDTH) for row in islice(lines, count * lines_per_sat)]
+        if flag not in DATA_EPOCH_FLAGS:
+            continue
+        yield line[1:26], [
+            sat_text[SAT_WIDTH * i:SAT_WIDTH * i + SAT_WIDTH] + b''.join(body[i * lines_per_sat:(i + 1) * lines_per_sat])
+            for i in range(count)
+        ]
+
+
+def _epoch_times(texts):
+    """Тексты времени эпох 'yy mm dd hh mm ss.sss' (или с 4-значным годом) -> datetime64[ms]."""
+    if not texts:
+        return np.array([], dtype='datetime64[ms]')
+    parts = np.array([[float(x) for x in text.split()[:6]] for text in texts])
+    year = parts[:, 0].astype(int)
+    year = np.where(year < 100, np.where(year < 80, year + 2000, year + 1900), year)
+    months = (year - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (parts[:, 1].astype(int) - 1)
+    days = months.astype('datetime64[D]') + (parts[:, 2].astype(int) - 1)
+    ms = np.rint((parts[:, 3] * 3600 + parts[:, 4] * 60 + parts[:, 5]) * 1000).astype('timedelta64[ms]')
+    return days.astype('datetime64[ms]') + ms
+
+
+def _decode_values(chars):
+    """Матрица символов полей F14.3 (n, 14) -> float64; пустые поля -> NaN."""
+    digits = chars - _ZERO
+    is_digit = digits < 10
+    values = (digits * is_digit).astype(np.float64) @ _VALUE_WEIGHTS / 1000
+    values[(chars == _MINUS).any(axis=1)] *= -1
+    values[~is_digit.any(axis=1)] = np.nan
+    return values
+
+
+def _decode_block(records, width, obs_types, column_index):
+    buf = np.frombuffer(
+        b''.join(record.rstrip(b'\r\n').ljust(width)[:width] for record in records), dtype=np.uint8
+    ).reshape(len(records), width)
+    system = buf[:, 0].copy()
+    system[system == _SPACE] = ord('G')  # в RINEX 2 пустая буква означает GPS
+    tens, units = buf[:, 1] - _ZERO, buf[:, 2] - _ZERO
+    prn = np.where(tens < 10, tens, 0).astype(np.int16) * 10 + np.where(units < 10, units, 0)
+
+    values = np.full((len(records), len(column_index)), np.nan)
+    lli = np.zeros((len(records), len(column_index)), dtype=np.uint8)
+    for key, codes in obs_types.items():
+        rows = np.arange(len(records)) if key == '' else np.flatnonzero(system == ord(key))
+        if not rows.size:
+            continue
+        sub = buf[rows]
+        for j, code in enumerate(codes):
+            col = column_index.get(code)
+            if col is None:
+                continue
+            start = SAT_WIDTH + FIELD_WIDTH * j
+            values[rows, col] = _decode_values(sub[:, start:start + VALUE_WIDTH])
+            flag = sub[:, start + VALUE_WIDTH] - _ZERO
+            lli[rows, col] = np.where(flag < 10, flag, 0)
+    return system, prn, values, lli
+
+
+def read_observations(stream, types=None, max_epochs=None):
+    """
+    Разбирает O-файл из бинарного потока (например, open_rinex_input) в ObservationData.
+    types — отбор типов наблюдений по коду (например, lambda code: code[0] in 'LS'),
+    по умолчанию разбираются все; max_epochs — читать только первые эпохи.
+    Память — только итоговые массивы и один блок строк.
+    """
+    lines = iter(stream)
+    header = read_obs_header(lines)
+    obs_types = header['obs_types']
+    columns = list(dict.fromkeys(
+        code for codes in obs_types.values() for code in codes if types is None or types(code)
+    ))
+    column_index = {code: i for i, code in enumerate(columns)}
+    width = SAT_WIDTH + FIELD_WIDTH * max(len(codes) for codes in obs_types.values())
+    epochs = _epochs_v3 if header['version'] >= 3 else _epochs_v2
+
+    epoch_texts, counts, pending, blocks = [], [], [], []
+    for text, records in epochs(lines, obs_types):
+        epoch_texts.append(text.decode('ascii', errors='ignore'))
+        counts.append(len(records))
+        pending.extend(records)
+        if len(pending) >= BLOCK_RECORDS:
+            blocks.append(_decode_block(pending, width, obs_types, column_index))
+            pending = []
+        if max_epochs and len(counts) >= max_epochs:
+            break
+    if pending or not blocks:
+        blocks.append(_decode_block(pending, width, obs_types, column_index))
+
+    system, prn, values, lli = (np.concatenate(parts) for parts in zip(*blocks))
+    epoch = np.repeat(np.arange(len(counts)), counts)
+    return ObservationData(header, _epoch_times(epoch_texts), epoch, system, prn, columns, values, lli)
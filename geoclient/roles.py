@@ -0,0 +1,94 @@
+# geoclient/roles.py
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+ROLE_UPLOADER = 'Uploader'
+ROLE_VIEWER = 'Viewer'
+
+# Общий кэш (Redis/LocMem из settings.CACHES) и короткий кэш процесса поверх него.
+# Локальная копия живет меньше: сигнал в другом процессе очищает только общий кэш.
+ROLE_CACHE_TTL = getattr(settings, 'GEOCLIENT_ROLE_CACHE_TTL', 300)
+ROLE_LOCAL_TTL = getattr(settings, 'GEOCLIENT_ROLE_LOCAL_TTL', 30)
+
+_local_roles = {}
+_local_lock = threading.Lock()
+
+
+def _cache_key(user_id):
+    return f'geoclient:roles:{user_id}'
+
+
+def get_user_roles(user):
+    """
+    Возвращает frozenset имен групп пользователя.
+    При прогретом кэше не делает ни одного запроса к БД.
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    # Один и тот же объект пользователя в пределах запроса
+    roles = getattr(user, '_geoclient_roles', None)
+    if roles is not None:
+        return roles
+
+    now = time.monotonic()
+    entry = _local_roles.get(user.pk)
+    if entry and entry[0] > now:
+        roles = entry[1]
+    else:
+        roles = cache.get(_cache_key(user.pk))
+        if roles is None:
+            roles = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(_cache_key(user.pk), roles, ROLE_CACHE_TTL)
+        with _local_lock:
+            _local_roles[user.pk] = (now + ROLE_LOCAL_TTL, roles)
+
+    user._geoclient_roles = roles
+    return roles
+
+
+def invalidate_user_roles(user_ids):
+    user_ids = [uid for uid in user_ids if uid is not None]
+    if not user_ids:
+        return
+    with _local_lock:
+        for uid in user_ids:
+            _local_roles.pop(uid, None)
+    cache.delete_many([_cache_key(uid) for uid in user_ids])
+
+
+def clear_local_roles():
+    with _local_lock:
+        _local_roles.clear()
+
+
+# --- Сигналы ---
+
+def _invalidate_on_commit(user_ids):
+    # До фиксации параллельный запрос прочитал бы старые группы и снова закэшировал их на весь TTL
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: invalidate_user_roles(user_ids))
+
+
+def on_user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed для User.groups (в обе стороны: user.groups.add и group.user_set.add)."""
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        _invalidate_on_commit([instance.pk])
+    elif action == 'pre_clear':
+        # После очистки список участников группы уже не получить
+        _invalidate_on_commit(list(instance.user_set.values_list('pk', flat=True)))
+    elif pk_set:
+        _invalidate_on_commit(pk_set)
+
+
+def on_group_changed(sender, instance, **kwargs):
+    """Переименование или удаление группы меняет роли всех ее участников."""
+    if instance.pk:
+        _invalidate_on_commit(list(instance.user_set.values_list('pk', flat=True)))
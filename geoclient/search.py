@@ -0,0 +1,76 @@
+# geoclient/search.py
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Upper
+
+from .models import GeodeticPoint, PointAlias
+
+SEARCH_FIELDS = ('id', 'station_name', 'index_name', 'mark_number')
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 1000
+
+# Условия строятся по UPPER(поле): так их обслуживают GIN-индексы gin_trgm_ops
+# (и подстрока LIKE '%...%', и оператор %> для опечаток).
+
+
+def _match(expression_name, term):
+    return Q(**{f'{expression_name}__contains': term}) | Q(**{f'{expression_name}__trigram_word_similar': term})
+
+
+def _similarity(term, field):
+    return Coalesce(TrigramWordSimilarity(Value(term), Upper(field)), 0.0, output_field=FloatField())
+
+
+def search_point_ids(query, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    ID пунктов, подходящих под запрос, от лучших совпадений к худшим.
+    Кандидаты собираются по индексам отдельно по полям пункта и по алиасам
+    (каждый набор до MAX_SEARCH_LIMIT лучших по сходству), затем ранжируются
+    одним запросом.
+    """
+    term = (query or '').strip().upper()
+    if not term:
+        return []
+
+    field_aliases = {f'_{field}_up': Upper(field) for field in SEARCH_FIELDS}
+    field_match = Q()
+    for name in field_aliases:
+        field_match |= _match(name, term)
+
+    field_rank = Greatest(*(_similarity(term, field) for field in SEARCH_FIELDS))
+    candidate_ids = set(
+        GeodeticPoint.objects.alias(**field_aliases).filter(field_match)
+        .alias(_rank=field_rank).order_by('-_rank', 'id')
+        .values_list('id', flat=True)[:MAX_SEARCH_LIMIT]
+    )
+    candidate_ids.update(
+        PointAlias.objects.alias(_alias_up=Upper('alias')).filter(_match('_alias_up', term))
+        .alias(_rank=_similarity(term, 'alias')).order_by('-_rank', 'point_id')
+        .values_list('point_id', flat=True)[:MAX_SEARCH_LIMIT]
+    )
+    if not candidate_ids:
+        return []
+
+    alias_rank = (
+        PointAlias.objects.filter(point=OuterRef('pk'))
+        .annotate(_sim=TrigramWordSimilarity(Value(term), Upper('alias')))
+        .order_by('-_sim').values('_sim')[:1]
+    )
+    rank = Greatest(
+        field_rank,
+        Coalesce(Subquery(alias_rank, output_field=FloatField()), 0.0, output_field=FloatField()),
+    )
+    return list(
+        GeodeticPoint.objects.filter(id__in=candidate_ids)
+        .annotate(_rank=rank).order_by('-_rank', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def search_points(query, limit=DEFAULT_SEARCH_LIMIT):
+    """Пункты (с алиасами) в порядке ранжирования search_point_ids."""
+    ids = search_point_ids(query, limit)
+    points = GeodeticPoint.objects.filter(id__in=ids).prefetch_related('aliases')
+    by_id = {p.id: p for p in points}
+    return [by_id[i] for i in ids if i in by_id]
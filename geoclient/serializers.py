@@ -1,6 +1,8 @@
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from rest_framework import serializers
-from .models import GeodeticPoint, Observation, StationDirectoryName, UploadedRinexFile
+from django.db.models import Value
+from django.db.models.functions import Lower
+from .models import GeodeticPoint, Observation, StationDirectoryName, UploadedRinexFile, PointStatistics
 
 class ObservationSerializer(serializers.ModelSerializer):
     """Сериализатор для модели Observation."""
@@ -21,7 +23,7 @@ class ObservationSerializer(serializers.ModelSerializer):
             'location', 'latitude', 'longitude',
             'receiver_number', 'antenna_height',
             'source_file_group',
-            'file_count_in_group' # Добавляем новое поле
+            'file_count_in_group', # Добавляем новое поле
         )
 
     def get_duration_display(self, obj):
@@ -42,6 +44,9 @@ class ObservationSerializer(serializers.ModelSerializer):
         Подсчитывает количество файлов в группе, к которой относится наблюдение.
         """
         if obj.source_file and obj.source_file.upload_group:
+            # В списке наблюдений число файлов уже посчитано подзапросом
+            if getattr(obj, '_file_count_in_group', None) is not None:
+                return obj._file_count_in_group
             # Чтобы избежать лишних запросов к БД, можно было бы оптимизировать
             # через prefetch_related с аннотацией, но для простоты и надежности
             # этот метод сработает хорошо.
@@ -51,8 +56,39 @@ class ObservationSerializer(serializers.ModelSerializer):
         return 0
 
 
+class ObservationDetailSerializer(ObservationSerializer):
+    """
+    Одно наблюдение (/api/observations/<id>/) — со сводкой контроля качества O-файла.
+    В списках пунктов и наблюдений сводка не отдается: это крупный JSON на каждую сессию.
+    """
+    qc_summary = serializers.SerializerMethodField()
+
+    class Meta(ObservationSerializer.Meta):
+        fields = ObservationSerializer.Meta.fields + ('qc_summary',)
+
+    def get_qc_summary(self, obj):
+        """Сводка контроля качества исходного O-файла (None, если не считалась)."""
+        return obj.source_file.qc_summary if obj.source_file else None
+
+
+class ObservationListSerializer(ObservationSerializer):
+    """Наблюдение в общем списке (/api/observations/) — с ID пункта."""
+    point_id = serializers.CharField(read_only=True)
+
+    class Meta(ObservationSerializer.Meta):
+        fields = ('point_id',) + ObservationSerializer.Meta.fields
+
+
+class PointStatisticsSerializer(serializers.ModelSerializer):
+    """Сводка по наблюдениям пункта (таблица PointStatistics)."""
+    class Meta:
+        model = PointStatistics
+        fields = ('observation_count', 'first_observation', 'last_observation', 'total_duration', 'receiver_count')
+
+
 class GeodeticPointSerializer(GeoFeatureModelSerializer):
     observations = ObservationSerializer(many=True, read_only=True)
+    statistics = PointStatisticsSerializer(read_only=True)
     latitude = serializers.FloatField(source='location.y', read_only=True)
     longitude = serializers.FloatField(source='location.x', read_only=True)
     point_type_display = serializers.CharField(source='get_point_type_display', read_only=True)
@@ -65,11 +101,11 @@ class GeodeticPointSerializer(GeoFeatureModelSerializer):
             'id', 'station_name', 'description', 'point_type', 'point_type_display',
             'latitude', 'longitude', 'observations',
             'network_class', 'index_name', 'center_type', 'status', 'mark_number',
-            'latest_observation_data'
+            'latest_observation_data', 'statistics'
         )
         read_only_fields = (
             'id', 'latitude', 'longitude', 'point_type_display', 'observations',
-            'latest_observation_data'
+            'latest_observation_data', 'statistics'
         )
         
     def get_latest_observation_data(self, obj):
@@ -87,6 +123,28 @@ class GeodeticPointSerializer(GeoFeatureModelSerializer):
 
 
 
+class NearbyPointSerializer(serializers.ModelSerializer):
+    """Компактный сериализатор для поиска ближайших пунктов (с расстоянием в метрах)."""
+    latitude = serializers.FloatField(source='location.y', read_only=True)
+    longitude = serializers.FloatField(source='location.x', read_only=True)
+    distance_m = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = GeodeticPoint
+        fields = ('id', 'station_name', 'point_type', 'latitude', 'longitude', 'distance_m')
+
+
+class PointSearchResultSerializer(serializers.ModelSerializer):
+    """Результат нечеткого поиска пунктов (для подсказок при вводе)."""
+    latitude = serializers.FloatField(source='location.y', read_only=True)
+    longitude = serializers.FloatField(source='location.x', read_only=True)
+    aliases = serializers.SlugRelatedField(many=True, read_only=True, slug_field='alias')
+
+    class Meta:
+        model = GeodeticPoint
+        fields = ('id', 'station_name', 'point_type', 'index_name', 'mark_number', 'latitude', 'longitude', 'aliases')
+
+
 class StationDirectoryNameSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели StationDirectoryName (справочник имен станций).
@@ -103,10 +161,19 @@ class StationDirectoryNameSerializer(serializers.ModelSerializer):
         if len(name_stripped) > 255:
             raise serializers.ValidationError("Имя станции в справочнике слишком длинное (макс. 255 символов).")
         
-        queryset = StationDirectoryName.objects.filter(name__iexact=name_stripped)
+        # Сравнение через lower(name) попадает в функциональный уникальный индекс (iexact — нет)
+        queryset = StationDirectoryName.objects.alias(name_lower=Lower('name')).filter(name_lower=Lower(Value(name_stripped)))
         if self.instance:
             queryset = queryset.exclude(pk=self.instance.pk)
         if queryset.exists():
             raise serializers.ValidationError(f"Имя станции '{name_stripped}' уже существует в справочнике (без учета регистра).")
             
-        return name_stripped
\ No newline at end of file
+        return name_stripped
+
+
+class PointBulkUpdateItemSerializer(serializers.Serializer):
+    """Одна строка массового обновления пунктов (PATCH /api/points/bulk/)."""
+    id = serializers.CharField(max_length=50)
+    station_name = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
+    point_type = serializers.ChoiceField(choices=GeodeticPoint.POINT_TYPES, required=False)
+    network_class = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
@@ -0,0 +1,40 @@
+# geoclient/spatial.py
+
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import GeodeticPoint
+
+MAX_NEAREST_K = 100
+MAX_WITHIN_RESULTS = 5000
+
+# Выражения должны совпадать с индексом geopoint_location_geog_idx (миграция 0004),
+# иначе PostgreSQL не использует его для <-> и ST_DWithin.
+_LOCATION_GEOG = f'"{GeodeticPoint._meta.db_table}"."location"::geography'
+_TARGET_GEOG = 'ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography'
+
+
+def geography_distance(lon, lat):
+    """Расстояние до точки в метрах (по эллипсоиду)."""
+    return RawSQL(f'ST_Distance({_LOCATION_GEOG}, {_TARGET_GEOG})', (lon, lat), output_field=FloatField())
+
+
+def nearest_points(lon, lat, k=10):
+    """k ближайших пунктов: KNN-сортировка оператором <-> по GiST-индексу."""
+    knn_order = RawSQL(f'{_LOCATION_GEOG} <-> {_TARGET_GEOG}', (lon, lat), output_field=FloatField())
+    return (
+        GeodeticPoint.objects.only('id', 'station_name', 'point_type', 'location')
+        .annotate(distance_m=geography_distance(lon, lat))
+        .order_by(knn_order)[:k]
+    )
+
+
+def points_within(lon, lat, radius_m, limit=MAX_WITHIN_RESULTS):
+    """Пункты в радиусе radius_m метров, от ближних к дальним."""
+    within = RawSQL(f'ST_DWithin({_LOCATION_GEOG}, {_TARGET_GEOG}, %s)', (lon, lat, radius_m), output_field=BooleanField())
+    return (
+        GeodeticPoint.objects.only('id', 'station_name', 'point_type', 'location')
+        .filter(within)
+        .annotate(distance_m=geography_distance(lon, lat))
+        .order_by('distance_m')[:limit]
+    )
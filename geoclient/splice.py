@@ -0,0 +1,274 @@
+# geoclient/splice.py
+"""
+Склейка сессий: несколько O-файлов одного пункта (например, часовые файлы приемника)
+сливаются в один упорядоченный по времени RINEX-файл.
+
+Потоки эпох всех файлов объединяются k-путевым слиянием (heapq.merge): в памяти —
+по одной эпохе на файл, тело пишется во временный файл. Перекрытия разрешаются
+в пользу более раннего файла: эпоха, время которой уже записано, пропускается.
+Если наборы типов наблюдений различаются, записи переставляются под объединенный список.
+Результат регистрируется новым комплектом с одним наблюдением вместо исходных.
+"""
+
+import heapq
+import shutil
+import tempfile
+import uuid
+from contextlib import ExitStack
+
+from django.core.files import File
+from django.db import transaction
+
+from .models import Observation, UploadedRinexFile, split_rinex_name
+from .rinex_filter import (
+    V2_FIELDS_PER_LINE, V2_SATS_PER_LINE, epoch_records, filtered_name,
+    format_header_line, format_time_line, header_label, read_header_lines,
+)
+from .rinex_io import open_rinex_input
+from .rinex_obs import DATA_EPOCH_FLAGS, FIELD_WIDTH, SAT_WIDTH, read_obs_header
+from .statistics import refresh_point_statistics
+from .storage import hash_upload, open_rinex, store_rinex_upload
+
+ANTENNA_TOLERANCE = 0.001  # м
+V2_TYPES_PER_LINE = 9
+V3_TYPES_PER_LINE = 13
+_BLANK_FIELD = b' ' * FIELD_WIDTH
+# Строки заголовка, которые пересобираются или теряют смысл после склейки
+_REBUILT_LABELS = {
+    b'# / TYPES OF OBSERV', b'SYS / # / OBS TYPES', b'TIME OF FIRST OBS', b'TIME OF LAST OBS',
+    b'INTERVAL', b'# OF SATELLITES', b'PRN / # OF OBS', b'END OF HEADER',
+}
+
+
+class _Session:
+    """Открытый O-файл: строки заголовка, разобранный заголовок и итератор записей эпох."""
+    def __init__(self, stream):
+        lines = iter(stream)
+        self.header_lines, self.version, v2_types = read_header_lines(lines)
+        self.header = read_obs_header(iter(self.header_lines))
+        self.v2_lines_per_sat = -(-v2_types // V2_FIELDS_PER_LINE)
+        self.records = epoch_records(lines, self.version, v2_types)
+
+    def value(self, label, width=60):
+        for line in self.header_lines:
+            if header_label(line) == label:
+                return line[:width].decode('ascii', errors='replace').strip()
+        return None
+
+    def data_epochs(self, index):
+        """(момент, номер файла, строки эпохи) только для эпох с данными."""
+        for moment, flag, record in self.records:
+            if moment is None or flag not in DATA_EPOCH_FLAGS:
+                continue
+            if not record[-1].endswith(b'\n'):
+                record[-1] += b'\n'
+            yield moment, index, record
+
+
+def _check_compatible(sessions):
+    if len({session.version >= 3 for session in sessions}) > 1:
+        raise ValueError("Нельзя склеить файлы RINEX 2 и RINEX 3.")
+    deltas = []
+    for session in sessions:
+        text = session.value(b'ANTENNA: DELTA H/E/N', 42)
+        try:
+            deltas.append(tuple(float(v) for v in text.split()[:3]) if text else None)
+        except ValueError:
+            deltas.append(None)
+    known = [d for d in deltas if d]
+    if known and any(max(abs(a - b) for a, b in zip(d, known[0])) > ANTENNA_TOLERANCE for d in known):
+        raise ValueError("Высота или смещение антенны различаются между файлами — это разные установки.")
+
+
+def _merged_types(sessions):
+    merged = {}
+    for session in sessions:
+        for key, codes in session.header['obs_types'].items():
+            target = merged.setdefault(key, [])
+            target.extend(code for code in codes if code not in target)
+    return merged
+
+
+def _field_map(source, target):
+    """{система: индекс поля источника для каждого типа target или None}; None — перестановка не нужна."""
+    if all(source.get(key) == codes for key, codes in target.items()):
+        return None
+    return {
+        key: [codes.index(code) if code in codes else None for code in target[key]]
+        for key, codes in source.items()
+    }
+
+
+def _remap_fields(fields, mapping):
+    return [fields[i] if i is not None and i < len(fields) else _BLANK_FIELD for i in mapping]
+
+
+def _split_fields(data, count):
+    return [data[FIELD_WIDTH * i:FIELD_WIDTH * (i + 1)].ljust(FIELD_WIDTH) for i in range(count)]
+
+
+def _remap_v3(record, mapping, session):
+    out = [record[0]]
+    for line in record[1:]:
+        line = line.rstrip(b'\r\n')
+        fields_map = mapping.get(chr(line[0]))
+        if fields_map is None:
+            out.append(line + b'\n')  # система без типов в заголовке — строка остается как есть
+            continue
+        fields = _split_fields(line[SAT_WIDTH:], len(session.header['obs_types'][chr(line[0])]))
+        out.append((line[:SAT_WIDTH] + b''.join(_remap_fields(fields, fields_map))).rstrip() + b'\n')
+    return out
+
+
+def _remap_v2(record, mapping, session):
+    count = int(record[0][29:32] or 0)
+    head = 1 + (count - 1) // V2_SATS_PER_LINE
+    out = record[:head]
+    per_sat = session.v2_lines_per_sat
+    n_source = len(session.header['obs_types'][''])
+    for i in range(count):
+        rows = record[head + i * per_sat:head + (i + 1) * per_sat]
+        data = b''.join(row.rstrip(b'\r\n').ljust(V2_FIELDS_PER_LINE * FIELD_WIDTH) for row in rows)
+        fields = _remap_fields(_split_fields(data, n_source), mapping[''])
+        for j in range(0, len(fields), V2_FIELDS_PER_LINE):
+            out.append(b''.join(fields[j:j + V2_FIELDS_PER_LINE]).rstrip() + b'\n')
+    return out
+
+
+def _types_lines(types, v3):
+    if not v3:
+        codes = types.get('', [])
+        for i in range(0, max(len(codes), 1), V2_TYPES_PER_LINE):
+            head = f"{len(codes):6d}" if i == 0 else ' ' * 6
+            yield format_header_line(head + ''.join(f"{c:>6}" for c in codes[i:i + V2_TYPES_PER_LINE]), '# / TYPES OF OBSERV')
+        return
+    for system, codes in types.items():
+        for i in range(0, len(codes), V3_TYPES_PER_LINE):
+            head = f"{system}  {len(codes):3d}" if i == 0 else ' ' * 6
+            yield format_header_line(head + ''.join(f" {c}" for c in codes[i:i + V3_TYPES_PER_LINE]), 'SYS / # / OBS TYPES')
+
+
+def _comment(text):
+    return format_header_line(text.encode('ascii', errors='replace').decode()[:60], 'COMMENT')
+
+
+def _merged_header(sessions, names, types, first, last):
+    base = sessions[0]
+    time_system = 'GPS'
+    for line in base.header_lines:
+        if header_label(line) == b'TIME OF FIRST OBS':
+            time_system = line[48:51].decode('ascii', errors='ignore').strip() or time_system
+    out = [line.rstrip(b'\r\n') + b'\n' for line in base.header_lines if header_label(line) not in _REBUILT_LABELS]
+    out.append(_comment(f"SPLICED FROM {len(sessions)} FILES"))
+    out.extend(_comment(f"SOURCE {name}") for name in names)
+    receivers = list(dict.fromkeys(filter(None, (s.value(b'REC # / TYPE / VERS') for s in sessions))))
+    out.extend(_comment(f"RECEIVER {receiver}") for receiver in receivers[1:])
+    out.extend(_types_lines(types, base.version >= 3))
+    intervals = {s.header['interval'] for s in sessions}
+    if len(intervals) == 1 and None not in intervals:
+        out.append(format_header_line(f"{intervals.pop():10.3f}", 'INTERVAL'))
+    out.append(format_time_line(first, time_system, 'TIME OF FIRST OBS'))
+    out.append(format_time_line(last, time_system, 'TIME OF LAST OBS'))
+    out.append(format_header_line('', 'END OF HEADER'))
+    return b''.join(out)
+
+
+def splice_streams(streams, names, target):
+    """
+    Сливает бинарные потоки O-файлов (в порядке приоритета при перекрытиях) в бинарный файл target.
+    names — имена источников для COMMENT в заголовке.
+    Возвращает сводку: first, last (naive datetime), epochs — записано эпох, overlaps — пропущено.
+    """
+    sessions = [_Session(stream) for stream in streams]
+    _check_compatible(sessions)
+    types = _merged_types(sessions)
+    mappings = [_field_map(s.header['obs_types'], types) for s in sessions]
+    remap = _remap_v3 if sessions[0].version >= 3 else _remap_v2
+
+    first = last = None
+    epochs = overlaps = 0
+    with tempfile.TemporaryFile() as body:
+        merged = heapq.merge(*(session.data_epochs(i) for i, session in enumerate(sessions)), key=lambda item: item[:2])
+        for moment, index, record in merged:
+            if last is not None and moment <= last:
+                overlaps += 1
+                continue
+            if mappings[index] is not None:
+                record = remap(record, mappings[index], sessions[index])
+            body.writelines(record)
+            first = first or moment
+            last = moment
+            epochs += 1
+        if not epochs:
+            raise ValueError("В файлах нет эпох с наблюдениями.")
+
+        target.write(_merged_header(sessions, names, types, first, last))
+        body.seek(0)
+        shutil.copyfileobj(body, target)
+    return {'first': first, 'last': last, 'epochs': epochs, 'overlaps': overlaps}
+
+
+def splice_files(rinex_files, target):
+    """То же для хранимых UploadedRinexFile; все файлы открыты одновременно, читаются потоково."""
+    with ExitStack() as stack:
+        streams = [stack.enter_context(open_rinex_input(open_rinex(rf))) for rf in rinex_files]
+        return splice_streams(streams, [rf.download_name for rf in rinex_files], target)
+
+
+def spliced_name(first_name, last_name):
+    """Имя склейки: база первого и последнего файлов через дефис, расширение первого (без сжатия)."""
+    first, last = filtered_name(first_name), filtered_name(last_name)
+    first_parts, last_parts = split_rinex_name(first), split_rinex_name(last)
+    if not first_parts or not last_parts or first_parts[0] == last_parts[0]:
+        return first
+    return f"{first_parts[0]}-{last_parts[0]}{first_parts[1]}"
+
+
+def splice_candidates(point, observation_ids=None, start=None, end=None):
+    """Наблюдения пункта с хранимыми O-файлами, отобранные по ID и/или интервалу времени."""
+    observations = Observation.objects.filter(point=point, source_file__file_type='o').exclude(
+        source_file__file=''
+    ).select_related('source_file').order_by('timestamp')
+    if observation_ids:
+        observations = observations.filter(pk__in=observation_ids)
+    if start:
+        observations = observations.filter(timestamp__gte=start)
+    if end:
+        observations = observations.filter(timestamp__lte=end)
+    return list(observations)
+
+
+def splice_observations(point, observations):
+    """
+    Склеивает O-файлы наблюдений пункта в новый комплект; исходные наблюдения заменяются
+    одним (длительность — от первой до последней эпохи), исходные файлы остаются
+    и ссылаются на склейку через spliced_into. Возвращает (новое наблюдение, сводку).
+    """
+    observations = sorted(observations, key=lambda obs: obs.timestamp)
+    files = [obs.source_file for obs in observations]
+    if len(files) < 2:
+        raise ValueError("Для склейки нужно хотя бы два O-файла.")
+    name = spliced_name(files[0].download_name, files[-1].download_name)
+
+    with tempfile.NamedTemporaryFile() as tmp:
+        summary = splice_files(files, tmp)
+        tmp.flush()
+        content = File(tmp, name=name)
+        file_hash = hash_upload(content)
+        with transaction.atomic():
+            new_file = store_rinex_upload(
+                content, file_hash, file_type='o', upload_group=uuid.uuid4(),
+                remarks=f"Склейка {len(files)} файлов: эпох {summary['epochs']}, перекрытий пропущено {summary['overlaps']}.",
+            )
+            UploadedRinexFile.objects.filter(pk__in=[f.pk for f in files]).update(spliced_into=new_file)
+            base = observations[0]
+            Observation.objects.filter(pk__in=[obs.pk for obs in observations]).delete()
+            observation = Observation.objects.create(
+                point=point, location=base.location, timestamp=summary['first'],
+                duration=summary['last'] - summary['first'], source_file=new_file,
+                raw_x=base.raw_x, raw_y=base.raw_y, raw_z=base.raw_z,
+                ellipsoidal_height=base.ellipsoidal_height,
+                receiver_number=base.receiver_number, antenna_height=base.antenna_height,
+            )
+            refresh_point_statistics([point.pk])
+    return observation, summary
@@ -0,0 +1,206 @@
+# geoclient/spp.py
+"""
+Абсолютное кодовое позиционирование (SPP) по псевдодальностям O-файла и бортовым
+эфемеридам N/G файлов того же комплекта. Используется, чтобы проверить
+APPROX POSITION XYZ из заголовка до поиска близких пунктов: приемники нередко
+пишут туда нули или координаты прошлой стоянки.
+
+Все эпохи решаются одновременно: нормальные уравнения собираются для каждой
+эпохи суммированием по ее записям (np.add.reduceat) и решаются пакетно.
+Точность (метры) — одночастотная, без ионосферной поправки; для проверки заголовка
+с порогом в десятки метров этого достаточно.
+"""
+
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+
+from .ephemeris import load_ephemerides
+from .models import UploadedRinexFile
+from .orbits import GPS_OMEGA_E, positions_at
+from .rinex_io import open_rinex_input
+from .rinex_nav import EPHEMERIS_DTYPES, deduplicate, parse_navigation
+from .rinex_obs import read_observations
+from .storage import open_rinex
+from .timeseries import ecef_to_geodetic, enu_rotation
+
+logger = logging.getLogger(__name__)
+
+SPEED_OF_LIGHT = 299792458.0
+
+# Кодовые измерения по убыванию предпочтения (RINEX 3 и RINEX 2)
+CODE_PREFERENCE = {
+    'G': ('C1C', 'C1W', 'C1P', 'C1', 'P1'),
+    'R': ('C1C', 'C1P', 'C1', 'P1'),
+}
+SPP_MAX_EPOCHS = 120
+SPP_ITERATIONS = 10
+ELEVATION_MASK = 10.0
+MASK_FROM_ITERATION = 4  # маска и тропосфера — когда решение уже у поверхности Земли
+TROPO_ZENITH_DELAY = 2.3  # м
+MAX_EPOCH_RMS = 50.0  # м
+MIN_GOOD_EPOCHS = 3
+DEFAULT_TOLERANCE = 30.0  # м
+
+
+def group_ephemerides(rinex_file, start, end):
+    """
+    Эфемериды из N/G файлов того же комплекта; если их нет — из суточных наборов NavigationDay.
+    """
+    by_system = {}
+    nav_files = UploadedRinexFile.objects.filter(
+        upload_group=rinex_file.upload_group, file_type__in=['n', 'g']
+    ).exclude(file='') if rinex_file.upload_group else UploadedRinexFile.objects.none()
+    for nav_file in nav_files:
+        try:
+            with open_rinex_input(open_rinex(nav_file)) as stream:
+                for system, array in parse_navigation(stream).items():
+                    by_system.setdefault(system, []).append(array)
+        except (OSError, ValueError) as e:
+            logger.warning("Файл навигации %s не прочитан: %s", nav_file.pk, e)
+    if by_system:
+        return {system: deduplicate(system, np.concatenate(parts)) for system, parts in by_system.items()}
+    return {system: load_ephemerides(system, start, end) for system in EPHEMERIS_DTYPES}
+
+
+def _pseudoranges(data):
+    """Псевдодальность каждой записи по первому доступному коду из CODE_PREFERENCE (иначе NaN)."""
+    ranges = np.full(len(data.prn), np.nan)
+    for system, codes in CODE_PREFERENCE.items():
+        rows = data.system == ord(system)
+        for code in codes:
+            if code in data.types:
+                values = data.column(code)
+                fill = rows & np.isnan(ranges) & (values > 0)
+                ranges[fill] = values[fill]
+    return ranges
+
+
+def solve_epochs(data, ephemerides):
+    """
+    Решения по эпохам: (n_epochs, 3) ECEF и СКО невязок (NaN, где эпоха не решилась).
+    Неизвестные эпохи — координаты и поправка часов приемника для каждой системы.
+    """
+    n_epochs = len(data.times)
+    positions = np.full((n_epochs, 3), np.nan)
+    rms = np.full(n_epochs, np.nan)
+
+    ranges = _pseudoranges(data)
+    systems = [s for s in sorted(CODE_PREFERENCE) if len(ephemerides.get(s, ()))]
+    keep = np.isfinite(ranges) & np.isin(data.system, [ord(s) for s in systems])
+    epoch, system, prn, ranges = data.epoch[keep], data.system[keep], data.prn[keep], ranges[keep]
+    if not len(epoch):
+        return positions, rms
+
+    # Положение спутника на момент излучения; ECEF поворачивается на угол вращения Земли за время пути
+    rx_times = data.times[epoch]
+    travel = ranges / SPEED_OF_LIGHT
+    sat_xyz = np.full((len(epoch), 3), np.nan)
+    sat_clock = np.full(len(epoch), np.nan)
+    for s in systems:
+        rows = system == ord(s)
+        _, clock = positions_at(s, ephemerides[s], prn[rows], rx_times[rows], -travel[rows])
+        xyz, clock = positions_at(s, ephemerides[s], prn[rows], rx_times[rows], -travel[rows] - np.nan_to_num(clock))
+        sat_xyz[rows], sat_clock[rows] = xyz, clock
+    theta = GPS_OMEGA_E * travel
+    sat_xyz = np.column_stack([
+        np.cos(theta) * sat_xyz[:, 0] + np.sin(theta) * sat_xyz[:, 1],
+        -np.sin(theta) * sat_xyz[:, 0] + np.cos(theta) * sat_xyz[:, 1],
+        sat_xyz[:, 2],
+    ])
+
+    usable = np.isfinite(sat_xyz).all(axis=1)
+    epoch, system, ranges = epoch[usable], system[usable], ranges[usable]
+    sat_xyz, sat_clock = sat_xyz[usable], sat_clock[usable]
+    if not len(epoch):
+        return positions, rms
+    corrected = ranges + SPEED_OF_LIGHT * sat_clock
+
+    n_unknowns = 3 + len(systems)
+    clock_column = 3 + np.searchsorted([ord(s) for s in systems], system)
+    epochs_used, starts = np.unique(epoch, return_index=True)
+    state = np.zeros((len(epochs_used), n_unknowns))
+    slot = np.searchsorted(epochs_used, epoch)
+
+    for iteration in range(SPP_ITERATIONS):
+        receiver = state[slot, :3]
+        los = sat_xyz - receiver
+        distance = np.linalg.norm(los, axis=1)
+        weight = np.ones(len(epoch))
+        tropo = np.zeros(len(epoch))
+        if iteration >= MASK_FROM_ITERATION:
+            center = np.median(state[:, :3], axis=0)
+            lat, lon, _ = ecef_to_geodetic(center[np.newaxis, :])
+            up = los @ enu_rotation(lat[0], lon[0])[2] / distance
+            elevation = np.degrees(np.arcsin(np.clip(up, -1, 1)))
+            weight = (elevation >= ELEVATION_MASK).astype(float)
+            tropo = TROPO_ZENITH_DELAY / np.maximum(np.sin(np.radians(elevation)), np.sin(np.radians(ELEVATION_MASK)))
+
+        design = np.zeros((len(epoch), n_unknowns))
+        design[:, :3] = -los / distance[:, np.newaxis]
+        design[np.arange(len(epoch)), clock_column] = 1.0
+        residual = corrected - (distance + state[slot, clock_column] + tropo)
+
+        normal = np.add.reduceat(design[:, :, np.newaxis] * design[:, np.newaxis, :] * weight[:, None, None], starts)
+        rhs = np.add.reduceat(design * (weight * residual)[:, np.newaxis], starts)
+        # Система без измерений в эпоху: фиксируем ее часы единицей на диагонали
+        idle = np.diagonal(normal, axis1=1, axis2=2)[:, 3:] == 0
+        for i in range(len(systems)):
+            normal[idle[:, i], 3 + i, 3 + i] = 1.0
+        count = np.add.reduceat(weight, starts)
+        solvable = (count >= 3 + (~idle).sum(axis=1)) & (np.linalg.matrix_rank(normal) == n_unknowns)
+        if not solvable.any():
+            return positions, rms
+        state[solvable] += np.linalg.solve(normal[solvable], rhs[solvable][..., np.newaxis])[..., 0]
+
+    squared = np.add.reduceat(weight * residual ** 2, starts)
+    dof = count - (3 + (~idle).sum(axis=1))
+    epoch_rms = np.sqrt(np.where(dof > 0, squared / np.maximum(dof, 1), np.nan))
+    positions[epochs_used[solvable]] = state[solvable, :3]
+    rms[epochs_used[solvable]] = epoch_rms[solvable]
+    return positions, rms
+
+
+def estimate_position(data, ephemerides):
+    """Медиана решений хороших эпох или None, если решить не удалось."""
+    positions, rms = solve_epochs(data, ephemerides)
+    good = np.isfinite(rms) & (rms <= MAX_EPOCH_RMS)
+    if good.sum() < MIN_GOOD_EPOCHS:
+        return None
+    xyz = np.median(positions[good], axis=0)
+    spread = np.median(np.linalg.norm(positions[good] - xyz, axis=1))
+    return {
+        'xyz': xyz.tolist(),
+        'epochs': int(good.sum()),
+        'rms': round(float(np.median(rms[good])), 2),
+        'spread': round(float(spread), 2),
+    }
+
+
+def check_approx_position(rinex_file, approx_xyz, start=None):
+    """
+    Решает SPP по первым эпохам файла и сравнивает с APPROX POSITION XYZ.
+    Возвращает (решение SPP или None, отклонение заголовка в метрах или None, превышен ли порог).
+    Пустые или нулевые координаты заголовка считаются превышением.
+    """
+    try:
+        with open_rinex_input(open_rinex(rinex_file)) as stream:
+            data = read_observations(stream, types=lambda code: code[0] in 'CP', max_epochs=SPP_MAX_EPOCHS)
+        if not len(data.times):
+            return None, None, False
+        first = data.times[0].astype('datetime64[s]').item()
+        start = start or first
+        solution = estimate_position(data, group_ephemerides(rinex_file, start, start + timedelta(days=1)))
+    except (OSError, ValueError) as e:
+        logger.warning("SPP для файла %s не выполнен: %s", rinex_file.pk, e)
+        return None, None, False
+    if solution is None:
+        return None, None, False
+
+    tolerance = getattr(settings, 'GEOCLIENT_APPROX_POSITION_TOLERANCE', DEFAULT_TOLERANCE)
+    if not approx_xyz or not any(approx_xyz):
+        return solution, None, True
+    deviation = float(np.linalg.norm(np.asarray(approx_xyz, dtype=float) - solution['xyz']))
+    return solution, round(deviation, 2), deviation > tolerance
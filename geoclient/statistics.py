@@ -0,0 +1,42 @@
+# geoclient/statistics.py
+
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from .models import GeodeticPoint, Observation, PointStatistics
+
+# Один INSERT ... SELECT ... ON CONFLICT: сводка считается в БД, без выборки наблюдений в Python.
+# LEFT JOIN дает строку с нулями и пунктам, у которых наблюдений не осталось.
+_UPSERT_SQL = f"""
+    INSERT INTO {PointStatistics._meta.db_table}
+        (point_id, observation_count, first_observation, last_observation,
+         total_duration, receiver_count, updated_at)
+    SELECT p.id, COUNT(o.id), MIN(o."timestamp"), MAX(o."timestamp"),
+           SUM(o.duration), COUNT(DISTINCT o.receiver_number), NOW()
+    FROM {GeodeticPoint._meta.db_table} p
+    LEFT JOIN {Observation._meta.db_table} o ON o.point_id = p.id
+    {{where}}
+    GROUP BY p.id
+    ON CONFLICT (point_id) DO UPDATE SET
+        observation_count = EXCLUDED.observation_count,
+        first_observation = EXCLUDED.first_observation,
+        last_observation = EXCLUDED.last_observation,
+        total_duration = EXCLUDED.total_duration,
+        receiver_count = EXCLUDED.receiver_count,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def refresh_point_statistics(point_ids, using=DEFAULT_DB_ALIAS):
+    """Пересчитывает сводку только для указанных пунктов (индекс по point_id, без полного прохода)."""
+    point_ids = list(point_ids)
+    if not point_ids:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(_UPSERT_SQL.format(where='WHERE p.id = ANY(%s)'), [point_ids])
+
+
+def rebuild_point_statistics(using=DEFAULT_DB_ALIAS):
+    """Полный пересчет сводки по всем пунктам. Возвращает число строк."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(_UPSERT_SQL.format(where=''))
+        return cursor.rowcount
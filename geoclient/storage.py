@@ -0,0 +1,195 @@
+# geoclient/storage.py
+
+import gzip
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from .models import RinexBlob, UploadedRinexFile, logical_rinex_name, rinex_blob_path, rinex_file_path
+
+# 'legacy' — файлы по папкам станций (rinex_file_path);
+# 'cas'    — контентно-адресуемые блобы blobs/ab/cd/<sha256> с подсчетом ссылок.
+STORAGE_LAYOUT_LEGACY = 'legacy'
+STORAGE_LAYOUT_CAS = 'cas'
+
+# Сжатие при хранении: суффикс пути определяет, как читать файл.
+# file_hash и блобы всегда считаются по несжатому содержимому.
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSION_SUFFIXES = {COMPRESSION_GZIP: '.gz', COMPRESSION_ZSTD: '.zst'}
+CONTENT_ENCODINGS = {COMPRESSION_GZIP: 'gzip', COMPRESSION_ZSTD: 'zstd'}
+
+# Уже сжатые загрузки (Unix compress), которые не имеет смысла сжимать повторно
+ALREADY_COMPRESSED_SUFFIXES = ('.z',)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def storage_layout():
+    return getattr(settings, 'RINEX_STORAGE_LAYOUT', STORAGE_LAYOUT_LEGACY)
+
+
+def storage_compression():
+    method = getattr(settings, 'RINEX_STORAGE_COMPRESSION', '') or None
+    if method and method not in COMPRESSION_SUFFIXES:
+        raise ImproperlyConfigured(f"Неизвестный RINEX_STORAGE_COMPRESSION: {method}")
+    return method
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImproperlyConfigured("Для сжатия zstd установите пакет 'zstandard'.")
+    return zstandard
+
+
+def compression_of(name):
+    """Метод сжатия хранимого файла по суффиксу пути (None — без сжатия)."""
+    name = (name or '').lower()
+    for method, suffix in COMPRESSION_SUFFIXES.items():
+        if name.endswith(suffix):
+            return method
+    return None
+
+
+def _decompressing_reader(raw, method):
+    if method == COMPRESSION_GZIP:
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    return _zstd().ZstdDecompressor().stream_reader(raw, closefd=False)
+
+
+def open_stored(path):
+    """Открывает файл хранилища (абсолютный путь) на чтение с потоковой распаковкой."""
+    method = compression_of(path)
+    if method == COMPRESSION_GZIP:
+        return gzip.open(path, 'rb')
+    if method == COMPRESSION_ZSTD:
+        return _zstd().ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def open_rinex(rinex_file):
+    """Несжатое содержимое UploadedRinexFile как бинарный поток."""
+    return open_stored(rinex_file.file.path)
+
+
+def iter_rinex_chunks(rinex_file, chunk_size=CHUNK_SIZE):
+    """Несжатое содержимое блоками; файл закрывается по окончании (или при закрытии генератора)."""
+    with open_rinex(rinex_file) as f:
+        yield from iter(lambda: f.read(chunk_size), b'')
+
+
+def _iter_chunks(content):
+    if hasattr(content, 'chunks'):
+        yield from content.chunks(CHUNK_SIZE)
+        return
+    while True:
+        chunk = content.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _compressing_writer(raw, method, level=None):
+    if method == COMPRESSION_GZIP:
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level or 6, mtime=0)
+    return _zstd().ZstdCompressor(level=level or 3).stream_writer(raw, closefd=False)
+
+
+def write_compressed(content, target_path, method, level=None):
+    """
+    Потоково сжимает content в target_path (через временный .part и os.replace).
+    Возвращает размер сжатого файла.
+    """
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    tmp_path = target_path + '.part'
+    with open(tmp_path, 'wb') as raw:
+        writer = _compressing_writer(raw, method, level)
+        for chunk in _iter_chunks(content):
+            writer.write(chunk)
+        writer.close()
+    os.replace(tmp_path, target_path)
+    return os.path.getsize(target_path)
+
+
+def hash_upload(file_obj):
+    """
+    SHA-256 логического содержимого загруженного файла. Загрузки .gz/.zst хранятся
+    как есть (это и есть сжатие при хранении), поэтому хэш считается по распакованным данным.
+    """
+    sha256 = hashlib.sha256()
+    method = compression_of(file_obj.name)
+    if method:
+        file_obj.seek(0)
+        for chunk in _iter_chunks(_decompressing_reader(file_obj, method)):
+            sha256.update(chunk)
+    else:
+        for chunk in file_obj.chunks():
+            sha256.update(chunk)
+    file_obj.seek(0)
+    return sha256.hexdigest()
+
+
+def save_content(content, name):
+    """Сохраняет файл в хранилище с учетом RINEX_STORAGE_COMPRESSION. Возвращает имя в хранилище."""
+    source_name = (getattr(content, 'name', '') or '').lower()
+    uploaded_method = compression_of(source_name)
+    if uploaded_method:
+        # Загружен уже сжатым — сохраняется без пересжатия, с суффиксом своего метода
+        if compression_of(name) != uploaded_method:
+            name += COMPRESSION_SUFFIXES[uploaded_method]
+        return default_storage.save(name, content)
+    method = storage_compression()
+    if not method or source_name.endswith(ALREADY_COMPRESSED_SUFFIXES):
+        return default_storage.save(name, content)
+    name = default_storage.get_available_name(name + COMPRESSION_SUFFIXES[method])
+    write_compressed(content, default_storage.path(name), method)
+    return name
+
+
+def acquire_blob(content, sha256, size=None):
+    """
+    Возвращает блоб с данным хэшем, увеличив его ref_count.
+    content — файл (Django File/UploadedFile) или путь к уже лежащему в хранилище файлу,
+    который нужно перенести в блоб. Содержимое записывается, только если блоба еще нет.
+    """
+    with transaction.atomic():
+        # Строка создается заранее (INSERT ... ON CONFLICT DO NOTHING), чтобы ее было что блокировать:
+        # параллельная загрузка того же содержимого ждет здесь фиксации первой, а не падает на IntegrityError
+        RinexBlob.objects.bulk_create([RinexBlob(sha256=sha256, file='')], ignore_conflicts=True)
+        blob = RinexBlob.objects.select_for_update().get(pk=sha256)
+        if not blob.file.name or not default_storage.exists(blob.file.name):
+            if isinstance(content, str):
+                name = rinex_blob_path(sha256) + COMPRESSION_SUFFIXES.get(compression_of(content), '')
+                target = default_storage.path(name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(default_storage.path(content), target)
+            else:
+                name = save_content(content, rinex_blob_path(sha256))
+            blob.file.name = name
+            blob.size = size if size is not None else default_storage.size(name)
+            blob.save(update_fields=['file', 'size'])
+        RinexBlob.objects.filter(pk=sha256).update(ref_count=F('ref_count') + 1)
+    blob.refresh_from_db(fields=['ref_count'])
+    return blob
+
+
+def store_rinex_upload(file_obj, file_hash, **fields):
+    """
+    Создает UploadedRinexFile в текущей схеме хранения.
+    В режиме 'cas' одинаковое содержимое хранится на диске один раз.
+    """
+    original_name = logical_rinex_name(file_obj.name)
+    if storage_layout() == STORAGE_LAYOUT_CAS:
+        blob = acquire_blob(file_obj, file_hash, size=file_obj.size)
+        return UploadedRinexFile.objects.create(
+            file=blob.file.name, blob=blob, original_name=original_name, file_hash=file_hash, **fields
+        )
+    name = save_content(file_obj, rinex_file_path(None, file_obj.name))
+    return UploadedRinexFile.objects.create(file=name, original_name=original_name, file_hash=file_hash, **fields)
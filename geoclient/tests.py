@@ -1,3 +1,693 @@
-from django.test import TestCase
+import gzip
+import io
+import random
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import Group, User
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.parsers import FormParser, JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .api import ObservationViewSet, UserStatusView, _read_bulk_names
+from .authentication import _cache_key, clear_local_tokens
+from .benchmarks.synthetic import nav_lines
+from .export import gzip_chunks, iter_csv, iter_kml
+from .kml_import import create_import_job, fail_stale_job, iter_placemarks, open_kml, parse_description
+from .models import (
+    GeodeticPoint, KmlImportJob, Observation, PendingFileCleanup, RinexBlob, UploadedRinexFile,
+    rinex_file_type, split_rinex_name,
+)
+from .orbits import GPS_OMEGA_E, dilution_of_precision, geodetic_to_ecef, positions_at
+from .parsers import manual_parse_rinex_header, parse_rinex_obs_file
+from .partitions import DEFAULT_PARTITION, OBSERVATION_TABLE, create_observation_partitions
+from .permissions import IsUploader, CanDownloadOrView
+from .qc import compute_qc
+from .rinex_filter import filtered_name, iter_filtered_observations
+from .rinex_header import parse_header_bytes
+from .rinex_io import open_rinex_input
+from .rinex_nav import GPS_EPHEMERIS_DTYPE, parse_navigation
+from .rinex_obs import ObservationData, read_observations
+from .roles import clear_local_roles, get_user_roles
+from .splice import splice_candidates, splice_observations, splice_streams, spliced_name
+from .statistics import refresh_point_statistics
+from .spp import SPEED_OF_LIGHT, estimate_position
+from .timeseries import compute_timeseries, ecef_to_geodetic, enu_rotation
+
+
+class RoleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_roles()
+        self.uploader_group, _ = Group.objects.get_or_create(name='Uploader')
+        self.viewer_group, _ = Group.objects.get_or_create(name='Viewer')
+        self.user = User.objects.create_user('surveyor', password='x')
+        self.user.groups.add(self.uploader_group)
+
+    def _request(self):
+        # Свежий объект пользователя, как в новом запросе
+        return SimpleNamespace(user=User.objects.get(pk=self.user.pk))
+
+    def test_permissions_make_no_queries_on_warm_cache(self):
+        get_user_roles(self._request().user)
+        request = self._request()
+        with self.assertNumQueries(0):
+            self.assertTrue(IsUploader().has_permission(request, None))
+            self.assertTrue(CanDownloadOrView().has_permission(request, None))
+
+    def test_shared_cache_survives_local_reset(self):
+        get_user_roles(self._request().user)
+        clear_local_roles()
+        request = self._request()
+        with self.assertNumQueries(0):
+            self.assertTrue(CanDownloadOrView().has_permission(request, None))
+
+    def test_group_change_invalidates_cache(self):
+        self.assertTrue(IsUploader().has_permission(self._request(), None))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.uploader_group)
+            self.user.groups.add(self.viewer_group)
+        request = self._request()
+        self.assertFalse(IsUploader().has_permission(request, None))
+        self.assertTrue(CanDownloadOrView().has_permission(request, None))
+
+    def test_invalidation_waits_for_commit(self):
+        self.assertTrue(IsUploader().has_permission(self._request(), None))
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.user.groups.remove(self.uploader_group)
+        # До фиксации транзакции кэш не сбрасывается
+        self.assertTrue(IsUploader().has_permission(self._request(), None))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(IsUploader().has_permission(self._request(), None))
+
+    def test_reverse_clear_invalidates_cache(self):
+        self.assertTrue(IsUploader().has_permission(self._request(), None))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.uploader_group.user_set.clear()
+        self.assertFalse(IsUploader().has_permission(self._request(), None))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_roles()
+        clear_local_tokens()
+        self.user = User.objects.create_user('surveyor', password='x')
+        self.user.groups.add(Group.objects.get_or_create(name='Viewer')[0])
+        self.token = Token.objects.create(user=self.user)
+        self.factory = APIRequestFactory()
+        self.view = UserStatusView.as_view()
+
+    def _get(self):
+        return self.view(self.factory.get('/api/user-status/', HTTP_AUTHORIZATION=f'Token {self.token.key}'))
+
+    def test_warm_cache_makes_no_queries(self):
+        self.assertEqual(self._get().status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get().status_code, 200)
+
+    def test_cache_holds_no_password_hash(self):
+        self._get()
+        cached = cache.get(_cache_key(self.token.key))
+        self.assertEqual(cached['username'], 'surveyor')
+        self.assertNotIn('password', cached)
+        self.assertNotIn(self.user.password, repr(cached))
+
+    def test_deactivation_invalidates_cache(self):
+        self._get()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._get().status_code, 401)
+
+    def test_deleted_token_is_rejected(self):
+        self._get()
+        self.token.delete()
+        self.assertEqual(self._get().status_code, 401)
+
+
+class BulkNamesTests(SimpleTestCase):
+    def _names(self, data, **kwargs):
+        request = Request(APIRequestFactory().post('/', data, **kwargs), parsers=[JSONParser(), FormParser()])
+        return [n.strip() for n in _read_bulk_names(request)]
+
+    def test_string_is_split_into_names(self):
+        self.assertEqual(self._names({'names': 'TATA, SANG\nKGTS'}, format='json'), ['TATA', 'SANG', 'KGTS'])
+        form = self._names('names=TATA%2CSANG&names=KGTS', content_type='application/x-www-form-urlencoded')
+        self.assertEqual(form, ['TATA', 'SANG', 'KGTS'])
+
+    def test_list_items_are_kept_whole(self):
+        self.assertEqual(self._names(['TATA', {'name': 'SANG'}], format='json'), ['TATA', 'SANG'])
+
+    def test_non_list_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self._names({'names': {'TATA': 1}}, format='json')
+
+
+RINEX_HEADER = [
+    '     2.11           OBSERVATION DATA    M (MIXED)           RINEX VERSION / TYPE',
+    'TATA                                                        MARKER NAME',
+    '     2    C1    L1                                          # / TYPES OF OBSERV',
+    '                                                            END OF HEADER',
+]
+
+CRX_SAMPLE = '\n'.join([
+    '1.0                 COMPACT RINEX FORMAT                    CRINEX VERS   / TYPE',
+    'RNX2CRX ver.4.0.7                       28-Dec-21 00:13     CRINEX PROG / DATE',
+    *RINEX_HEADER,
+    '&21 12 27  0  0  0.0000000  0  2G01G05',
+    '',
+    '3&20000000125 3&105100000500    7',
+    '3&21000000000 3&-1234567   17',
+    '                3',
+    '',
+    '100125 525250 ',
+    '50500 34567   &',
+    '              1 &              1  5',
+    '',
+    '0 65308 ',
+]) + '\n'
+
+RNX_SAMPLE = '\n'.join([
+    *RINEX_HEADER,
+    ' 21 12 27  0  0  0.0000000  0  2G01G05',
+    '  20000000.125   105100000.500 7',
+    '  21000000.000       -1234.56717',
+    ' 21 12 27  0  0 30.0000000  0  2G01G05',
+    '  20000100.250   105100525.750 7',
+    '  21000050.500       -1200.000 7',
+    ' 21 12 27  0  1  0.0000000  0  1G05',
+    '  21000101.000       -1100.125 7',
+]) + '\n'
+
+
+class RinexInputTests(SimpleTestCase):
+    def test_names(self):
+        self.assertEqual(split_rinex_name('TATA1230.20d.Z'), ('TATA1230', '.20d', '.Z'))
+        self.assertEqual(split_rinex_name('ABCD00RUS_R_20231230000_01D_30S_MO.crx.gz'),
+                         ('ABCD00RUS_R_20231230000', '_01D_30S_MO.crx', '.gz'))
+        self.assertIsNone(split_rinex_name('notes.txt'))
+        self.assertEqual(rinex_file_type('TATA1230.20d.Z'), 'o')
+        self.assertEqual(rinex_file_type('ABCD00RUS_R_20231230000_01D_RN.rnx'), 'g')
+
+    def test_plain_rinex_passes_through(self):
+        self.assertEqual(open_rinex_input(io.BytesIO(RNX_SAMPLE.encode())).read().decode(), RNX_SAMPLE)
+
+    def test_hatanaka_gzip_is_restored(self):
+        stream = open_rinex_input(io.BytesIO(gzip.compress(CRX_SAMPLE.encode())))
+        self.assertEqual(stream.read().decode(), RNX_SAMPLE)
+
+    def test_hatanaka_blank_field_resets_lli(self):
+        # C1 с LLI=1, затем пропуск C1, затем новое значение без флага: старый LLI не должен вернуться
+        crx = '\n'.join([
+            *CRX_SAMPLE.splitlines()[:2 + len(RINEX_HEADER)],
+            '&21 12 27  0  0  0.0000000  0  1G01',
+            '',
+            '3&20000000125 3&105100000500 1',
+            '                3',
+            '',
+            ' 525250',
+            '              1 &',
+            '',
+            '3&20000100250 100000',
+        ]) + '\n'
+        expected = '\n'.join([
+            *RINEX_HEADER,
+            ' 21 12 27  0  0  0.0000000  0  1G01',
+            '  20000000.1251  105100000.500',
+            ' 21 12 27  0  0 30.0000000  0  1G01',
+            '                 105100525.750',
+            ' 21 12 27  0  1  0.0000000  0  1G01',
+            '  20000100.250   105101151.000',
+        ]) + '\n'
+        self.assertEqual(open_rinex_input(io.BytesIO(crx.encode())).read().decode(), expected)
+
+    def test_header_scanner_matches_manual_parser(self):
+        expected = manual_parse_rinex_header(open_rinex_input(io.BytesIO(RNX_SAMPLE.encode())))
+        self.assertEqual(expected['marker_name'], 'TATA')
+        self.assertEqual(parse_header_bytes(RNX_SAMPLE.encode()), expected)
+        self.assertEqual(parse_header_bytes(RNX_SAMPLE.replace('\n', '\r\n').encode()), expected)
+        # Заголовок Hatanaka содержит заголовок RINEX — сканируется без распаковки
+        self.assertEqual(parse_header_bytes(CRX_SAMPLE.encode()), expected)
+
+
+class RinexFilterTests(SimpleTestCase):
+    def _filtered(self, **options):
+        header_times = [
+            '    30.000                                                  INTERVAL',
+            '  2021    12    27     0     0    0.0000000     GPS         TIME OF FIRST OBS',
+            '  2021    12    27     0     1    0.0000000     GPS         TIME OF LAST OBS',
+        ]
+        source = RNX_SAMPLE.replace(RINEX_HEADER[-1], '\n'.join(header_times + [RINEX_HEADER[-1]]))
+        return b''.join(iter_filtered_observations(io.BytesIO(source.encode()), **options)).decode()
+
+    def test_decimation_rewrites_header(self):
+        text = self._filtered(interval=60)
+        self.assertIn('    60.000' + ' ' * 50 + 'INTERVAL', text)
+        self.assertIn('  2021    12    27     0     1    0.0000000     GPS         TIME OF LAST OBS', text)
+        self.assertNotIn(' 21 12 27  0  0 30.0000000', text)
+        self.assertEqual(read_observations(io.BytesIO(text.encode())).times.astype(str).tolist(),
+                         ['2021-12-27T00:00:00.000', '2021-12-27T00:01:00.000'])
+
+    def test_time_window(self):
+        text = self._filtered(start=datetime(2021, 12, 27, 0, 0, 15), end=datetime(2021, 12, 27, 0, 0, 45))
+        self.assertIn('  2021    12    27     0     0   30.0000000     GPS         TIME OF FIRST OBS', text)
+        self.assertIn('  2021    12    27     0     0   30.0000000     GPS         TIME OF LAST OBS', text)
+        self.assertEqual(len(read_observations(io.BytesIO(text.encode())).times), 1)
+
+    def test_time_window_with_offset(self):
+        # 03:00:15+03:00 — это 00:00:15 UTC; граница сравнивается в UTC, а не по местному времени
+        moscow = dt_timezone(timedelta(hours=3))
+        text = self._filtered(start=datetime(2021, 12, 27, 3, 0, 15, tzinfo=moscow),
+                              end=datetime(2021, 12, 27, 3, 0, 45, tzinfo=moscow))
+        self.assertEqual(read_observations(io.BytesIO(text.encode())).times.astype(str).tolist(),
+                         ['2021-12-27T00:00:30.000'])
+
+    def test_filtered_name(self):
+        self.assertEqual(filtered_name('TATA1230.20d.Z'), 'TATA1230.20o')
+        self.assertEqual(filtered_name('ABCD00RUS_R_20231230000_01D_30S_MO.crx.gz'),
+                         'ABCD00RUS_R_20231230000_01D_30S_MO.rnx')
+
+
+class SpliceTests(SimpleTestCase):
+    def test_merge_resolves_overlap_and_remaps_types(self):
+        later = '\n'.join([
+            RINEX_HEADER[0], RINEX_HEADER[1],
+            '     2    L1    C1                                          # / TYPES OF OBSERV',
+            RINEX_HEADER[-1],
+            ' 21 12 27  0  1  0.0000000  0  1G05',
+            '      -999.000        99999999.000',
+            ' 21 12 27  0  1 30.0000000  0  1G05',
+            '     -1000.5007   21000150.250',
+        ]) + '\n'
+        target = io.BytesIO()
+        summary = splice_streams([io.BytesIO(RNX_SAMPLE.encode()), io.BytesIO(later.encode())], ['A.21o', 'B.21o'], target)
+        self.assertEqual((summary['epochs'], summary['overlaps']), (4, 1))
+        self.assertEqual(summary['last'], datetime(2021, 12, 27, 0, 1, 30))
+
+        data = read_observations(io.BytesIO(target.getvalue()))
+        self.assertEqual(data.types, ['C1', 'L1'])
+        self.assertEqual(data.times.astype(str).tolist()[-2:], ['2021-12-27T00:01:00.000', '2021-12-27T00:01:30.000'])
+        # Перекрытие — из первого файла, последняя эпоха — из второго с переставленными типами
+        self.assertAlmostEqual(data.column('C1')[-2], 21000101.0)
+        self.assertAlmostEqual(data.column('C1')[-1], 21000150.25)
+        self.assertAlmostEqual(data.column('L1')[-1], -1000.5)
+        self.assertEqual(data.lli[-1].tolist(), [0, 7])
+
+    def test_spliced_name(self):
+        self.assertEqual(spliced_name('TATA361a.21o', 'TATA361x.21d.Z'), 'TATA361a-TATA361x.21o')
+
+
+class PointStatisticsTests(TestCase):
+    """Сводка PointStatistics обновляется загрузкой, объединением пунктов и склейкой."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media, RINEX_STORAGE_LAYOUT='legacy', RINEX_STORAGE_COMPRESSION='')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Без обращения к порталу ФППД и без SPP по эфемеридам
+        for target, value in (('geoclient.parsers._fetch_fppd_metadata', None),
+                              ('geoclient.parsers.check_approx_position', (None, None, False))):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _ingest(self, first_obs):
+        x, y, z = geodetic_to_ecef(55.75, 37.62, 150.0)
+        content = '\n'.join([
+            RINEX_HEADER[0], RINEX_HEADER[1],
+            f'{x:14.4f}{y:14.4f}{z:14.4f}'.ljust(60) + 'APPROX POSITION XYZ',
+            f'{first_obs:  %Y    %m    %d    %H    %M   %S.0000000}     GPS'.ljust(60) + 'TIME OF FIRST OBS',
+            *RINEX_HEADER[2:],
+        ]) + '\n'
+        rinex_file = UploadedRinexFile.objects.create(file=SimpleUploadedFile('TATA361a.21o', content.encode()), file_type='o')
+        return parse_rinex_obs_file(io.BytesIO(content.encode()), rinex_file)
+
+    def test_ingest_and_merge_refresh_statistics(self):
+        self.assertEqual(self._ingest(datetime(2021, 12, 27))[0], 1)
+        point = GeodeticPoint.objects.get(id='TATA')
+        self.assertEqual(point.statistics.observation_count, 1)
+
+        # Более поздний пункт в тех же координатах вливается в TATA при следующей загрузке
+        duplicate = GeodeticPoint.objects.create(id='DUPL', location=point.location)
+        Observation.objects.create(point=duplicate, location=point.location, timestamp=datetime(2021, 12, 20, tzinfo=dt_timezone.utc))
+        self.assertEqual(self._ingest(datetime(2021, 12, 28))[0], 1)
+
+        point.statistics.refresh_from_db()
+        self.assertFalse(GeodeticPoint.objects.filter(id='DUPL').exists())
+        self.assertEqual(point.statistics.observation_count, 3)
+        self.assertEqual(point.statistics.first_observation, datetime(2021, 12, 20, tzinfo=dt_timezone.utc))
+
+    def test_splice_refreshes_statistics(self):
+        point = GeodeticPoint.objects.create(id='TATA', location=Point(37.62, 55.75, srid=4326))
+        later = RNX_SAMPLE.replace(' 21 12 27  0', ' 21 12 27  1')
+        for name, content, hour in (('TATA361a.21o', RNX_SAMPLE, 0), ('TATA361b.21o', later, 1)):
+            rinex_file = UploadedRinexFile.objects.create(file=SimpleUploadedFile(name, content.encode()), file_type='o')
+            Observation.objects.create(point=point, location=point.location, source_file=rinex_file,
+                                       timestamp=datetime(2021, 12, 27, hour, tzinfo=dt_timezone.utc))
+        refresh_point_statistics([point.pk])
+
+        splice_observations(point, splice_candidates(point))
+        point.statistics.refresh_from_db()
+        self.assertEqual(point.statistics.observation_count, 1)
+        self.assertEqual(point.statistics.total_duration.total_seconds(), 3660)
+
+
+class ObservationPartitionTests(TestCase):
+    """Фильтры списка наблюдений и секции таблицы geoclient_observation (миграция 0009)."""
+
+    def setUp(self):
+        cache.clear()
+        clear_local_roles()
+        self.user = User.objects.create_user('surveyor', password='x')
+        self.user.groups.add(Group.objects.get_or_create(name='Viewer')[0])
+        # Секции создаются миграцией с текущего года; 1999 год попадает в DEFAULT
+        self.year = timezone.now().year
+        moscow = GeodeticPoint.objects.create(id='MOSK', location=Point(37.62, 55.75, srid=4326))
+        spb = GeodeticPoint.objects.create(id='SPBU', location=Point(30.3, 59.9, srid=4326))
+        self.this_year, self.next_year, self.outside = [
+            Observation.objects.create(point=point, location=point.location, receiver_number=receiver,
+                                       timestamp=datetime(year, 6, 1, tzinfo=dt_timezone.utc))
+            for point, receiver, year in ((moscow, 'R1', self.year), (spb, 'R2', self.year + 1), (moscow, 'R1', 1999))
+        ]
+
+    def _list(self, **params):
+        request = APIRequestFactory().get('/api/observations/', params)
+        force_authenticate(request, user=self.user)
+        return ObservationViewSet.as_view({'get': 'list'})(request)
+
+    def _ids(self, **params):
+        response = self._list(**params)
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.data['results']}
+
+    def _partition_of(self, observation):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM {OBSERVATION_TABLE} WHERE id = %s', [observation.pk])
+            return cursor.fetchone()[0]
+
+    def test_list_filters(self):
+        self.assertEqual(self._ids(), {self.this_year.pk, self.next_year.pk, self.outside.pk})
+        self.assertEqual(self._ids(bbox='37,55,38,56'), {self.this_year.pk, self.outside.pk})
+        self.assertEqual(self._ids(start=f'{self.year}-01-01', end=f'{self.year}-12-31'), {self.this_year.pk})
+        self.assertEqual(self._ids(end='2000-01-01'), {self.outside.pk})
+        self.assertEqual(self._ids(receiver='R2'), {self.next_year.pk})
+        self.assertEqual(self._ids(receiver='R1', start=f'{self.year}-01-01'), {self.this_year.pk})
+
+    def test_bad_parameters_return_400(self):
+        for params in ({'bbox': '37,55,38'}, {'bbox': 'a,b,c,d'}, {'start': 'вчера'}, {'end': '2021-13-01'}):
+            self.assertEqual(self._list(**params).status_code, 400, params)
+
+    def test_new_partition_takes_rows_from_default(self):
+        self.assertEqual(self._partition_of(self.this_year), f'{OBSERVATION_TABLE}_y{self.year}')
+        self.assertEqual(self._partition_of(self.next_year), f'{OBSERVATION_TABLE}_y{self.year + 1}')
+        self.assertEqual(self._partition_of(self.outside), DEFAULT_PARTITION)
+
+        self.assertEqual(create_observation_partitions(connection, 1999, 1999), [f'{OBSERVATION_TABLE}_y1999'])
+        self.assertEqual(self._partition_of(self.outside), f'{OBSERVATION_TABLE}_y1999')
+        self.assertEqual(self._ids(end='2000-01-01'), {self.outside.pk})
+        # Повторный вызов ничего не создает
+        self.assertEqual(create_observation_partitions(connection, 1999, 1999), [])
+
+
+KML_SAMPLE = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2"><Document><Folder>
+<Placemark><name> Пункт 1 </name><description>индекс: 1234, класс: ГГС 2, центр: 160 оп.з., номер марки: 77</description>
+<Point><coordinates>37.5,55.25,0 </coordinates></Point></Placemark>
+<Placemark><name>Без координат</name><Point><coordinates></coordinates></Point></Placemark>
+</Folder></Document></kml>"""
+
+
+class KmlImportTests(SimpleTestCase):
+    def test_parse_description(self):
+        self.assertEqual(parse_description('индекс: 1234, Класс: ГГС 2, центр: 160 оп.з.'), {
+            'index_name': '1234', 'network_class': 'ГГС 2', 'center_type': '160 оп.з.', 'mark_number': None,
+        })
+
+    def test_placemarks_from_kml_and_kmz(self):
+        kmz = io.BytesIO()
+        with zipfile.ZipFile(kmz, 'w') as archive:
+            archive.writestr('doc.kml', KML_SAMPLE)
+        for source in (io.BytesIO(KML_SAMPLE.encode()), kmz):
+            with open_kml(source) as stream:
+                placemarks = list(iter_placemarks(stream))
+            self.assertEqual(len(placemarks), 2)
+            self.assertEqual(placemarks[0][:3], ('Пункт 1', 37.5, 55.25))
+            self.assertIn('номер марки: 77', placemarks[0][3])
+            self.assertEqual(placemarks[1], ('Без координат', None, None, None))
+
+    def test_import_job_rejects_bad_upload(self):
+        # Проверка выполняется до сохранения файла и создания задания
+        with self.assertRaises(ValueError):
+            create_import_job(SimpleUploadedFile('points.txt', b''), 10)
+        for radius in ('abc', 0, 500):
+            with self.assertRaises(ValueError):
+                create_import_job(SimpleUploadedFile('points.kmz', b''), radius)
+
+
+class KmlImportJobTests(TestCase):
+    @override_settings(GEOCLIENT_KML_IMPORT_STALE_AFTER=600)
+    def test_stale_running_job_is_failed_on_read(self):
+        cache.clear()
+        now = timezone.now()
+        stale = KmlImportJob.objects.create(original_name='a.kml', radius=10, status=KmlImportJob.STATUS_RUNNING,
+                                            started_at=now - timedelta(hours=1))
+        fresh = KmlImportJob.objects.create(original_name='b.kml', radius=10, status=KmlImportJob.STATUS_RUNNING,
+                                            started_at=now - timedelta(minutes=1))
+        self.assertEqual(fail_stale_job(stale).status, KmlImportJob.STATUS_FAILED)
+        self.assertTrue(KmlImportJob.objects.get(pk=stale.pk).error)
+        self.assertEqual(fail_stale_job(fresh).status, KmlImportJob.STATUS_RUNNING)
+
+    @override_settings(GEOCLIENT_KML_IMPORT_STALE_AFTER=600)
+    def test_stale_pending_job_is_failed_on_read(self):
+        stale = KmlImportJob.objects.create(original_name='a.kml', radius=10)
+        KmlImportJob.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        stale.refresh_from_db()
+        fresh = KmlImportJob.objects.create(original_name='b.kml', radius=10)
+        self.assertEqual(fail_stale_job(stale).status, KmlImportJob.STATUS_FAILED)
+        self.assertEqual(fail_stale_job(fresh).status, KmlImportJob.STATUS_PENDING)
+
+
+class RinexBlobReleaseTests(TestCase):
+    def test_queryset_delete_releases_blobs(self):
+        shared = RinexBlob.objects.create(sha256='a' * 64, file='blobs/aa/aa/shared', ref_count=3)
+        single = RinexBlob.objects.create(sha256='b' * 64, file='blobs/bb/bb/single', ref_count=1)
+        for blob in (shared, shared, shared, single):
+            UploadedRinexFile.objects.create(file=blob.file.name, blob=blob, original_name='TATA1230.20o')
+        shared_pks = list(UploadedRinexFile.objects.filter(blob=shared).values_list('pk', flat=True))
+        with self.captureOnCommitCallbacks() as callbacks:
+            UploadedRinexFile.objects.filter(blob=single).delete()
+            UploadedRinexFile.objects.filter(pk__in=shared_pks[:2]).delete()
+        self.assertEqual(RinexBlob.objects.get(pk=shared.pk).ref_count, 1)
+        self.assertFalse(RinexBlob.objects.filter(pk=single.pk).exists())
+        # Файл удаляется очередью после фиксации, а не сразу
+        self.assertEqual(list(PendingFileCleanup.objects.values_list('path', flat=True)), ['blobs/bb/bb/single'])
+        self.assertEqual(len(callbacks), 1)
+
+
+class PointExportTests(SimpleTestCase):
+    ROWS = [
+        ('P1', 55.25, 37.5, 'ggs', 'Северный', 'ГГС 2', '1234', '160 оп.з.', '77', None,
+         3, datetime(2024, 5, 1, 12, 0), datetime(2024, 6, 1, 8, 30), 'Марка & тур'),
+        ('P2', 54.0, 38.0, 'unknown', None, None, None, None, None, None, None, None, None, None),
+        ('P3', 53.0, 39.0, 'survey', None, None, '5678', None, '12', None, None, None, None, 'Марка на стене'),
+    ]
+
+    def test_kml_round_trips_through_import_parser(self):
+        data = b''.join(s.encode() for s in iter_kml(iter(self.ROWS)))
+        placemarks = list(iter_placemarks(io.BytesIO(data)))
+        self.assertEqual([p[:3] for p in placemarks],
+                         [('Северный (P1)', 37.5, 55.25), ('P2', 38.0, 54.0), ('P3', 39.0, 53.0)])
+        self.assertEqual(parse_description(placemarks[0][3]), {
+            'index_name': '1234', 'network_class': 'ГГС 2', 'center_type': '160 оп.з.', 'mark_number': '77',
+        })
+        # Без наблюдений строка атрибутов заканчивается номером марки, дальше — текст описания
+        self.assertEqual(parse_description(placemarks[2][3]), {
+            'index_name': '5678', 'network_class': None, 'center_type': None, 'mark_number': '12',
+        })
+        self.assertIn('Марка & тур', placemarks[0][3])
+        self.assertIn(b'<styleUrl>#ggs</styleUrl>', data)
+        self.assertIn(b'<styleUrl>#default</styleUrl>', data)
+
+    def test_csv_is_gzipped_on_the_fly(self):
+        chunks = (s.encode() for s in iter_csv(iter(self.ROWS)))
+        text = gzip.decompress(b''.join(gzip_chunks(chunks))).decode()
+        lines = text.splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['name', 'latitude', 'longitude', 'code'])
+        self.assertTrue(lines[1].startswith('P1,55.25000000,37.50000000,ggs,Северный'))
+        self.assertTrue(lines[2].endswith(',0,,'))
+
+
+class QualityCheckTests(SimpleTestCase):
+    def test_body_is_decoded(self):
+        data = read_observations(io.BytesIO(RNX_SAMPLE.encode()))
+        self.assertEqual(data.types, ['C1', 'L1'])
+        self.assertEqual(len(data.times), 3)
+        self.assertEqual(data.epoch.tolist(), [0, 0, 1, 1, 2])
+        self.assertEqual(data.prn.tolist(), [1, 5, 1, 5, 5])
+        self.assertAlmostEqual(data.column('L1')[1], -1234.567)
+        self.assertEqual(data.lli[:, 1].tolist(), [0, 1, 0, 0, 0])
+
+    def test_cycle_slip_and_event_records_are_skipped(self):
+        # Флаг 6 — обычная раскладка эпохи (13 спутников: строка продолжения и строки данных),
+        # флаг 4 — count строк заголовка
+        lines = RNX_SAMPLE.splitlines()
+        sats = ''.join(f'G{prn:02d}' for prn in range(1, 14))
+        text = '\n'.join(lines[:-2] + [
+            ' 21 12 27  0  0 45.0000000  6 13' + sats[:36],
+            ' ' * 32 + sats[36:],
+            *['  20000100.250   105100525.750 7'] * 13,
+            '                            4  1',
+            'SLIP RECORDS ABOVE                                          COMMENT',
+        ] + lines[-2:]) + '\n'
+        data = read_observations(io.BytesIO(text.encode()))
+        self.assertEqual(len(data.times), 3)
+        self.assertEqual(data.prn.tolist(), [1, 5, 1, 5, 5])
+        self.assertAlmostEqual(data.column('C1')[-1], 21000101.0)
+
+    def test_summary(self):
+        summary = compute_qc(read_observations(io.BytesIO(RNX_SAMPLE.encode())))
+        self.assertEqual(summary['epochs'], 3)
+        self.assertEqual(summary['interval'], 30.0)
+        self.assertEqual(summary['gaps'], 0)
+        self.assertEqual(summary['systems']['G']['satellites'], 2)
+        self.assertEqual(summary['cycle_slips']['G']['lli'], 1)
+
+
+def _nav_record(prn, epoch, values):
+    """Запись RINEX 2 nav: номер, эпоха, значения D19.12 (3 в первой строке, далее по 4)."""
+    fmt = lambda v: f'{v:19.12E}'.replace('E', 'D')
+    lines = [f'{prn:2d} {epoch}' + ''.join(map(fmt, values[:3]))]
+    lines += ['   ' + ''.join(map(fmt, values[i:i + 4])) for i in range(3, len(values), 4)]
+    return lines
+
+
+GPS_NAV_VALUES = [
+    1e-4, 1e-12, 0.0, 5.0, -10.5, 4.5e-9, 1.2, 1e-6, 0.01, 2e-6, 5153.6,
+    7200.0, 1e-7, -1.5, 2e-7, 0.95, 200.0, 0.5, -8e-9, 1e-10, 1.0, 2295.0, 0.0,
+    2.0, 0.0, -1e-8, 5.0, 0.0, 4.0,
+]
+
+
+class NavigationParserTests(SimpleTestCase):
+    def test_gps_records_are_deduplicated(self):
+        text = '\n'.join([
+            '     2.11           N: GPS NAV DATA                         RINEX VERSION / TYPE',
+            '                                                            END OF HEADER',
+            *_nav_record(5, '23 12 31  2  0  0.0', GPS_NAV_VALUES),
+            *_nav_record(5, '23 12 31  2  0  0.0', GPS_NAV_VALUES),
+            *_nav_record(7, '23 12 31  2  0  0.0', GPS_NAV_VALUES),
+        ]) + '\n'
+        gps = parse_navigation(io.BytesIO(text.encode()))['G']
+        self.assertEqual(gps['prn'].tolist(), [5, 7])
+        self.assertEqual(gps['week'][0], 2295)
+        self.assertAlmostEqual(gps['sqrt_a'][0], 5153.6)
+        self.assertEqual(str(gps['toe_time'][0]), '2023-12-31T02:00:00.000')
+
+    def test_synthetic_navigation_files(self):
+        for version in (2.11, 3.04):
+            for system in ('G', 'R'):
+                lines = nav_lines(version, system, datetime(2024, 1, 1), 4, [1, 2, 3], random.Random(0))
+                parsed = parse_navigation(io.BytesIO(('\n'.join(lines) + '\n').encode()))
+                self.assertEqual(list(parsed), [system])
+                self.assertEqual(sorted(parsed[system]['prn'].tolist()), [1, 1, 2, 2, 3, 3])
+
+
+class OrbitTests(SimpleTestCase):
+    def test_geodetic_roundtrip(self):
+        xyz = geodetic_to_ecef(55.75, 37.62, 150.0)
+        lat, lon, h = ecef_to_geodetic(xyz[np.newaxis, :])
+        self.assertAlmostEqual(np.degrees(lat[0]), 55.75, places=9)
+        self.assertAlmostEqual(np.degrees(lon[0]), 37.62, places=9)
+        self.assertAlmostEqual(h[0], 150.0, places=4)
+
+    def test_dop(self):
+        # Зенит и четыре спутника на 30° по сторонам света; во второй эпохе видны только два
+        azimuth = np.array([[0.0, 0.0], [0.0, 0.0], [90.0, 90.0], [180.0, 180.0], [270.0, 270.0]])
+        elevation = np.array([[90.0, 90.0], [30.0, 30.0], [30.0, 5.0], [30.0, 5.0], [30.0, 5.0]])
+        dop = dilution_of_precision(azimuth, elevation, ['G'] * 5, mask=10.0)
+        self.assertEqual(dop['satellites'].tolist(), [5, 2])
+        self.assertAlmostEqual(dop['hdop'][0], 1 / np.cos(np.radians(30)), places=6)
+        self.assertTrue(np.isnan(dop['pdop'][1]))
+
+
+class TimeseriesTests(SimpleTestCase):
+    def test_velocity_and_outlier(self):
+        # Ежемесячные сессии: восток +20 мм/год, шум высоты ±1 мм, в седьмой сессии выброс по высоте
+        reference = geodetic_to_ecef(55.0, 37.0, 150.0)
+        timestamps = np.datetime64('2023-01-01T00:00', 'us') + np.arange(12) * np.timedelta64(30, 'D')
+        years = (timestamps - timestamps[0]) / np.timedelta64(1, 's') / (365.25 * 86400)
+        enu = np.zeros((12, 3))
+        enu[:, 0] = 0.02 * years
+        enu[:, 2] = np.tile([0.001, -0.001], 6)
+        enu[6, 2] = 0.5
+        xyz = reference + enu @ enu_rotation(np.radians(55.0), np.radians(37.0))
+        heights = [150.0 + u for u in enu[:, 2]]
+
+        result = compute_timeseries(timestamps, xyz, heights)
+        self.assertEqual(result['count'], 12)
+        self.assertEqual([s['outlier'] for s in result['series']], [i == 6 for i in range(12)])
+        self.assertEqual(result['outlier_count'], 1)
+        self.assertAlmostEqual(result['velocity']['rate_m_per_year']['e'], 0.02, places=3)
+        self.assertLess(abs(result['velocity']['rate_m_per_year']['u']), 0.002)
+        self.assertAlmostEqual(result['series'][6]['ellipsoidal_height'], 150.5)
+        self.assertAlmostEqual(result['reference']['latitude'], 55.0, places=5)
+
+
+class SinglePointPositioningTests(SimpleTestCase):
+    def _constellation(self, toe_time):
+        # 24 спутника на круговых орбитах в шести плоскостях
+        eph = np.zeros(24, dtype=GPS_EPHEMERIS_DTYPE)
+        eph['prn'] = np.arange(1, 25)
+        eph['toc'] = eph['toe_time'] = toe_time
+        eph['sqrt_a'], eph['i0'], eph['week'], eph['toe'] = 5153.6, np.radians(55), 2295, 86400 + 10800
+        eph['omega0'] = np.arange(24) % 6 * np.pi / 3
+        eph['m0'] = np.arange(24) // 6 * np.pi / 2 + np.arange(24) % 6 * 0.5
+        return eph
+
+    def test_recovers_receiver_position(self):
+        toe_time = np.datetime64('2024-01-01T03:00', 'ms')
+        eph = self._constellation(toe_time)
+        times = toe_time + np.arange(10) * np.timedelta64(30, 's')
+        receiver = geodetic_to_ecef(55.0, 37.0, 150.0)
+
+        epoch, prn, ranges = [], [], []
+        for p in eph['prn']:
+            travel = np.full(len(times), 0.075)
+            for _ in range(3):
+                xyz, clock = positions_at('G', eph, np.full(len(times), p), times, -travel)
+                theta = GPS_OMEGA_E * travel
+                xyz[:, 0], xyz[:, 1] = (np.cos(theta) * xyz[:, 0] + np.sin(theta) * xyz[:, 1],
+                                        -np.sin(theta) * xyz[:, 0] + np.cos(theta) * xyz[:, 1])
+                travel = np.linalg.norm(xyz - receiver, axis=1) / SPEED_OF_LIGHT
+            visible = (xyz - receiver) @ receiver > 0.3 * np.linalg.norm(xyz - receiver, axis=1) * np.linalg.norm(receiver)
+            for i in np.flatnonzero(visible):
+                epoch.append(i)
+                prn.append(p)
+                ranges.append(travel[i] * SPEED_OF_LIGHT + SPEED_OF_LIGHT * 1e-4)
+        order = np.argsort(epoch, kind='stable')
+        data = ObservationData(
+            {}, times, np.array(epoch)[order], np.full(len(order), ord('G'), dtype=np.uint8),
+            np.array(prn, dtype=np.int16)[order], ['C1C'], np.array(ranges)[order, np.newaxis],
+            np.zeros((len(order), 1), dtype=np.uint8),
+        )
+        solution = estimate_position(data, {'G': eph})
+        self.assertIsNotNone(solution)
+        self.assertEqual(solution['epochs'], len(times))
+        # Тропосферная модель в синтетических дальностях не заложена — допуск в несколько метров
+        self.assertLess(np.linalg.norm(np.array(solution['xyz']) - receiver), 10.0)
@@ -0,0 +1,132 @@
+# geoclient/timeseries.py
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Observation
+
+# Выброс — сессия, отклоняющаяся от медианы больше чем на OUTLIER_MAD_LIMIT
+# робастных СКО (1.4826 * MAD) хотя бы по одной компоненте ENU.
+OUTLIER_MAD_LIMIT = 3.0
+MAD_TO_SIGMA = 1.4826
+SECONDS_PER_YEAR = 365.25 * 86400
+ENU_COMPONENTS = ('e', 'n', 'u')
+
+# Эллипсоид WGS84
+_WGS84_A = 6378137.0
+_WGS84_F = 1 / 298.257223563
+_WGS84_E2 = _WGS84_F * (2 - _WGS84_F)
+
+
+def ecef_to_geodetic(xyz):
+    """Массив (n, 3) ECEF -> (lat, lon, h) в радианах и метрах; 5 итераций дают точность много лучше миллиметра."""
+    x, y, z = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+    lon = np.arctan2(y, x)
+    p = np.hypot(x, y)
+    lat = np.arctan2(z, p * (1 - _WGS84_E2))
+    for _ in range(5):
+        n = _WGS84_A / np.sqrt(1 - _WGS84_E2 * np.sin(lat) ** 2)
+        h = p / np.cos(lat) - n
+        lat = np.arctan2(z, p * (1 - _WGS84_E2 * n / (n + h)))
+    n = _WGS84_A / np.sqrt(1 - _WGS84_E2 * np.sin(lat) ** 2)
+    h = p / np.cos(lat) - n
+    return lat, lon, h
+
+
+def enu_rotation(lat, lon):
+    """Матрица поворота ECEF -> ENU в точке (lat, lon), радианы."""
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_lon, cos_lon = np.sin(lon), np.cos(lon)
+    return np.array([
+        [-sin_lon, cos_lon, 0.0],
+        [-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat],
+        [cos_lat * cos_lon, cos_lat * sin_lon, sin_lat],
+    ])
+
+
+def compute_timeseries(timestamps, xyz, heights=None):
+    """
+    Ряд координат пункта: timestamps — массив datetime64, xyz — (n, 3) ECEF,
+    heights — эллипсоидальные высоты сессий (необязательно).
+    Возвращает словарь со смещениями ENU относительно среднего положения,
+    статистикой, флагами выбросов и линейной скоростью (по сессиям без выбросов).
+    """
+    reference = xyz.mean(axis=0)
+    lat, lon, height = ecef_to_geodetic(reference[np.newaxis, :])
+    enu = (xyz - reference) @ enu_rotation(lat[0], lon[0]).T
+
+    median = np.median(enu, axis=0)
+    mad = np.median(np.abs(enu - median), axis=0) * MAD_TO_SIGMA
+    with np.errstate(divide='ignore', invalid='ignore'):
+        robust_z = np.where(mad > 0, np.abs(enu - median) / mad, 0.0)
+    outliers = (robust_z > OUTLIER_MAD_LIMIT).any(axis=1)
+
+    years = (timestamps - timestamps[0]) / np.timedelta64(1, 's') / SECONDS_PER_YEAR
+    inliers = ~outliers
+    velocity = None
+    if np.unique(years[inliers]).size >= 2:
+        design = np.column_stack([np.ones(inliers.sum()), years[inliers]])
+        coef, _, _, _ = np.linalg.lstsq(design, enu[inliers], rcond=None)
+        residuals = enu[inliers] - design @ coef
+        dof = max(inliers.sum() - 2, 1)
+        sigma0 = np.sqrt((residuals ** 2).sum(axis=0) / dof)
+        cov_scale = np.linalg.inv(design.T @ design)[1, 1]
+        velocity = {
+            'rate_m_per_year': dict(zip(ENU_COMPONENTS, coef[1].tolist())),
+            'sigma_m_per_year': dict(zip(ENU_COMPONENTS, (sigma0 * np.sqrt(cov_scale)).tolist())),
+            'intercept_m': dict(zip(ENU_COMPONENTS, coef[0].tolist())),
+            'epoch': str(timestamps[0].astype('datetime64[s]')),
+        }
+
+    return {
+        'reference': {
+            'x': float(reference[0]), 'y': float(reference[1]), 'z': float(reference[2]),
+            'latitude': float(np.degrees(lat[0])), 'longitude': float(np.degrees(lon[0])),
+            'ellipsoidal_height': float(height[0]),
+        },
+        'count': int(len(xyz)),
+        'outlier_count': int(outliers.sum()),
+        'mean_m': dict(zip(ENU_COMPONENTS, enu[inliers].mean(axis=0).tolist() if inliers.any() else [None] * 3)),
+        'std_m': dict(zip(ENU_COMPONENTS, enu[inliers].std(axis=0).tolist() if inliers.any() else [None] * 3)),
+        'velocity': velocity,
+        'series': [
+            {
+                'timestamp': str(ts.astype('datetime64[s]')),
+                'e': float(row[0]), 'n': float(row[1]), 'u': float(row[2]),
+                'ellipsoidal_height': None if session_height is None else float(session_height),
+                'outlier': bool(flag),
+            }
+            for ts, row, flag, session_height in zip(timestamps, enu, outliers, heights if heights is not None else [None] * len(xyz))
+        ],
+    }
+
+
+def point_timeseries(point_id):
+    """
+    Ряд координат пункта по всем его сессиям с ECEF из RINEX.
+    Кэшируется; ключ включает число и последний ID наблюдений пункта и время
+    пересчета его сводки (PointStatistics обновляется при загрузке, объединении
+    и склейке), поэтому измененные или перенесенные наблюдения дают новый ключ.
+    """
+    observations = Observation.objects.filter(point_id=point_id, raw_x__isnull=False)
+    state = observations.aggregate(
+        count=Count('id'), last_id=Max('id'), updated_at=Max('point__statistics__updated_at'),
+    )
+    if not state['count']:
+        return None
+
+    version = state['updated_at'].timestamp() if state['updated_at'] else 0
+    key = f"geoclient:timeseries:{point_id}:{state['count']}:{state['last_id']}:{version}"
+    result = cache.get(key)
+    if result is None:
+        rows = list(observations.order_by('timestamp').values_list(
+            'timestamp', 'raw_x', 'raw_y', 'raw_z', 'ellipsoidal_height'
+        ))
+        timestamps = np.array([row[0].replace(tzinfo=None) for row in rows], dtype='datetime64[us]')
+        xyz = np.array([row[1:4] for row in rows], dtype=float)
+        result = compute_timeseries(timestamps, xyz, [row[4] for row in rows])
+        result['point_id'] = point_id
+        cache.set(key, result, getattr(settings, 'GEOCLIENT_TIMESERIES_CACHE_TTL', 86400))
+    return result
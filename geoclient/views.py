@@ -1,24 +1,31 @@
 import json
 import os
 import traceback
-import hashlib
 import re
 import uuid
-import zipfile
 from collections import defaultdict
 
 from django.views.generic import TemplateView
 from django.urls import reverse, NoReverseMatch
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.middleware.csrf import get_token
 from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
-from .permissions import IsUploader
-from .models import UploadedRinexFile
-from .parsers import parse_rinex_obs_file
+from .permissions import IsUploader, CanDownloadOrView
+from .kml_import import DEFAULT_RADIUS, create_import_job, fail_stale_job, job_progress, start_import_job
+from .models import KmlImportJob, UploadedRinexFile, Observation, RINEX_SUFFIX_REGEX, rinex_file_type, split_rinex_name
+from .parsers import parse_rinex_obs_file, parse_rinex_nav_file
+from .qc import format_qc, qc_uploaded_file
+from .archives import iter_group_archive, iter_bulk_archive
+from .filters import as_list, filter_observations
+from .rinex_io import open_rinex_input
+from .storage import hash_upload, open_rinex, store_rinex_upload
 
 # --- (VueAppContainerView и вспомогательные классы остаются без изменений) ---
 class VueAppContainerView(TemplateView):
@@ -53,12 +60,12 @@ class RinexUploadApiView(APIView):
         if not uploaded_files_list:
             return JsonResponse({'success': False, 'message': 'Файлы не найдены.'}, status=400)
 
-        # Группируем файлы по имени (например TATA1230)
+        # Группируем файлы по имени (например TATA1230); принимаются и сжатые (.gz/.Z), и Hatanaka (.20d/.crx)
         files_by_base_name = defaultdict(list)
         for file in uploaded_files_list:
-            if re.search(r'\.\d{2}[ogn]$', file.name, re.IGNORECASE):
-                base_name = re.sub(r'\.\d{2}[ogn]$', '', file.name, flags=re.IGNORECASE)
-                files_by_base_name[base_name].append(file)
+            name_parts = split_rinex_name(file.name)
+            if name_parts:
+                files_by_base_name[name_parts[0]].append(file)
 
         aggregated_results = []
         total_created = 0
@@ -69,7 +76,8 @@ class RinexUploadApiView(APIView):
                 # 1. Определяем группу (ищем существующую по имени файла)
                 upload_group_id = None
                 existing = UploadedRinexFile.objects.filter(
-                    file__iregex=f'/{re.escape(base_name)}\\.\\d{{2}}[ogn]$'
+                    Q(file__iregex=f'/{re.escape(base_name)}{RINEX_SUFFIX_REGEX}$')
+                    | Q(original_name__iregex=f'^{re.escape(base_name)}{RINEX_SUFFIX_REGEX}$')
                 ).first()
                 
                 if existing:
@@ -83,13 +91,9 @@ class RinexUploadApiView(APIView):
                 # 2. Обработка файлов в группе
                 for file_obj in file_group:
                     # --- ОПТИМИЗАЦИЯ: Хеширование по частям (Chunks) ---
-                    sha256 = hashlib.sha256()
-                    for chunk in file_obj.chunks():
-                        sha256.update(chunk)
-                    file_hash = sha256.hexdigest()
-                    
-                    file_ext = os.path.splitext(file_obj.name.lower())[1]
-                    file_type_char = re.sub(r'[\d.]', '', file_ext) # o, n, g
+                    file_hash = hash_upload(file_obj)
+
+                    file_type_char = rinex_file_type(file_obj.name) # o, n, g
 
                     should_create = False
                     
@@ -113,14 +117,19 @@ class RinexUploadApiView(APIView):
                             should_create = True
 
                     if should_create:
-                        new_file = UploadedRinexFile.objects.create(
-                            file=file_obj,
+                        new_file = store_rinex_upload(
+                            file_obj, file_hash,
                             file_type=file_type_char,
-                            file_hash=file_hash,
                             upload_group=upload_group_id
                         )
                         if file_type_char == 'o':
                             primary_o_file_instance = new_file
+                        else:
+                            # Эфемериды разбираются один раз и складываются в суточные наборы
+                            with open_rinex_input(open_rinex(new_file)) as stream:
+                                _, nav_msgs = parse_rinex_nav_file(stream, file_type_char, new_file)
+                            for m in nav_msgs:
+                                aggregated_results.append({'type': 'info', 'text': f"'{base_name}': {m}"})
 
                 # 3. Парсинг (Если есть O-файл)
                 # Ищем O-файл в группе (либо только что загруженный, либо старый)
@@ -142,6 +151,14 @@ class RinexUploadApiView(APIView):
                              aggregated_results.append({'type': 'danger', 'text': f"Файл {full_path} не найден на диске."})
                     except Exception as e:
                         aggregated_results.append({'type': 'danger', 'text': f"Ошибка парсинга '{base_name}': {e}"})
+
+                    # 4. Контроль качества (один раз на файл)
+                    if primary_o_file_instance.qc_summary is None:
+                        qc = qc_uploaded_file(primary_o_file_instance)
+                        if qc:
+                            aggregated_results.append({'type': 'info', 'text': f"'{base_name}': {format_qc(qc)}"})
+                        else:
+                            aggregated_results.append({'type': 'warning', 'text': f"'{base_name}': не удалось выполнить контроль качества."})
                 
             except Exception as e:
                 traceback.print_exc()
@@ -150,13 +167,74 @@ class RinexUploadApiView(APIView):
 
         return JsonResponse({'success': overall_success, 'messages': aggregated_results, 'total_created_count': total_created})
 
-# Остальные классы (KMLUploadApiView, RinexDownloadApiView, etc.) оставляем без изменений, 
-# так как проблема с памятью и объединением точек решена выше.
 class KMLUploadApiView(APIView):
+    """
+    Принимает KML/KMZ файлы (kml_files) и радиус поиска (radius, м); на каждый файл
+    создается фоновое задание импорта. Ответ возвращается сразу, ход выполнения и итоги —
+    через KMLImportJobApiView.
+    """
     permission_classes = [IsAuthenticated, IsUploader]
+
     def post(self, request, *args, **kwargs):
-        # ... (твой код KML) ...
-        return JsonResponse({'success': False, 'message': 'KML Logic here'}) # Placeholder
+        kml_files = request.FILES.getlist('kml_files') or request.FILES.getlist('kml_file')
+        if not kml_files:
+            return JsonResponse({'success': False, 'messages': [{'type': 'danger', 'text': 'Файлы не найдены.'}]}, status=400)
+
+        created, jobs, messages = [], [], []
+        try:
+            with transaction.atomic():
+                for kml_file in kml_files:
+                    job = create_import_job(kml_file, request.data.get('radius', DEFAULT_RADIUS), request.user)
+                    created.append(job)
+                    start_import_job(job)
+                    jobs.append(_job_payload(job))
+                    messages.append({'type': 'info', 'text': f"'{job.original_name}': импорт поставлен в очередь."})
+        except ValueError as e:
+            # Записи заданий откатились вместе с транзакцией, а уже сохраненные файлы нужно удалить
+            for job in created:
+                job.file.delete(save=False)
+            return JsonResponse({'success': False, 'messages': [{'type': 'danger', 'text': str(e)}]}, status=400)
+        return JsonResponse({'success': True, 'jobs': jobs, 'messages': messages}, status=202)
+
+
+def _job_payload(job):
+    data = {
+        'job_id': str(job.pk),
+        'name': job.original_name,
+        'status': job.status,
+        'status_url': reverse('api_kml_import_job', args=[job.pk]),
+        'error': job.error or None,
+        'report_url': reverse('api_kml_import_report', args=[job.pk]) if job.report else None,
+        'progress': job_progress(job.pk) if job.status in (KmlImportJob.STATUS_PENDING, KmlImportJob.STATUS_RUNNING) else None,
+    }
+    # Счетчики на верхнем уровне: updated_count, not_found_count, skipped_count, ambiguous_count
+    data.update(job.counts or {})
+    return data
+
+
+class KMLImportJobApiView(APIView):
+    """Состояние задания импорта KML: статус, стадия и число обработанных Placemark, итоги."""
+    permission_classes = [IsAuthenticated, IsUploader]
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = KmlImportJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return JsonResponse({'success': False, 'message': 'Задание не найдено.'}, status=404)
+        job = fail_stale_job(job)
+        return JsonResponse({'success': job.status != KmlImportJob.STATUS_FAILED, **_job_payload(job)})
+
+
+class KMLImportReportApiView(APIView):
+    """CSV неоднозначных совпадений задания импорта."""
+    permission_classes = [IsAuthenticated, IsUploader]
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = KmlImportJob.objects.filter(pk=job_id).first()
+        if job is None or not job.report:
+            return HttpResponse("Нет отчета", status=404)
+        return FileResponse(job.report.open('rb'), as_attachment=True, filename=os.path.basename(job.report.name),
+                            content_type='text/csv')
+
 
 def get_csrf_token_view(request):
     return JsonResponse({'csrfToken': get_token(request)})
@@ -168,16 +246,60 @@ class RinexDownloadApiView(APIView):
         if not rinex_files.exists(): return HttpResponse("Нет файлов", status=404)
         
         first = rinex_files.first()
-        zip_name = re.sub(r'\.\d{2}[ogn]$', '', os.path.basename(first.file.name), flags=re.IGNORECASE) + ".zip"
+        name_parts = split_rinex_name(first.download_name)
+        zip_name = (name_parts[0] if name_parts else first.download_name) + ".zip"
         
-        import io
-        mem_zip = io.BytesIO()
-        with zipfile.ZipFile(mem_zip, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for rf in rinex_files:
-                if rf.file and os.path.exists(rf.file.path):
-                    zf.write(rf.file.path, os.path.basename(rf.file.name))
-        
-        mem_zip.seek(0)
-        resp = HttpResponse(mem_zip.read(), content_type='application/zip')
+        # Архив собирается на лету, без буфера в памяти
+        resp = StreamingHttpResponse(iter_group_archive(rinex_files), content_type='application/zip')
+        resp['Content-Disposition'] = f'attachment; filename="{zip_name}"'
+        return resp
+
+
+class BulkRinexDownloadApiView(APIView):
+    """
+    Один потоковый ZIP-архив для многих пунктов.
+    Параметры (JSON в POST или query string в GET):
+      point_ids, observation_ids — списки (в GET через запятую);
+      bbox — min_lon,min_lat,max_lon,max_lat;
+      start, end — границы времени наблюдения.
+    В архив попадают полные комплекты (O/N/G) по папкам станций.
+    """
+    permission_classes = [IsAuthenticated, CanDownloadOrView]
+
+    def get(self, request, *args, **kwargs):
+        return self._download(request.query_params)
+
+    def post(self, request, *args, **kwargs):
+        return self._download(request.data)
+
+    def _download(self, params):
+        if not any(as_list(params.get(key)) for key in ('point_ids', 'observation_ids', 'bbox')):
+            return JsonResponse({'success': False, 'message': 'Укажите point_ids, observation_ids или bbox.'}, status=400)
+
+        try:
+            observations = filter_observations(Observation.objects.all(), params)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+        # Пункт для каждого файла: по комплекту, а для старых файлов без группы — по самому файлу
+        owner_point = Observation.objects.filter(
+            Q(source_file__upload_group=OuterRef('upload_group')) | Q(source_file=OuterRef('pk')),
+            pk__in=observations.values('pk'),
+        ).values('point_id')[:1]
+
+        rinex_files = UploadedRinexFile.objects.filter(
+            Q(upload_group__in=observations.exclude(source_file__upload_group=None).values('source_file__upload_group'))
+            | Q(pk__in=observations.values('source_file_id'))
+        ).annotate(
+            owner_point_id=Subquery(owner_point)
+        ).order_by('owner_point_id', 'upload_group', 'file')
+
+        if not rinex_files.exists():
+            return JsonResponse({'success': False, 'message': 'Нет файлов по заданным условиям.'}, status=404)
+
+        # iterator() на PostgreSQL читает серверным курсором, порциями
+        file_rows = ((rf.owner_point_id, rf) for rf in rinex_files.iterator(chunk_size=500))
+        zip_name = f"rinex_{timezone.now():%Y%m%d_%H%M%S}.zip"
+        resp = StreamingHttpResponse(iter_bulk_archive(file_rows), content_type='application/zip')
         resp['Content-Disposition'] = f'attachment; filename="{zip_name}"'
-        return resp
\ No newline at end of file
+        return resp